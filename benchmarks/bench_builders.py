@@ -0,0 +1,236 @@
+#===============================================================================
+# bench_builders.py
+# ------------------------------------------------------------------------------
+#
+# Benchmark suite for the MySQL_IMDb_Project converter, imdb_converter.py.
+#
+# Times each table builder of the converter (make_Aliases,
+# make_Directors_and_Writers, make_Had_role, make_Known_for, ...) on its IMDb
+# data file, and the whole converter. For each it reports the wall time, the
+# rows of the IMDb data file per second and the peak memory (resident set
+# size). The time of a builder does not include reading its file.
+#
+# The IMDb data files are made with imdb_synthetic.py, about --rows rows in
+# all, unless --data-path gives the folder of real (or other) ones.
+#
+# The results can be saved as a baseline (--save-baseline), later runs are
+# compared with it and the builders more than --threshold slower, or using
+# more than --threshold more memory, are reported as regressions. The exit
+# status is then 1, so the suite can be run as a check. A baseline is only
+# meaningful on the machine, and for the data, it was made with.
+#
+# Each builder runs in a separate process, writing its tables to a folder in
+# ./bench_builders, which is removed afterwards. This process does not import
+# the converter (or pandas) itself, as on Linux a process starts with the peak
+# memory of the process which started it.
+#
+# Run in terminal:
+# $ python benchmarks/bench_builders.py --rows 1000000 --save-baseline
+# $ python benchmarks/bench_builders.py --rows 1000000
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+from timing import converter, synthetic, run, peak_memory
+
+# Smallest change of the time (s) and peak memory (bytes) reported, smaller
+# ones are within the noise of a run
+MIN_CHANGE = {'seconds': 0.05, 'peak_memory': 10*2**20}
+
+
+def builders(only=None):
+    """
+    The builders of the converter, or only those in list only, as a dict
+    mapping each builder's name (e.g. make_Had_role) to its IMDb data file.
+    """
+
+    import imdb_converter
+
+    return {make.__name__: file
+        for file, options in imdb_converter.IMDB_FILES.items()
+        for make in options['make'] if only is None or make.__name__ in only}
+
+def time_builder(data_path,file,name):
+    """
+    Read IMDb data file file in folder data_path and make the tables of
+    builder name from it, in this process. Returns the rows of the file and
+    the seconds taken to make the tables.
+    """
+
+    import imdb_converter
+
+    options = imdb_converter.IMDB_FILES[file]
+    make = getattr(imdb_converter,name)
+
+    df = next(imdb_converter.read_imdb_file(imdb_converter.open_imdb_file(
+        os.path.join(data_path,file)),engine=imdb_converter.default_engine(),
+        dtype=options['dtype'],sep='\t',na_values='\\N',
+        quoting=options['quoting']))
+
+    start = time.perf_counter()
+    make(df)
+
+    return len(df), time.perf_counter() - start
+
+def run_builder(data_path,file,name,output_path):
+    """
+    Time builder name on IMDb data file file in folder data_path, in a
+    separate process writing to output_path. Returns a dict of the results.
+    """
+
+    os.makedirs(output_path)
+    stdout, wall_time, rusage = run([sys.executable,os.path.abspath(__file__),
+        '--time-builder',file,name,'--data-path',data_path],output_path)
+    rows, seconds = json.loads(stdout.strip().split('\n')[-1])
+
+    return {'file': file, 'rows': rows, 'seconds': seconds,
+        'rows_per_second': rows/max(seconds,1e-9),
+        'peak_memory': peak_memory(rusage)}
+
+def run_pipeline(data_path,rows,output_path):
+    """
+    Time the whole converter on the IMDb data files in folder data_path, of
+    rows rows in all, writing to output_path. Returns a dict of the results.
+    """
+
+    os.makedirs(output_path)
+    stdout, wall_time, rusage = run([sys.executable,converter,'--data-path',
+        data_path],output_path)
+
+    return {'file': 'all', 'rows': rows, 'seconds': wall_time,
+        'rows_per_second': rows/max(wall_time,1e-9),
+        'peak_memory': peak_memory(rusage)}
+
+def regressions(results,baseline,threshold):
+    """
+    The results which are more than a fraction threshold slower, or use more
+    than that more memory, than in baseline, by more than MIN_CHANGE. Returns
+    a list of (name, reason).
+    """
+
+    found = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key, unit, scale in [('seconds','s',1),
+            ('peak_memory','MB',2**20)]:
+            if result[key] > (1 + threshold)*baseline[name][key] and \
+                result[key] - baseline[name][key] > MIN_CHANGE[key]:
+                found.append((name,'{} {:.2f} {}, was {:.2f} {}'.format(
+                    key.replace('_',' '),result[key]/scale,unit,
+                    baseline[name][key]/scale,unit)))
+
+    return found
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the builders of imdb_converter.py.')
+    parser.add_argument('--data-path',default=None,
+        help='folder containing the IMDb data files (default: make them with '
+        'imdb_synthetic.py)')
+    parser.add_argument('--rows',type=int,default=100000,
+        help='rows of the synthetic IMDb data files (default: 100000)')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--only',nargs='+',default=None,
+        help='only these builders, e.g. make_Had_role')
+    parser.add_argument('--no-pipeline',action='store_true',
+        help='do not time the whole converter (not timed with --only)')
+    parser.add_argument('--baseline',default='./bench_builders_baseline.json')
+    parser.add_argument('--save-baseline',action='store_true',
+        help='save the results as the baseline')
+    parser.add_argument('--threshold',type=float,default=0.2,
+        help='report regressions this fraction worse than the baseline '
+        '(default: 0.2)')
+    # Used to list and time the builders in separate processes
+    parser.add_argument('--list-builders',action='store_true',
+        help=argparse.SUPPRESS)
+    parser.add_argument('--time-builder',nargs=2,default=None,
+        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list_builders:
+        print(json.dumps(builders(args.only)))
+        sys.exit()
+    if args.time_builder is not None:
+        print(json.dumps(time_builder(args.data_path,*args.time_builder)))
+        sys.exit()
+
+    bench_path = os.path.abspath('./bench_builders')
+
+    results = {}
+    try:
+        data_path = args.data_path
+        if data_path is None:
+            print('Making synthetic IMDb data files of',args.rows,'rows\n')
+            data_path = os.path.join(bench_path,'imdb_data')
+            subprocess.run([sys.executable,synthetic,'--rows',str(args.rows),
+                '--seed',str(args.seed),'--data-path',data_path],check=True,
+                stdout=subprocess.DEVNULL)
+        data_path = os.path.abspath(data_path)
+
+        names = json.loads(subprocess.run([sys.executable,
+            os.path.abspath(__file__),'--list-builders'] +
+            (['--only'] + args.only if args.only else []),check=True,
+            stdout=subprocess.PIPE,text=True).stdout)
+
+        for name, file in names.items():
+            print('Timing',name)
+            results[name] = run_builder(data_path,file,name,
+                os.path.join(bench_path,name))
+
+        if not args.no_pipeline and args.only is None:
+            print('Timing imdb_converter.py')
+            files = {result['file']: result['rows']
+                for result in results.values()}
+            results['pipeline'] = run_pipeline(data_path,sum(files.values()),
+                os.path.join(bench_path,'pipeline'))
+    finally:
+        shutil.rmtree(bench_path,ignore_errors=True)
+
+    print('\n{:<28} {:>12} {:>10} {:>12} {:>16}'.format('','rows',
+        'time (s)','rows/s','peak memory (MB)'))
+    for name, result in results.items():
+        print('{:<28} {:>12} {:>10.2f} {:>12.0f} {:>16.1f}'.format(name,
+            result['rows'],result['seconds'],result['rows_per_second'],
+            result['peak_memory']/2**20))
+
+    if args.save_baseline:
+        with open(args.baseline,'w') as f:
+            json.dump(results,f,indent=1)
+        print('\nSaved the baseline to',args.baseline)
+        sys.exit()
+
+    if not os.path.exists(args.baseline):
+        print('\nNo baseline to compare with, see --save-baseline')
+        sys.exit()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if any(name in baseline and baseline[name]['rows'] != result['rows']
+        for name, result in results.items()):
+        print('\nThe baseline was made with other data, not compared')
+        sys.exit()
+
+    found = regressions(results,baseline,args.threshold)
+    if not found:
+        print('\nNo regressions against',args.baseline)
+        sys.exit()
+
+    print('\nRegressions against',args.baseline)
+    for name, reason in found:
+        print(' ',name,reason)
+    sys.exit(1)
@@ -0,0 +1,105 @@
+#===============================================================================
+# bench_embedded.py
+# ------------------------------------------------------------------------------
+#
+# Benchmark for the MySQL_IMDb_Project embedded query mode, imdb_embedded.py.
+#
+# Runs the queries of SQL_Queries_1.sql (the SELECT of each view Q1 to Q24)
+# with DuckDB over the files output by imdb_converter.py and, if --mysql-user
+# is given, in the IMDb database in MySQL (the password is asked for). Reports
+# the best wall time of a few repeats of each query in each, and whether both
+# return the same number of rows.
+#
+# Run in terminal, from the folder containing the converter's output:
+# $ python benchmarks/bench_embedded.py [--output-path PATH] [--repeats N]
+#     [--mysql-user root]
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import time
+import getpass
+import argparse
+
+from timing import best_time
+import imdb_schema
+import imdb_embedded
+
+# Script whose queries are timed
+SCRIPT = 'SQL_Queries_1.sql'
+
+
+def mysql_query(cursor,sql):
+    """
+    Rows of query sql run in MySQL with cursor.
+    """
+
+    cursor.execute(sql)
+
+    return cursor.fetchall()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the queries of ' + SCRIPT + ' in DuckDB and '
+        'MySQL.')
+    parser.add_argument('--output-path',default='.')
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--threads',type=int,default=None)
+    parser.add_argument('--mysql-host',default='localhost')
+    parser.add_argument('--mysql-user',default=None)
+    parser.add_argument('--mysql-database',default='IMDb')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    connection = imdb_embedded.connect(args.output_path,args.threads)
+    print('Registered the tables in {:.1f} ms\n'.format(
+        1000*(time.perf_counter() - start)))
+
+    cursor = None
+    if args.mysql_user is not None:
+        import imdb_loader
+        mysql_connection = imdb_loader.connect(args.mysql_host,args.mysql_user,
+            getpass.getpass('MySQL password: '),args.mysql_database)
+        cursor = mysql_connection.cursor()
+
+    # Make the views, then time the queries of the views
+    queries = []
+    for statement in imdb_schema.statements(SCRIPT):
+        if statement.upper().startswith('SELECT'):
+            queries.append(statement)
+        else:
+            imdb_embedded.query(connection,statement)
+            if cursor is not None:
+                cursor.execute(statement)
+
+    print('{:<26} {:>8} {:>12} {:>12} {:>6}'.format('','rows','DuckDB (ms)',
+        'MySQL (ms)','same'))
+
+    total = {'DuckDB': 0, 'MySQL': 0}
+    for statement in queries:
+
+        seconds, result = best_time(imdb_embedded.query,args.repeats,
+            connection,statement)
+        total['DuckDB'] += seconds
+
+        mysql_time, same = '', ''
+        if cursor is not None:
+            mysql_seconds, rows = best_time(mysql_query,args.repeats,cursor,
+                statement)
+            total['MySQL'] += mysql_seconds
+            mysql_time = '{:.1f}'.format(1000*mysql_seconds)
+            same = str(len(rows) == len(result))
+
+        print('{:<26} {:>8} {:>12.1f} {:>12} {:>6}'.format(statement[:26],
+            len(result),1000*seconds,mysql_time,same))
+
+    print('{:<26} {:>8} {:>12.1f} {:>12}'.format('Total','',
+        1000*total['DuckDB'],'{:.1f}'.format(1000*total['MySQL'])
+        if cursor is not None else ''))
+
+    if cursor is not None:
+        mysql_connection.close()
@@ -0,0 +1,73 @@
+#===============================================================================
+# bench_had_role.py
+# ------------------------------------------------------------------------------
+#
+# Benchmark for the MySQL_IMDb_Project converter, imdb_converter.py.
+#
+# Compares parsing the roles of title.principals.tsv into the rows of the
+# Had_role table with parse_roles (a single pass over the bytes of the
+# characters column) and with parse_roles_pandas (one pandas string method per
+# step), then dropping duplicates as make_Had_role does. Checks both give the
+# same table and reports the best wall time of a few repeats of each.
+#
+# Run in terminal, from the folder containing imdb_data:
+# $ python benchmarks/bench_had_role.py [--data-path PATH] [--repeats N]
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import argparse
+
+from timing import best_time
+import imdb_converter
+
+
+def make_Had_role(parse,title_principals):
+    """
+    Make the Had_role table from title_principals with parse, as make_Had_role
+    does, without writing it.
+    """
+
+    Had_role = parse(title_principals['tconst'],title_principals['nconst'],
+        title_principals['characters'])
+    Had_role.drop_duplicates(keep=False,inplace=True)
+
+    return Had_role.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark parsing the roles of title.principals.tsv.')
+    parser.add_argument('--data-path',default='./imdb_data')
+    parser.add_argument('--repeats',type=int,default=3)
+    args = parser.parse_args()
+
+    file = 'title.principals.tsv'
+    options = imdb_converter.IMDB_FILES[file]
+
+    print('Reading',os.path.join(args.data_path,file),'\n')
+    title_principals = next(imdb_converter.read_imdb_file(
+        imdb_converter.open_imdb_file(os.path.join(args.data_path,file)),
+        engine=imdb_converter.default_engine(),dtype=options['dtype'],
+        sep='\t',na_values='\\N',quoting=options['quoting']))
+
+    results = {}
+    for parse in [imdb_converter.parse_roles_pandas,imdb_converter.parse_roles]:
+        results[parse.__name__] = best_time(make_Had_role,args.repeats,parse,
+            title_principals)
+
+    pandas_table = results['parse_roles_pandas'][1]
+    table = results['parse_roles'][1]
+    same = (len(table) == len(pandas_table) and
+        (table.astype(str) == pandas_table.astype(str)).all().all())
+
+    print('{:<20} {:>14} {:>10}'.format('','wall time (s)','rows'))
+    for name, (wall_time, result) in results.items():
+        print('{:<20} {:>14.2f} {:>10}'.format(name,wall_time,len(result)))
+    print('\nSpeedup: {:.1f}x'.format(results['parse_roles_pandas'][0]/
+        results['parse_roles'][0]))
+    print('Same table:',same)
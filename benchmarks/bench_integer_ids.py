@@ -0,0 +1,75 @@
+#===============================================================================
+# bench_integer_ids.py
+# ------------------------------------------------------------------------------
+#
+# Benchmark for the MySQL_IMDb_Project converter, imdb_converter.py.
+#
+# Compares converting the IMDb data files with string IDs (the default), e.g.
+# tt0165362, with integer IDs (imdb_converter.py --integer-ids), e.g. 165362.
+# For each it reports the wall time, the peak memory (resident set size) of the
+# converter and the total size of the TSV files output.
+#
+# Each run is made in a separate process, writing its TSV files to its own
+# folder in ./bench_integer_ids, which is removed afterwards.
+#
+# Run in terminal, from the folder containing imdb_data:
+# $ python benchmarks/bench_integer_ids.py [imdb_converter.py options]
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import shutil
+
+from timing import converter, run, peak_memory
+
+
+def run_converter(options,output_path):
+    """
+    Run imdb_converter.py with the list of command line options in folder
+    output_path. Returns the wall time in seconds, the peak memory in bytes and
+    the total size in bytes of the TSV files output.
+    """
+
+    os.makedirs(output_path)
+
+    _, wall_time, rusage = run([sys.executable,converter] + options,
+        output_path)
+
+    tsv_size = sum(os.path.getsize(os.path.join(output_path,file))
+        for file in os.listdir(output_path) if file.endswith('.tsv'))
+
+    return wall_time, peak_memory(rusage), tsv_size
+
+
+if __name__ == '__main__':
+
+    options = sys.argv[1:]
+    data_path = os.path.abspath('./imdb_data')
+    if '--data-path' in options:
+        i = options.index('--data-path') + 1
+        data_path = os.path.abspath(options[i])
+        options = options[:i-1] + options[i+1:]
+    options += ['--data-path',data_path]
+
+    bench_path = os.path.abspath('./bench_integer_ids')
+
+    print('Benchmarking imdb_converter.py',' '.join(options),'\n')
+
+    results = {}
+    try:
+        results['string IDs'] = run_converter(options,
+            os.path.join(bench_path,'string_ids'))
+        results['integer IDs'] = run_converter(options + ['--integer-ids'],
+            os.path.join(bench_path,'integer_ids'))
+    finally:
+        shutil.rmtree(bench_path,ignore_errors=True)
+
+    print('{:<12} {:>14} {:>16} {:>16}'.format('','wall time (s)',
+        'peak memory (MB)','TSV size (MB)'))
+    for name, (wall_time, memory, tsv_size) in results.items():
+        print('{:<12} {:>14.2f} {:>16.1f} {:>16.1f}'.format(name,wall_time,
+            memory/2**20,tsv_size/2**20))
@@ -0,0 +1,80 @@
+#===============================================================================
+# bench_read_gzip.py
+# ------------------------------------------------------------------------------
+#
+# Benchmark for the MySQL_IMDb_Project converter, imdb_converter.py.
+#
+# Compares the wall time and disk I/O of converting the IMDb data files:
+# - by unzipping them to disk first and then reading the unzipped files
+#   (imdb_converter.py --unzip), with
+# - reading the gzipped files directly (imdb_converter.py).
+#
+# Each run is made in a separate process, so that its disk I/O can be measured
+# with os.wait4. Disk I/O is reported in 512 byte blocks as counted by the
+# operating system, which may be 0 on systems that do not count it.
+#
+# Run in terminal, from the folder containing imdb_data:
+# $ python benchmarks/bench_read_gzip.py [imdb_converter.py options]
+#
+# For example, to benchmark the streaming mode:
+# $ python benchmarks/bench_read_gzip.py --chunk-size 1000000
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+
+from timing import converter, run
+
+
+def run_converter(options):
+    """
+    Run imdb_converter.py with the list of command line options, returns the
+    wall time in seconds and the numbers of blocks read and written.
+    """
+
+    _, wall_time, rusage = run([sys.executable,converter] + options)
+
+    return wall_time, rusage.ru_inblock, rusage.ru_oublock
+
+
+def unzipped_size(data_path):
+    """
+    Total size in bytes of the unzipped copies of the gzipped files in
+    data_path.
+    """
+
+    size = 0
+    for file in os.listdir(data_path):
+        if file.endswith('.gz') and os.path.exists(os.path.join(data_path,
+            file.replace('.gz',''))):
+            size += os.path.getsize(os.path.join(data_path,file.replace('.gz','')))
+
+    return size
+
+
+if __name__ == '__main__':
+
+    options = sys.argv[1:]
+    data_path = './imdb_data'
+    if '--data-path' in options:
+        data_path = options[options.index('--data-path') + 1]
+
+    print('Benchmarking imdb_converter.py',' '.join(options),'\n')
+
+    results = {}
+    results['unzip then read'] = run_converter(options + ['--unzip'])
+    extra_bytes = unzipped_size(data_path)
+    results['read gzip directly'] = run_converter(options)
+
+    print('{:<20} {:>12} {:>16} {:>16}'.format('','wall time (s)',
+        'blocks read','blocks written'))
+    for name, (wall_time, blocks_in, blocks_out) in results.items():
+        print('{:<20} {:>12.2f} {:>16} {:>16}'.format(name,wall_time,blocks_in,
+            blocks_out))
+
+    print('\nUnzipping wrote',extra_bytes,'bytes of decompressed copies to',
+        data_path)
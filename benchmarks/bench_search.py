@@ -0,0 +1,130 @@
+#===============================================================================
+# bench_search.py
+# ------------------------------------------------------------------------------
+#
+# Benchmark for the MySQL_IMDb_Project search index, imdb_search.py.
+#
+# Compares finding the rows of Had_role, Titles and Names_ whose role, title or
+# name contains (or equals) a few strings, ignoring case, with the search index
+# and with a full scan of the table in pandas, which is what a LIKE '%...%'
+# query does in MySQL. The strings include those of Queries 9, 12 and 17 of
+# SQL_Queries_1.sql. Checks both find the same rows and reports the best wall
+# time of a few repeats of each.
+#
+# If --mysql-user is given the LIKE queries are also timed in the IMDb
+# database, e.g. with --mysql-user root (the password is asked for).
+#
+# Run in terminal, from the folder containing the TSV files output by
+# imdb_converter.py:
+# $ python benchmarks/bench_search.py [--tsv-path PATH] [--repeats N]
+#
+# The search index is built in ./search_index if it is not there already.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import getpass
+import argparse
+import pandas as pd
+
+from timing import best_time
+import imdb_search
+
+# (table, string, whole) searched for, whole is True to find values equal to
+# the string (as the LIKE conditions of the queries, without wildcards, do)
+SEARCHES = [
+    ('Had_role', 'James Bond', True),
+    ('Had_role', 'bond', False),
+    ('Names_', 'Don Wilson', True),
+    ('Names_', 'wilson', False),
+    ('Titles', 'Back to the Future', True),
+    ('Titles', 'future', False),
+]
+
+
+def scan(df,column,pattern,whole):
+    """
+    Rows of DataFrame df whose column contains (or if whole is True equals)
+    pattern, ignoring case, by checking every row.
+    """
+
+    text = df[column].str.lower()
+    if whole:
+        match = text == pattern.lower()
+    else:
+        match = text.str.contains(pattern.lower(),regex=False)
+
+    return df[match.fillna(False).to_numpy(dtype=bool)].reset_index(drop=True)
+
+def like(cursor,table,column,pattern,whole):
+    """
+    Number of rows of table in MySQL whose column is LIKE pattern (or
+    %pattern%), ignoring case.
+    """
+
+    cursor.execute('SELECT COUNT(*) FROM ' + table + ' WHERE LOWER(' + column +
+        ') LIKE %s',(pattern.lower() if whole else '%' + pattern.lower() + '%',))
+
+    return cursor.fetchone()[0]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark the search index against full table scans.')
+    parser.add_argument('--tsv-path',default='.')
+    parser.add_argument('--search-path',default='./search_index')
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--mysql-host',default='localhost')
+    parser.add_argument('--mysql-user',default=None)
+    parser.add_argument('--mysql-database',default='IMDb')
+    args = parser.parse_args()
+
+    if not all(os.path.isdir(os.path.join(args.search_path,table))
+        for table in imdb_search.SEARCH_COLUMNS):
+        print('Building the search index in',args.search_path,'\n')
+        imdb_search.build(args.tsv_path,args.search_path)
+
+    cursor = None
+    if args.mysql_user is not None:
+        import imdb_loader
+        connection = imdb_loader.connect(args.mysql_host,args.mysql_user,
+            getpass.getpass('MySQL password: '),args.mysql_database)
+        cursor = connection.cursor()
+
+    tables = {}
+    for table, (keys, column) in imdb_search.SEARCH_COLUMNS.items():
+        tables[table] = pd.read_csv(os.path.join(args.tsv_path,table + '.tsv'),
+            sep='\t',usecols=keys + [column],dtype='str',na_values='\\N',
+            keep_default_na=False)
+        imdb_search.read_segments(table,args.search_path)
+
+    print('{:<32} {:>8} {:>10} {:>10} {:>10} {:>6}'.format('','rows',
+        'index (ms)','scan (ms)','LIKE (ms)','same'))
+
+    for table, pattern, whole in SEARCHES:
+
+        keys, column = imdb_search.SEARCH_COLUMNS[table]
+        index_time, found = best_time(imdb_search.search,args.repeats,table,
+            pattern,whole,args.search_path)
+        scan_time, scanned = best_time(scan,args.repeats,tables[table],column,
+            pattern,whole)
+        same = (len(found) == len(scanned) and
+            (found.astype(str) == scanned.astype(str)).all().all())
+
+        like_time = ''
+        if cursor is not None:
+            seconds, count = best_time(like,args.repeats,cursor,table,column,
+                pattern,whole)
+            like_time = '{:.1f}'.format(1000*seconds)
+            same = same and count == len(found)
+
+        name = table + ('=' if whole else '~') + repr(pattern)
+        print('{:<32} {:>8} {:>10.1f} {:>10.1f} {:>10} {:>6}'.format(name,
+            len(found),1000*index_time,1000*scan_time,like_time,str(same)))
+
+    if cursor is not None:
+        connection.close()
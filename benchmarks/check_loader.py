@@ -0,0 +1,284 @@
+#===============================================================================
+# check_loader.py
+# ------------------------------------------------------------------------------
+#
+# Check of the MySQL_IMDb_Project loader, imdb_loader.py, as used by
+# imdb_converter.py --formats mysql.
+#
+# This script does the following:
+# - Converts the IMDb data files with --formats tsv,mysql, on --workers worker
+#   processes each with --load-connections connections, so loads run at the
+#   same time in threads and processes
+# - Checks that the rows loaded into each table are those of its TSV file
+# - Converts them again with the load of one table (--fail-table) failing
+#   before MySQL reads its named pipe, and checks that the converter fails
+#   rather than hanging (see imdb_loader.close_pipe), within --timeout
+#
+# With --mysql-user the tables are loaded into a real MySQL (or MariaDB)
+# server, into the database --mysql-database, which is dropped and created
+# again. MySQL must allow LOAD DATA LOCAL INFILE (SET GLOBAL local_infile = 1;).
+# The load is made to fail by dropping the table.
+#
+# Without --mysql-user the test double of mysql.connector in
+# benchmarks/mysql_double is used, which reads each named pipe as MySQL would
+# and saves the rows it read, see benchmarks/mysql_double/mysql/connector.py.
+#
+# The rows are compared in memory, so use small IMDb data files, e.g. made by
+# $ python imdb_synthetic.py --rows 20000 --data-path ./imdb_data
+#
+# Run in terminal, from the folder containing imdb_data:
+# $ python benchmarks/check_loader.py
+# $ python benchmarks/check_loader.py --mysql-user root
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import json
+import shutil
+import signal
+import getpass
+import argparse
+import tempfile
+import subprocess
+
+from timing import repo_path
+import imdb_schema
+
+# Folder of the test double of mysql.connector
+double_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    'mysql_double')
+
+
+def convert(data_path,output_path,mysql,options):
+    """
+    Convert the IMDb data files in folder data_path, writing the TSV files to
+    output_path and loading the tables with imdb_loader.Loader(**mysql).
+    options are passed on to imdb_converter.convert. Run in a separate process,
+    see --convert.
+    """
+
+    import imdb_converter
+
+    os.chdir(output_path)
+    imdb_converter.convert(data_path,options.pop('workers'),
+        formats=['tsv','mysql'],mysql=mysql,**options)
+
+def run_convert(data_path,output_path,mysql,options,timeout,env=None):
+    """
+    Run convert in a separate process, within timeout seconds. Returns True
+    if it succeeded, False if it failed, or None if it timed out (it is then
+    killed, with its worker processes). The password of mysql is passed to it
+    in the environment, not on the command line.
+    """
+
+    mysql = dict(mysql)
+    env = dict(os.environ,**(env or {}),
+        CHECK_LOADER_PASSWORD=mysql.pop('password',None) or '')
+
+    # In a session of its own, to kill its worker processes too if it hangs
+    process = subprocess.Popen([sys.executable,os.path.abspath(__file__),
+        '--convert',json.dumps([data_path,output_path,mysql,options])],
+        env=env,stdout=subprocess.DEVNULL,stderr=subprocess.PIPE,text=True,
+        start_new_session=True)
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid,signal.SIGKILL)
+        process.communicate()
+        return None
+
+    if process.returncode != 0:
+        print(stderr.strip().split('\n')[-1])
+
+    return process.returncode == 0
+
+def tsv_rows(file_path):
+    """
+    The rows of the TSV file file_path, without its header line, sorted.
+    """
+
+    with open(file_path,'rb') as f:
+        return sorted(f.read().split(b'\n')[1:-1])
+
+def double_rows(load_path,table):
+    """
+    The rows the test double loaded into table, saved to load_path, sorted.
+    """
+
+    rows = []
+    for file in os.listdir(load_path):
+        if file.split('.')[0] == table:
+            with open(os.path.join(load_path,file),'rb') as f:
+                rows += f.read().split(b'\n')[:-1]
+
+    return sorted(rows)
+
+def normalise(values):
+    """
+    A row of values, from MySQL or split from a TSV line, as comparable
+    values: NULLs are None and numbers floats.
+    """
+
+    row = []
+    for value in values:
+        if value is None or value == '\\N':
+            row.append(None)
+            continue
+        value = value.decode() if isinstance(value,(bytes,bytearray)) else \
+            str(value)
+        try:
+            row.append(float(value))
+        except ValueError:
+            row.append(value)
+
+    return row
+
+def mysql_rows(connection,table):
+    """
+    The rows of table in MySQL, normalised (see normalise) and sorted.
+    """
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT * FROM ' + table)
+        return sorted((normalise(row) for row in cursor.fetchall()),key=repr)
+    finally:
+        cursor.close()
+
+def check_tables(output_path,load_rows):
+    """
+    Compare the rows loaded into each table, load_rows(table), with those of
+    its TSV file in output_path. Returns a list of the tables which differ.
+    """
+
+    differ = []
+
+    print('\n{:<20} {:>10} {:>10}'.format('','TSV rows','loaded'))
+    for table in imdb_schema.TABLES:
+        rows = tsv_rows(os.path.join(output_path,table + '.tsv'))
+        loaded = load_rows(table)
+        if loaded and not isinstance(loaded[0],bytes):
+            rows = sorted((normalise(row.decode().split('\t'))
+                for row in rows),key=repr)
+        same = rows == loaded
+        if not same:
+            differ.append(table)
+        print('{:<20} {:>10} {:>10} {}'.format(table,len(rows),len(loaded),
+            '' if same else 'DIFFER'))
+
+    return differ
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Check loading the tables into MySQL with imdb_loader.py.')
+    parser.add_argument('--data-path',default='./imdb_data',
+        help='folder containing the IMDb data files (default: ./imdb_data)')
+    parser.add_argument('--chunk-size',type=int,default=None,
+        help='read the IMDb data files in chunks of this many rows')
+    parser.add_argument('--workers',type=int,default=2)
+    parser.add_argument('--load-connections',type=int,default=2)
+    parser.add_argument('--fail-table',default='Had_role',
+        help='table whose load is made to fail (default: Had_role)')
+    parser.add_argument('--timeout',type=float,default=300,
+        help='seconds a conversion may take before it is taken to hang '
+        '(default: 300)')
+    parser.add_argument('--mysql-host',default='localhost')
+    parser.add_argument('--mysql-user',default=None,
+        help='user of a real MySQL server (default: use the test double)')
+    parser.add_argument('--mysql-database',default='IMDb_loader_check',
+        help='database to load, it is dropped first (default: '
+        'IMDb_loader_check)')
+    # Used to convert in a separate process
+    parser.add_argument('--convert',default=None,help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.convert is not None:
+        if 'MYSQL_DOUBLE_PATH' in os.environ:
+            sys.path.insert(0,double_path)
+        data_path, output_path, mysql, options = json.loads(args.convert)
+        mysql['password'] = os.environ.get('CHECK_LOADER_PASSWORD')
+        convert(data_path,output_path,mysql,options)
+        sys.exit()
+
+    check_path = tempfile.mkdtemp(prefix='check_loader_')
+    output_path = os.path.join(check_path,'output')
+    load_path = os.path.join(check_path,'loaded')
+    os.makedirs(output_path)
+    os.makedirs(load_path)
+
+    options = {'workers': args.workers, 'chunk_size': args.chunk_size}
+    data_path = os.path.abspath(args.data_path)
+
+    try:
+        if args.mysql_user is None:
+            print('Using the test double of mysql.connector')
+            mysql = {'connections': args.load_connections}
+            # For the worker processes too
+            python_path = [double_path,repo_path]
+            if os.environ.get('PYTHONPATH'):
+                python_path.append(os.environ['PYTHONPATH'])
+            env = {'MYSQL_DOUBLE_PATH': load_path,
+                'PYTHONPATH': os.pathsep.join(python_path)}
+            fail_env = dict(env,MYSQL_DOUBLE_PATH=os.path.join(check_path,
+                'failed'),MYSQL_DOUBLE_FAIL=args.fail_table)
+            os.makedirs(fail_env['MYSQL_DOUBLE_PATH'])
+        else:
+            import imdb_loader
+            mysql = {'host': args.mysql_host, 'user': args.mysql_user,
+                'password': getpass.getpass('MySQL password: '),
+                'database': args.mysql_database,
+                'connections': args.load_connections}
+            env = fail_env = None
+            connection = imdb_loader.connect(args.mysql_host,args.mysql_user,
+                mysql['password'],None)
+            try:
+                imdb_loader.execute(connection,['DROP DATABASE IF EXISTS ' +
+                    args.mysql_database])
+                imdb_loader.create_tables(connection,args.mysql_database,False)
+            finally:
+                connection.close()
+
+        print('Converting',data_path,'with --formats tsv,mysql')
+        if not run_convert(data_path,output_path,mysql,options,args.timeout,
+            env):
+            print('The conversion failed')
+            sys.exit(1)
+
+        if args.mysql_user is None:
+            differ = check_tables(output_path,
+                lambda table: double_rows(load_path,table))
+        else:
+            connection = imdb_loader.connect(args.mysql_host,args.mysql_user,
+                mysql['password'],args.mysql_database)
+            try:
+                differ = check_tables(output_path,
+                    lambda table: mysql_rows(connection,table))
+                # The load of the table fails before MySQL reads the pipe
+                imdb_loader.execute(connection,['DROP TABLE ' +
+                    args.fail_table])
+            finally:
+                connection.close()
+
+        print('\nConverting again with the load of',args.fail_table,'failing')
+        shutil.rmtree(output_path)
+        os.makedirs(output_path)
+        failed = run_convert(data_path,output_path,mysql,options,args.timeout,
+            fail_env)
+        if failed is None:
+            print('The conversion hung (no result in',args.timeout,'s)')
+        elif failed:
+            print('The conversion succeeded, it should have failed')
+        else:
+            print('The conversion failed, as it should')
+    finally:
+        shutil.rmtree(check_path,ignore_errors=True)
+
+    if differ:
+        print('\nRows differ for:',', '.join(differ))
+    sys.exit(0 if not differ and failed is False else 1)
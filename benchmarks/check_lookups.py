@@ -0,0 +1,130 @@
+#===============================================================================
+# check_lookups.py
+# ------------------------------------------------------------------------------
+#
+# Check of the lookup tables of the MySQL_IMDb_Project converter,
+# imdb_converter.py --lookup-tables.
+#
+# This script does the following:
+# - Converts the IMDb data files with --lookup-tables, reading them whole and
+#   in chunks of --chunk-size rows, and checks that every output file is the
+#   same, lookup tables included
+# - Converts them again in chunks with --lookup-path set to lookup tables
+#   whose codes are in the reverse order, as for an earlier dump, and checks
+#   that those codes are kept and that the tables decode to the same rows
+#
+# Run in terminal, from the folder containing imdb_data:
+# $ python benchmarks/check_lookups.py --chunk-size 50
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import filecmp
+
+from timing import converter, run
+import imdb_converter
+import pandas as pd
+
+
+def convert(data_path,output_path,*options):
+    """
+    Run imdb_converter.py --lookup-tables on the IMDb data files in folder
+    data_path, writing the tables to output_path.
+    """
+
+    os.makedirs(output_path)
+    run([sys.executable,converter,'--data-path',data_path,'--workers','1',
+        '--lookup-tables'] + list(options),cwd=output_path)
+
+def read_tsv(folder,table):
+    """
+    Read <table>.tsv from folder, every value as the string it is written as.
+    """
+
+    return pd.read_csv(os.path.join(folder,table + '.tsv'),sep='\t',
+        dtype='str',keep_default_na=False)
+
+def decode(folder,table):
+    """
+    The rows of table in folder with its codes replaced by their values, sorted.
+    """
+
+    df = read_tsv(folder,table)
+    for column in df.columns.intersection(list(imdb_converter.LOOKUP_TABLES)):
+        lookup = read_tsv(folder,imdb_converter.LOOKUP_TABLES[column])
+        values = dict(zip(lookup[column + '_id'],lookup[column]))
+        df[column] = df[column].map(lambda code: values.get(code,code))
+
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Check the lookup tables of imdb_converter.py.')
+    parser.add_argument('--data-path',default='./imdb_data',
+        help='folder containing the IMDb data files (default: ./imdb_data)')
+    parser.add_argument('--chunk-size',type=int,default=50,
+        help='rows per chunk of the chunked conversion (default: 50)')
+    args = parser.parse_args()
+
+    data_path = os.path.abspath(args.data_path)
+    check_path = tempfile.mkdtemp(prefix='check_lookups_')
+    whole_path = os.path.join(check_path,'whole')
+    chunked_path = os.path.join(check_path,'chunked')
+    earlier_path = os.path.join(check_path,'earlier')
+    kept_path = os.path.join(check_path,'kept')
+    failures = []
+
+    try:
+        print('Converting',data_path,'whole and in chunks of',args.chunk_size,
+            'rows')
+        convert(data_path,whole_path)
+        convert(data_path,chunked_path,'--chunk-size',str(args.chunk_size))
+
+        files = sorted(file for file in os.listdir(whole_path)
+            if file.endswith('.tsv'))
+        _, differ, missing = filecmp.cmpfiles(whole_path,chunked_path,files,
+            shallow=False)
+        for file in differ + missing:
+            failures.append(file + ' differs between whole and chunked')
+
+        # Lookup tables of an earlier conversion, with other codes
+        os.makedirs(earlier_path)
+        for table in imdb_converter.LOOKUP_TABLES.values():
+            lookup = read_tsv(whole_path,table)
+            lookup[lookup.columns[0]] = lookup[lookup.columns[0]].values[::-1]
+            lookup.to_csv(os.path.join(earlier_path,table + '.tsv'),
+                index=False,sep='\t')
+
+        print('Converting in chunks with --lookup-path')
+        convert(data_path,kept_path,'--chunk-size',str(args.chunk_size),
+            '--lookup-path',earlier_path)
+
+        for table in imdb_converter.LOOKUP_TABLES.values():
+            earlier = read_tsv(earlier_path,table)
+            kept = read_tsv(kept_path,table)
+            if not kept.iloc[:len(earlier)].equals(earlier):
+                failures.append(table + ' does not keep the earlier codes')
+
+        for file in files:
+            table = file[:-len('.tsv')]
+            if table in imdb_converter.LOOKUP_TABLES.values():
+                continue
+            if not decode(whole_path,table).equals(decode(kept_path,table)):
+                failures.append(table + ' decodes to other rows with '
+                    '--lookup-path')
+    finally:
+        shutil.rmtree(check_path,ignore_errors=True)
+
+    for failure in failures:
+        print('FAILED:',failure)
+    print('{} files checked, {} failures'.format(len(files),len(failures)))
+    sys.exit(1 if failures else 0)
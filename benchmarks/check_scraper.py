@@ -0,0 +1,150 @@
+#===============================================================================
+# check_scraper.py
+# ------------------------------------------------------------------------------
+#
+# Check of the MySQL_IMDb_Project poster scraper, imdb_scraper.py, against a
+# local HTTP server standing in for IMDb, which serves canned title pages.
+#
+# This script does the following:
+# - Starts the stand-in server on a free local port
+# - Gets the poster urls of its titles with imdb_scraper.get_poster_urls
+#   (--base-url), checking:
+#     a poster div, an og:image meta tag when there is no poster div,
+#     a page without a poster (None), a relative 301 redirect, a 503 which is
+#     retried, and a 404 which is left out and not cached
+# - Gets them again with the same cache, checking that only the title not
+#   found is fetched again
+#
+# Run in terminal:
+# $ python benchmarks/check_scraper.py
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import http.server
+
+# Adds the project folder to sys.path
+import timing
+import imdb_scraper
+
+POSTER_PAGE = ('<html><body><div class="poster"><a href="/title/{0}/">'
+    '<img alt="Poster" src="https://images.example/{0}.jpg"></a></div>'
+    '</body></html>')
+OG_IMAGE_PAGE = ('<html><head><meta property="og:image" '
+    'content="https://images.example/{0}-og.jpg"></head><body></body></html>')
+NO_POSTER_PAGE = '<html><body><h1>{0}</h1></body></html>'
+
+# Canned responses by path: (status, headers, body), or a list of them
+# served in turn, the last one from then on
+PAGES = {
+    '/title/tt0000001/': (200, {}, POSTER_PAGE.format('tt0000001')),
+    '/title/tt0000002/': (200, {}, OG_IMAGE_PAGE.format('tt0000002')),
+    '/title/tt0000003/': (200, {}, NO_POSTER_PAGE.format('tt0000003')),
+    # Relative to the page fetched, i.e. /title/tt0000014/
+    '/title/tt0000004/': (301, {'Location': '../tt0000014/'}, ''),
+    '/title/tt0000014/': (200, {}, POSTER_PAGE.format('tt0000014')),
+    '/title/tt0000005/': [(503, {}, 'Busy'),
+        (200, {}, POSTER_PAGE.format('tt0000005'))],
+}
+
+# Poster urls expected, the title not found (tt0000006) is left out
+EXPECTED = {
+    'tt0000001': 'https://images.example/tt0000001.jpg',
+    'tt0000002': 'https://images.example/tt0000002-og.jpg',
+    'tt0000003': None,
+    'tt0000004': 'https://images.example/tt0000014.jpg',
+    'tt0000005': 'https://images.example/tt0000005.jpg',
+}
+TITLE_IDS = list(EXPECTED) + ['tt0000006']
+
+
+class StandIn(http.server.BaseHTTPRequestHandler):
+    """Serves PAGES, 404 for other paths, and counts the requests of each
+    path in server.requests."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+
+        with self.server.lock:
+            count = self.server.requests.get(self.path,0)
+            self.server.requests[self.path] = count + 1
+
+        response = PAGES.get(self.path,(404, {}, 'Not found'))
+        if isinstance(response,list):
+            response = response[min(count,len(response) - 1)]
+        status, headers, body = response
+
+        body = body.encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name,value)
+        self.send_header('Content-Type','text/html; charset=utf-8')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,format,*args):
+        pass
+
+def check(failures,name,result,expected):
+    """
+    Print check name, adding it to failures if result is not expected.
+    """
+
+    ok = result == expected
+    print('{:<44} {}'.format(name,'ok' if ok else 'FAILED'))
+    if not ok:
+        print('    got',result,'expected',expected)
+        failures.append(name)
+
+
+if __name__ == '__main__':
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1',0),StandIn)
+    server.requests = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    base_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    cache_path = tempfile.mkdtemp(prefix='check_scraper_')
+    options = dict(cache_path=os.path.join(cache_path,'posters.sqlite'),
+        workers=4,rate=0,retries=2,backoff=0.01,timeout=10,base_url=base_url)
+    failures = []
+
+    try:
+        print('First run, against',base_url)
+        posters = imdb_scraper.get_poster_urls(TITLE_IDS,**options)
+        print()
+        for title_id, poster_link in EXPECTED.items():
+            check(failures,title_id + ' poster url',posters.get(title_id,
+                'missing'),poster_link)
+        check(failures,'tt0000006 (404) left out','tt0000006' in posters,
+            False)
+        check(failures,'tt0000005 503 retried',
+            server.requests.get('/title/tt0000005/'),2)
+        check(failures,'tt0000004 redirect followed',
+            server.requests.get('/title/tt0000014/'),1)
+
+        print('\nSecond run, with the cache')
+        requests = dict(server.requests)
+        posters = imdb_scraper.get_poster_urls(TITLE_IDS,**options)
+        print()
+        check(failures,'cached titles not fetched again',
+            {path: count - requests.get(path,0)
+            for path, count in server.requests.items()
+            if count != requests.get(path,0)},{'/title/tt0000006/': 1})
+        check(failures,'cached poster urls returned',posters,EXPECTED)
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_path,ignore_errors=True)
+
+    print('\n{} failures'.format(len(failures)))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1 @@
+# Test double of mysql-connector-python, see connector.py
@@ -0,0 +1,92 @@
+#===============================================================================
+# connector.py
+# ------------------------------------------------------------------------------
+#
+# Test double of mysql.connector for check_loader.py, used where there is no
+# MySQL server. It runs no SQL, but reads the file (or named pipe) of each
+# LOAD DATA LOCAL INFILE statement as MySQL would, and saves what it read to
+# the folder in the environment variable MYSQL_DOUBLE_PATH, one file per load:
+# <table>.<process id>.<thread id>.<load>.tsv.
+#
+# If the environment variable MYSQL_DOUBLE_FAIL is set to a table, its loads
+# fail before the file is opened, as when MySQL rejects the statement.
+#
+# check_loader.py puts the folder above this one first on sys.path (and
+# PYTHONPATH, for the converter's worker processes) to use it.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import re
+import threading
+import itertools
+
+# Numbers the loads of this process
+loads = itertools.count()
+
+# LOAD DATA statement of imdb_loader.py
+LOAD_DATA = re.compile(r"LOAD DATA LOCAL INFILE '((?:[^'\\]|\\.)*)' INTO TABLE "
+    r"(\w+) COLUMNS TERMINATED BY '\\t'( IGNORE 1 LINES)?$")
+
+
+class Error(Exception):
+    pass
+
+
+class Cursor:
+
+    def __init__(self,connection):
+        self.connection = connection
+
+    def execute(self,sql,params=None):
+        """
+        Read the file of a LOAD DATA LOCAL INFILE statement sql, and save it,
+        see above. Other statements are ignored.
+        """
+
+        match = LOAD_DATA.match(sql)
+        if match is None:
+            return
+
+        file_path = re.sub(r'\\(.)',r'\1',match.group(1))
+        table = match.group(2)
+
+        if os.environ.get('MYSQL_DOUBLE_FAIL') == table:
+            raise Error('Load of ' + table + ' failed (MYSQL_DOUBLE_FAIL)')
+
+        with open(file_path,'rb') as f:
+            data = f.read()
+        if match.group(3):
+            data = data.split(b'\n',1)[1]
+
+        with open(os.path.join(os.environ['MYSQL_DOUBLE_PATH'],
+            '{}.{}.{}.{}.tsv'.format(table,os.getpid(),threading.get_ident(),
+            next(loads))),'wb') as f:
+            f.write(data)
+
+    def close(self):
+        pass
+
+
+class Connection:
+
+    def __init__(self,**options):
+        if not options.get('allow_local_infile'):
+            raise Error('LOAD DATA LOCAL INFILE is not allowed')
+        self.options = options
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def connect(**options):
+    return Connection(**options)
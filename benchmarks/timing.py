@@ -0,0 +1,72 @@
+#===============================================================================
+# timing.py
+# ------------------------------------------------------------------------------
+#
+# Helpers shared by the benchmarks of the MySQL_IMDb_Project:
+# - best_time  best wall time of repeated calls of a function
+# - run        run a command in a separate process, with its wall time and
+#              resource usage (peak memory, disk I/O)
+#
+# Importing it adds the project folder to sys.path, so the benchmarks can
+# import the project's modules, e.g. imdb_converter. It does not import pandas
+# itself, as on Linux a process starts with the peak memory of the process
+# which started it.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import time
+import subprocess
+
+# Project folder, and paths to its scripts run by the benchmarks
+repo_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')
+converter = os.path.join(repo_path,'imdb_converter.py')
+synthetic = os.path.join(repo_path,'imdb_synthetic.py')
+
+sys.path.insert(0,repo_path)
+
+
+def best_time(function,repeats,*args):
+    """
+    Best wall time in seconds of repeats calls of function(*args), and its
+    result.
+    """
+
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+def run(command,cwd=None):
+    """
+    Run command (a list) in folder cwd, raising an error if it fails. Returns
+    its standard output, wall time in seconds and resource usage (see
+    os.wait4, e.g. ru_inblock), of that process alone.
+    """
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command,cwd=cwd,stdout=subprocess.PIPE,
+        text=True)
+    stdout = process.stdout.read()
+    _, status, rusage = os.wait4(process.pid,0)
+    wall_time = time.perf_counter() - start
+
+    if status != 0:
+        raise RuntimeError(' '.join(command) + ' failed')
+
+    return stdout, wall_time, rusage
+
+def peak_memory(rusage):
+    """
+    Peak memory (resident set size) in bytes of resource usage rusage.
+    """
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return rusage.ru_maxrss*(1 if sys.platform == 'darwin' else 1024)
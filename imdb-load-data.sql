@@ -108,3 +108,8 @@ LOAD DATA LOCAL INFILE  '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Title_ra
 INTO TABLE Title_ratings
 COLUMNS TERMINATED BY '\t'
 IGNORE 1 LINES;
+
+-- Stamp the data loaded with a new version, so that query results cached
+-- before it was loaded (see imdb_query.py) are no longer used
+DROP TABLE IF EXISTS Data_version;
+CREATE TABLE Data_version AS SELECT UUID() AS version, NOW() AS loaded_at;
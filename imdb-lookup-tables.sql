@@ -0,0 +1,165 @@
+/*
+This script sets up the lookup tables of the IMDb database for IMDb data
+converted with lookup tables:
+
+$ python imdb_converter.py --lookup-tables
+
+The low cardinality columns, e.g. genre, then hold small integer codes and their
+values are stored once in a lookup table, e.g. Genre_lookup(genre_id, genre).
+The large tables and their indexes are then much smaller, and grouping by these
+columns is faster (see the example queries at the end of this script).
+
+To use the IMDb scripts with lookup tables:
+
+1) Open MySQL in terminal:
+$ mysql -u root -p --local-infile
+
+2) Create IMDb data base in MySQL:
+mysql> SOURCE /Users/lappy/Git_repos_mine/MySQL_IMDb_Project/imdb-create-tables.sql
+
+3) Set up the lookup tables using this script in MySQL:
+mysql> SOURCE /Users/lappy/Git_repos_mine/MySQL_IMDb_Project/imdb-lookup-tables.sql
+
+4) Load data using this script in MySQL:
+mysql> SOURCE /Users/lappy/Git_repos_mine/MySQL_IMDb_Project/imdb-load-data.sql
+
+5) Add constraints to the IMDb database in MySQL
+mysql> SOURCE /Users/lappy/Git_repos_mine/MySQL_IMDb_Project/imdb-add-constraints.sql
+
+6) Add indexes to the IMDb database in MySQL
+mysql> SOURCE /Users/lappy/Git_repos_mine/MySQL_IMDb_Project/imdb-index-tables.sql
+
+*/
+
+-- Change the low cardinality columns to codes
+
+ALTER TABLE Titles MODIFY title_type SMALLINT UNSIGNED;
+ALTER TABLE Title_genres MODIFY genre SMALLINT UNSIGNED NOT NULL;
+ALTER TABLE Name_worked_as MODIFY profession SMALLINT UNSIGNED NOT NULL;
+ALTER TABLE Principals MODIFY job_category SMALLINT UNSIGNED;
+ALTER TABLE Aliases MODIFY region SMALLINT UNSIGNED;
+ALTER TABLE Aliases MODIFY language SMALLINT UNSIGNED;
+ALTER TABLE Alias_types MODIFY type SMALLINT UNSIGNED NOT NULL;
+ALTER TABLE Alias_attributes MODIFY attribute SMALLINT UNSIGNED NOT NULL;
+
+-- Create lookup tables
+
+CREATE TABLE Title_type_lookup (
+  title_type_id   SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  title_type      VARCHAR(50) NOT NULL
+);
+
+CREATE TABLE Genre_lookup (
+  genre_id        SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  genre           VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Profession_lookup (
+  profession_id   SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  profession      VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Job_category_lookup (
+  job_category_id SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  job_category    VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Region_lookup (
+  region_id       SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  region          CHAR(4) NOT NULL
+);
+
+CREATE TABLE Language_lookup (
+  language_id     SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  language        CHAR(4) NOT NULL
+);
+
+CREATE TABLE Alias_type_lookup (
+  type_id         SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  type            VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE Alias_attribute_lookup (
+  attribute_id    SMALLINT UNSIGNED NOT NULL PRIMARY KEY,
+  attribute       VARCHAR(255) NOT NULL
+);
+
+-- Load lookup tables
+
+SET GLOBAL local_infile = 1;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Title_type_lookup.tsv'
+INTO TABLE Title_type_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Genre_lookup.tsv'
+INTO TABLE Genre_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Profession_lookup.tsv'
+INTO TABLE Profession_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Job_category_lookup.tsv'
+INTO TABLE Job_category_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Region_lookup.tsv'
+INTO TABLE Region_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Language_lookup.tsv'
+INTO TABLE Language_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Alias_type_lookup.tsv'
+INTO TABLE Alias_type_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Alias_attribute_lookup.tsv'
+INTO TABLE Alias_attribute_lookup
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+/*
+Example queries. Group by the codes, then look up the few values at the end.
+
+-- Query 1 (SQL_Queries_1.sql)
+SELECT L.title_type, C.Count
+FROM (SELECT title_type, COUNT(*) AS Count FROM Titles GROUP BY title_type) AS C,
+Title_type_lookup AS L
+WHERE L.title_type_id = C.title_type
+ORDER BY L.title_type ASC;
+
+-- Query 3 (SQL_Queries_1.sql)
+SELECT L.genre, C.Count
+FROM (SELECT G.genre, COUNT(*) AS Count
+  FROM Title_genres AS G, Titles AS T
+  WHERE T.title_id = G.title_id
+  AND T.title_type = (SELECT title_type_id FROM Title_type_lookup
+    WHERE title_type = 'movie')
+  GROUP BY G.genre) AS C,
+Genre_lookup AS L
+WHERE L.genre_id = C.genre
+ORDER BY C.Count DESC;
+
+-- Movies per year in each genre (MySQL_IMDb_visualisation.ipynb)
+SELECT C.start_year, L.genre, C.Number_of_movies
+FROM (SELECT T.start_year, G.genre, COUNT(DISTINCT T.title_id) AS Number_of_movies
+  FROM Titles AS T, Title_genres AS G
+  WHERE T.title_id = G.title_id
+  AND T.title_type = (SELECT title_type_id FROM Title_type_lookup
+    WHERE title_type = 'movie')
+  AND T.start_year <= 2019
+  GROUP BY T.start_year, G.genre) AS C,
+Genre_lookup AS L
+WHERE L.genre_id = C.genre
+ORDER BY C.start_year DESC, L.genre ASC;
+*/
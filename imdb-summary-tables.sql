@@ -0,0 +1,134 @@
+/*
+This script creates and loads the summary tables of the IMDb database, made by
+the converter along with the other tables:
+
+$ python imdb_converter.py --summaries
+
+The summary tables hold the aggregates which the queries in SQL_Queries_1.sql
+and MySQL_IMDb_visualisation.ipynb compute over the largest tables, so these
+can be read from a few thousand rows rather than joining Titles, Principals
+and Names_ (see the example queries at the end of this script):
+
+- Genre_counts       number of titles of each type in each genre
+- Genre_year_counts  number of titles of each type in each genre, per start year
+- Season_ratings     number of episodes, and their average rating, in each
+                     season of each show
+- Leading_people     the first billed actor and actress of each movie (the
+                     Leading_people table of the notebook, for every year),
+                     with their age at the start year of the movie
+
+To use the IMDb scripts with summary tables:
+
+1) Build the IMDb database as usual (see imdb-create-tables.sql)
+
+2) Create and load the summary tables using this script in MySQL:
+mysql> SOURCE /Users/lappy/Git_repos_mine/MySQL_IMDb_Project/imdb-summary-tables.sql
+
+With --integer-ids the title_id and name_id columns hold integers, and with
+--lookup-tables title_type, genre and job_category hold codes, change the
+types of these columns as in imdb-create-tables-integer-ids.sql and
+imdb-lookup-tables.sql.
+
+*/
+
+USE IMDb;
+
+-- Create summary tables
+
+DROP TABLE IF EXISTS Genre_counts;
+CREATE TABLE Genre_counts (
+  title_type      VARCHAR(50),
+  genre           VARCHAR(255) NOT NULL,
+  num_titles      INTEGER NOT NULL
+);
+
+DROP TABLE IF EXISTS Genre_year_counts;
+CREATE TABLE Genre_year_counts (
+  title_type      VARCHAR(50),
+  start_year      INTEGER,
+  genre           VARCHAR(255) NOT NULL,
+  num_titles      INTEGER NOT NULL
+);
+
+DROP TABLE IF EXISTS Season_ratings;
+CREATE TABLE Season_ratings (
+  parent_tv_show_title_id VARCHAR(255) NOT NULL,
+  season_number           INTEGER,
+  num_episodes            INTEGER NOT NULL,
+  num_rated_episodes      INTEGER NOT NULL, -- episodes in Title_ratings
+  average_rating          FLOAT, -- of the rated episodes
+  num_votes               INTEGER NOT NULL
+);
+
+DROP TABLE IF EXISTS Leading_people;
+CREATE TABLE Leading_people (
+  start_year      INTEGER NOT NULL,
+  title_id        VARCHAR(255) NOT NULL, -- not null bc PK
+  job_category    VARCHAR(255) NOT NULL, -- not null bc PK
+  ordering        TINYINT NOT NULL,
+  name_id         VARCHAR(255) NOT NULL,
+  age             INTEGER NOT NULL,
+  PRIMARY KEY (title_id,job_category)
+);
+
+-- Load summary tables
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Genre_counts.tsv'
+INTO TABLE Genre_counts
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Genre_year_counts.tsv'
+INTO TABLE Genre_year_counts
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Season_ratings.tsv'
+INTO TABLE Season_ratings
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+LOAD DATA LOCAL INFILE '/Users/lappy/Git_repos_mine/MySQL_IMDb_Project/Leading_people.tsv'
+INTO TABLE Leading_people
+COLUMNS TERMINATED BY '\t'
+IGNORE 1 LINES;
+
+-- Index summary tables
+
+CREATE INDEX Genre_counts_index ON Genre_counts(title_type);
+CREATE INDEX Genre_year_counts_index ON Genre_year_counts(title_type,start_year);
+CREATE INDEX Season_ratings_index ON Season_ratings(parent_tv_show_title_id);
+CREATE INDEX Leading_people_index ON Leading_people(start_year);
+
+/*
+Example queries using the summary tables
+
+-- Query 3 (SQL_Queries_1.sql)
+SELECT genre, num_titles AS Count
+FROM Genre_counts
+WHERE title_type = 'movie'
+ORDER BY Count DESC;
+
+-- Movies per year in each genre (MySQL_IMDb_visualisation.ipynb)
+SELECT start_year, genre, num_titles AS Number_of_movies
+FROM Genre_year_counts
+WHERE title_type = 'movie'
+AND start_year <= 2019
+ORDER BY start_year DESC, genre ASC;
+
+-- Query 24 (SQL_Queries_1.sql)
+SELECT S.season_number, S.num_rated_episodes AS Number_of_episodes,
+S.average_rating AS Average_of_ep_average_ratings
+FROM Season_ratings AS S, Titles AS T
+WHERE T.primary_title = 'The X-Files'
+AND T.title_type = 'tvSeries'
+AND T.title_id = S.parent_tv_show_title_id
+ORDER BY S.season_number;
+
+-- Ages of the leading actors and actresses (MySQL_IMDb_visualisation.ipynb)
+SELECT L.start_year, L.job_category, G.genre, AVG(L.age) AS mean_age
+FROM Leading_people AS L, Title_genres AS G
+WHERE L.title_id = G.title_id
+AND L.start_year BETWEEN 1919 AND 2019
+GROUP BY L.start_year, L.job_category, G.genre;
+*/
@@ -20,6 +20,50 @@
 # Run in terminal:
 # $ python imdb_converter.py
 #
+# Options (see python imdb_converter.py --help):
+# --data-path PATH   folder containing the IMDb data files (./imdb_data)
+# --chunk-size N     read the IMDb data files in chunks of N rows
+# --unzip            unzip the IMDb data files to disk before reading them
+# --workers N        number of worker processes (number of CPUs)
+# --memory-budget GB memory the workers may use together (physical memory)
+# --integer-ids      output IMDb identifiers as integers, e.g. tt0165362 as 165362
+# --lookup-tables    output low cardinality columns, e.g. genre, as codes
+# --lookup-path PATH folder of earlier lookup tables whose codes are kept
+# --formats LIST     output formats: tsv, parquet, arrow, mysql (tsv)
+# --compression C    compression of parquet and arrow files (zstd, none)
+# --row-group-size N rows per parquet row group or arrow record batch
+# --engine ENGINE    CSV parser, pyarrow (multithreaded) or c (pyarrow)
+# --cache-path PATH  folder to cache the parsed IMDb data files in (no cache)
+# --cache-size GB    disk space the cache may use (10)
+# --only TABLES      only make these tables, e.g. Had_role (all tables)
+# --summaries        also make the summary tables of imdb-summary-tables.sql
+# --search-index     also build the substring search index, see imdb_search.py
+# --search-path PATH folder to write the search index to (./search_index)
+# --graph            also build the graph of Principals, see imdb_graph.py
+# --graph-path PATH  folder to write the graph to (./graph)
+# --orphans MODE     find the rows of each foreign key referring to missing
+#                    titles or names, and report, drop or placeholder them
+# --orphan-path PATH folder to write the orphans and their report to
+#                    (./orphans)
+# --sort-by-key      sort each table by its primary key
+# --subset-percent P, --subset-titles LIST, --subset-types LIST,
+# --subset-years FIRST-LAST, --subset-seed N
+#                    only make the tables of a subset of the titles, and the
+#                    titles and names they refer to (all titles)
+# --telemetry PATH   record each read, make and write to PATH as JSON lines,
+#                    see imdb_telemetry.py
+# --profile-stage S  run the stages named S, e.g. make_Had_role, under cProfile
+# --profile-path P   folder to save the profiles to (./profiles)
+# --mysql-host, --mysql-user, --mysql-database
+#                    IMDb database to load with --formats mysql (localhost, root,
+#                    IMDb)
+# --load-connections N
+#                    connections per worker loading tables into MySQL (2)
+#
+# Use from python:
+# >>> import imdb_converter
+# >>> imdb_converter.convert('./imdb_data',workers=4)
+#
 # Run in python console:
 # $ python
 # >>> exec(open('imdb_converter.py').read())
@@ -36,8 +80,19 @@
 import numpy as np
 import pandas as pd
 import os
+import io
 import gzip
+import hashlib
+import queue
 import shutil
+import getpass
+import tempfile
+import argparse
+import threading
+import contextlib
+import concurrent.futures
+
+import imdb_schema
 
 # Helper functions
 #------------------
@@ -73,16 +128,1208 @@ def unzip_files(folder):
 
 #-------------------------------------------------------------------------------
 
+# Used to read gzipped IMDb data files without unzipping them to disk
+class GzipStream(io.RawIOBase):
+    """
+    Read-only binary stream of the decompressed contents of the gzipped file
+    file_path. The file is decompressed by a background thread which keeps up to
+    max_blocks blocks of block_size bytes ready for the reader, so
+    decompression and parsing run at the same time. Use open_imdb_file rather
+    than creating this directly.
+    """
+
+    def __init__(self,file_path,block_size=2**20,max_blocks=16):
+
+        self.name = file_path
+        self.block_size = block_size
+
+        # Decompressed blocks, None marks the end of the file
+        self._blocks = queue.Queue(max_blocks)
+        self._block = memoryview(b'')
+        self._eof = False
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(target=self._decompress,daemon=True)
+        self._thread.start()
+
+    def _put(self,item):
+        # Wait for room in the queue, unless the reader has gone away
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item,timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _decompress(self):
+        try:
+            with gzip.open(self.name,'rb') as f_in:
+                while True:
+                    block = f_in.read(self.block_size)
+                    if not block:
+                        break
+                    if not self._put(block):
+                        return
+        except Exception as e:
+            # Raised again in the reading thread
+            self._put(e)
+            return
+        self._put(None)
+
+    def readable(self):
+        return True
+
+    def readinto(self,b):
+        while len(self._block) == 0:
+            if self._eof:
+                return 0
+            item = self._blocks.get()
+            if item is None:
+                self._eof = True
+            elif isinstance(item,Exception):
+                raise item
+            else:
+                self._block = memoryview(item)
+
+        n = min(len(b),len(self._block))
+        b[:n] = self._block[:n]
+        self._block = self._block[n:]
+
+        return n
+
+    def close(self):
+        self._stop.set()
+        super().close()
+
+#-------------------------------------------------------------------------------
+
+# Used to open an IMDb data file, gzipped or not
+def open_imdb_file(file_path,unzipped=False,block_size=2**20,max_blocks=16):
+    """
+    Open IMDb data file file_path (e.g. ./imdb_data/title.akas.tsv) for reading.
+
+    If the gzipped file (file_path + '.gz') exists, and unzipped is False, it
+    is read directly and decompressed in a background thread (see GzipStream).
+    Otherwise the unzipped file is opened. Returns a binary file object, which
+    can be passed to read_imdb_file.
+    """
+
+    if not unzipped and os.path.exists(file_path + '.gz'):
+        return io.BufferedReader(GzipStream(file_path + '.gz',block_size,
+            max_blocks),block_size)
+
+    return open(file_path,'rb')
+
+#-------------------------------------------------------------------------------
+
+# Used to read IMDb data files, either whole or in chunks
+def read_imdb_file(file_path,chunk_size=None,key=None,engine='c',**kwargs):
+    """
+    Read the IMDb data file file_path with pd.read_csv(file_path,**kwargs) and
+    yield it as DataFrames. If engine is 'pyarrow' the file is read with
+    read_csv_arrow instead, which gives the same DataFrames.
+
+    If chunk_size is None the whole file is yielded as a single DataFrame.
+    Otherwise the file is yielded in chunks of roughly chunk_size rows, so the
+    memory needed is set by chunk_size rather than by the size of the file.
+
+    If key is given (e.g. 'tconst') chunks are aligned on it, i.e., all of the
+    rows sharing a key value are yielded in the same chunk. Builders which need
+    to see every row of a title at once, such as make_Had_role with its
+    drop_duplicates(keep=False), then give the same result as they do on the
+    whole file. This relies on the IMDb files being sorted by their key, which
+    is checked as we go.
+
+    file_path may also be a file object, e.g. from open_imdb_file, which is
+    closed once it has been read.
+    """
+
+    try:
+        yield from _read_imdb_file(file_path,chunk_size,key,engine,**kwargs)
+    finally:
+        if hasattr(file_path,'close'):
+            file_path.close()
+
+def _read_imdb_file(file_path,chunk_size,key,engine,**kwargs):
+
+    if engine == 'pyarrow':
+        chunks = read_csv_arrow(file_path,chunk_size,**kwargs)
+    elif chunk_size is None:
+        chunks = [pd.read_csv(file_path,**kwargs)]
+    else:
+        chunks = pd.read_csv(file_path,chunksize=chunk_size,**kwargs)
+
+    if chunk_size is None or key is None:
+        yield from chunks
+    else:
+        yield from align_chunks(chunks,key,getattr(file_path,'name',file_path))
+
+# Used to align chunks on a key, see read_imdb_file
+def align_chunks(chunks,key,name):
+    """
+    Yield the DataFrames chunks of file name again, with the rows of each value
+    of key moved into a single chunk.
+    """
+
+    # Rows of the last key of the previous chunk, carried over to the next one
+    carry = None
+    last_id = -1
+
+    for chunk in chunks:
+
+        if carry is not None:
+            chunk = pd.concat([carry,chunk])
+
+        # Check the keys are sorted (numerically, e.g. tt9999999 < tt10000000)
+        ids = chunk[key].str[2:].astype('int64')
+        if not ids.is_monotonic_increasing or ids.iloc[0] < last_id:
+            raise ValueError(str(name) + ' is not sorted by ' + key +
+                ', it cannot be read in chunks')
+        last_id = ids.iloc[-1]
+
+        # Hold back the rows of the last key, more of them may follow
+        last = (chunk[key] == chunk[key].iloc[-1]).to_numpy()
+        carry = chunk[last]
+        chunk = chunk[~last]
+
+        if len(chunk) > 0:
+            yield chunk
+
+    if carry is not None and len(carry) > 0:
+        yield carry
+
+#-------------------------------------------------------------------------------
+
+# Multithreaded reading
+#----------------------
+# pd.read_csv parses a file on a single core. pyarrow's CSV reader splits it
+# into blocks and parses them on all cores, then the columns are converted to
+# the dtypes given for the file in IMDB_FILES, so both engines give the same
+# DataFrames.
+
+# Used to choose the CSV parser when none is given
+def default_engine():
+    """
+    'pyarrow' if pyarrow is installed, otherwise 'c' (pd.read_csv).
+    """
+
+    try:
+        import pyarrow.csv
+    except ImportError:
+        return 'c'
+
+    return 'pyarrow'
+
+# Values pd.read_csv reads as NULL by default, mirroring its default na_values
+# (STR_NA_VALUES in pandas' private parsers module), so that read_csv_arrow
+# reads the same NULLs
+CSV_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN',
+    '-nan', '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null']
+
+# Used to read IMDb data files with pyarrow
+def read_csv_arrow(file_path,chunk_size=None,dtype=None,sep='\t',na_values=(),
+    quoting=0,usecols=None):
+    """
+    Read the CSV file file_path (a path or binary file object) with pyarrow's
+    multithreaded CSV reader and yield it as DataFrames, the same as those of
+    pd.read_csv with the same dtype, sep, na_values, quoting and usecols (a
+    list of column names): the whole file if chunk_size is None, otherwise
+    chunks of roughly chunk_size rows.
+
+    NULLs are the values in na_values (e.g. '\\N') and pd.read_csv's default
+    ones. With quoting=3 quotation marks are kept as they are, otherwise fields
+    may be quoted with '"'. Fields must not span lines.
+    """
+
+    import pyarrow as pa
+    import pyarrow.csv
+
+    dtype = dtype or {}
+    if isinstance(na_values,str):
+        na_values = [na_values]
+
+    # Categories are made by pandas, so they are sorted as by pd.read_csv
+    arrow_types = {'str': pa.string(), 'category': pa.string(),
+        'int64': pa.int64(), 'Int64': pa.int64(), 'float64': pa.float64()}
+
+    parse_options = pa.csv.ParseOptions(delimiter=sep,
+        quote_char=False if quoting == 3 else '"')
+    convert_options = pa.csv.ConvertOptions(
+        column_types={column: arrow_types[dtype[column]] for column in dtype},
+        null_values=CSV_NA_VALUES + list(na_values),
+        strings_can_be_null=True,include_columns=usecols or [])
+
+    if chunk_size is None:
+        yield arrow_to_pandas(pa.csv.read_csv(file_path,
+            parse_options=parse_options,convert_options=convert_options),dtype)
+        return
+
+    f = file_path if hasattr(file_path,'read') else open(file_path,'rb')
+
+    try:
+        header = f.readline()
+        read_options = pa.csv.ReadOptions(
+            column_names=header.rstrip(b'\r\n').decode().split(sep))
+
+        # Bytes in about chunk_size rows, from the length of the first lines
+        data = f.read(2**16)
+        block_size = max(int(chunk_size*len(data)/max(data.count(b'\n'),1)),1)
+
+        # Each block is cut after its last complete line, the rest is kept for
+        # the next block
+        start = 0
+        eof = False
+        while True:
+            if not eof and len(data) < block_size:
+                more = f.read(block_size - len(data))
+                eof = not more
+                data += more
+            if not data:
+                break
+            end = data.rfind(b'\n',0,block_size) + 1 or data.find(b'\n') + 1
+            if end == 0 and not eof:
+                # A line longer than a block
+                more = f.read(block_size)
+                eof = not more
+                data += more
+                continue
+            end = end or len(data)
+
+            df = arrow_to_pandas(pa.csv.read_csv(
+                pa.BufferReader(pa.py_buffer(data)[:end]),read_options,
+                parse_options,convert_options),dtype,start)
+            data = data[end:]
+            start += len(df)
+            yield df
+
+    finally:
+        if f is not file_path:
+            f.close()
+
+def arrow_to_pandas(table,dtype,start=0):
+    """
+    Convert Arrow table to a DataFrame with the given dtypes, indexed from
+    start as the chunks of pd.read_csv are.
+    """
+
+    df = table.to_pandas().astype(dtype)
+    df.index = pd.RangeIndex(start,start + len(df))
+
+    return df
+
+#-------------------------------------------------------------------------------
+
+# Parsed input cache
+#-------------------
+# Parsing the IMDb data files takes most of the time of a run. With a cache
+# folder, each file is stored once parsed as an Arrow IPC file, named by a hash
+# of the contents of the file and of the options it was read with, so later
+# runs read it from there instead, e.g. when working on a single table with
+# --only. The least recently used entries are removed to keep the cache within
+# its disk budget.
+
+# Changed when the way the files are parsed changes, to invalidate the cache
+CACHE_VERSION = 1
+
+# Used to name the cache entry of an IMDb data file
+def cache_key(file_path,unzip=False,**kwargs):
+    """
+    Name of the cache entry of IMDb data file file_path (the gzipped file is
+    hashed if it will be read, see open_imdb_file) read with kwargs.
+    """
+
+    if not unzip and os.path.exists(file_path + '.gz'):
+        file_path = file_path + '.gz'
+
+    h = hashlib.sha1(repr((CACHE_VERSION,sorted(kwargs.items()))).encode())
+
+    with open(file_path,'rb') as f:
+        for block in iter(lambda: f.read(2**20),b''):
+            h.update(block)
+
+    return os.path.basename(file_path).split('.tsv')[0] + '.' + h.hexdigest()
+
+# Used to read IMDb data files through the cache
+def read_cached_imdb_file(cache_path,file_path,chunk_size=None,key=None,
+    unzip=False,engine='c',cache_size=None,**kwargs):
+    """
+    Read IMDb data file file_path as read_imdb_file does, using the cache in
+    folder cache_path. If the file is not in the cache it is parsed and added,
+    then the cache is cut down to cache_size bytes (see evict_cache).
+    """
+
+    cache_file = os.path.join(cache_path,cache_key(file_path,unzip,**kwargs) +
+        '.arrow')
+
+    if os.path.exists(cache_file):
+        print('\tReading ' + cache_file)
+        # Mark as recently used
+        os.utime(cache_file)
+        chunks = read_cache_file(cache_file,chunk_size,kwargs.get('dtype'))
+        if chunk_size is None or key is None:
+            yield from chunks
+        else:
+            yield from align_chunks(chunks,key,cache_file)
+        return
+
+    import pyarrow as pa
+
+    os.makedirs(cache_path,exist_ok=True)
+
+    # Written to a temporary file, so an unfinished entry is never read
+    temp_file = cache_file + '.' + str(os.getpid()) + '.tmp'
+    writer = None
+
+    try:
+        for df in read_imdb_file(open_imdb_file(file_path,unzip),chunk_size,
+            key,engine,**kwargs):
+            if writer is None:
+                schema = arrow_schema(df)
+                writer = pa.ipc.new_file(temp_file,schema)
+            writer.write_table(pa.Table.from_pandas(df,schema=schema,
+                preserve_index=False))
+            yield df
+
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(temp_file,cache_file)
+
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    if cache_size is not None:
+        evict_cache(cache_path,cache_size,cache_file)
+
+# Used to read a cache entry
+def read_cache_file(cache_file,chunk_size=None,dtype=None):
+    """
+    Yield the DataFrame stored in cache_file, memory-mapped, whole or in chunks
+    of chunk_size rows, with the given dtypes.
+    """
+
+    import pyarrow as pa
+
+    with pa.memory_map(cache_file) as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    if chunk_size is None:
+        yield arrow_to_pandas(table,dtype or {})
+        return
+
+    for start in range(0,table.num_rows,chunk_size):
+        yield arrow_to_pandas(table.slice(start,chunk_size),dtype or {},start)
+
+# Used to keep the cache within its disk budget
+def evict_cache(cache_path,cache_size,keep=None):
+    """
+    Remove the least recently used entries in the cache in folder cache_path
+    until they take at most cache_size bytes. The entry keep is not removed.
+    """
+
+    entries = []
+    for name in os.listdir(cache_path):
+        if name.endswith('.arrow'):
+            try:
+                stat = os.stat(os.path.join(cache_path,name))
+            except OSError:
+                # Removed by another worker
+                continue
+            entries.append((stat.st_mtime,stat.st_size,
+                os.path.join(cache_path,name)))
+
+    size = sum(entry[1] for entry in entries)
+
+    for _, file_size, file_path in sorted(entries):
+        if size <= cache_size:
+            break
+        if file_path == keep:
+            continue
+        try:
+            os.remove(file_path)
+            print('\tRemoved ' + file_path + ' from the cache')
+        except OSError:
+            continue
+        size -= file_size
+
+# Lookup tables
+#--------------
+# Low cardinality columns, e.g. genre, only have a few dozen distinct values. In
+# lookup table mode these are written as small integer codes, and the values
+# are written to a lookup table for each column, e.g. Genre_lookup.tsv with
+# columns (genre_id, genre). See imdb-lookup-tables.sql.
+#
+# Codes are given out in the order values first appear in the rows, so they do
+# not depend on the chunk size. To keep the codes of an earlier conversion, e.g.
+# of the previous dump for imdb_delta.py, its lookup tables are read from
+# output['lookup_path'] and new values get codes after them.
+LOOKUP_TABLES = {
+    'title_type': 'Title_type_lookup',
+    'genre': 'Genre_lookup',
+    'profession': 'Profession_lookup',
+    'job_category': 'Job_category_lookup',
+    'region': 'Region_lookup',
+    'language': 'Language_lookup',
+    'type': 'Alias_type_lookup',
+    'attribute': 'Alias_attribute_lookup'
+}
+
+# Output settings for the file being converted in this process, set by
+# convert_file. lookups maps a column to a dict of its values and codes, it is
+# kept across chunks so the codes are the same in every chunk, and lookup_path
+# is the folder of the lookup tables it starts from. writers holds the
+# open columnar file writers of the tables being made (see write_columnar), and
+# loader the imdb_loader.Loader of the 'mysql' format (see write_mysql). Tables
+# in sort_keys are sorted by the columns at the positions given, see
+# sort_keys. The orphan settings are used by check_orphans, and summaries and
+# parts hold the partial summary tables and parts of the file being converted,
+# see write_summaries. If search_path is set the search index of the tables in
+# imdb_search.SEARCH_COLUMNS is written there. graph_edges collects the edges of
+# the graph of Principals (or is None), see imdb_graph.write_graph. telemetry
+# is the imdb_telemetry.Telemetry recording the stages of the conversion (or
+# None), see stage. subset_keys holds the IDs of the titles and names of the
+# subset (or is empty), see subset_rows and check_subset, and subset_names the
+# people of the subset found in the file being converted.
+output = {'lookup_tables': False, 'lookups': {}, 'lookup_path': None,
+    'formats': ['tsv'],
+    'compression': None, 'row_group_size': None, 'writers': {}, 'loader': None,
+    'sort_keys': {}, 'orphans': None, 'orphan_path': None, 'foreign_keys': {},
+    'parent_keys': {}, 'orphan_counts': {}, 'summaries': {}, 'parts': {},
+    'search_path': None, 'graph_edges': None, 'telemetry': None,
+    'subset_keys': {}, 'subset_foreign_keys': {}, 'subset_names': None}
+
+def read_lookup(column):
+    """
+    The values and codes of column in its lookup table in
+    output['lookup_path'], as a dict, or an empty dict if there is none.
+    """
+
+    if output['lookup_path'] is None:
+        return {}
+
+    file_path = os.path.join(output['lookup_path'],
+        LOOKUP_TABLES[column] + '.tsv')
+    if not os.path.exists(file_path):
+        return {}
+
+    lookup = pd.read_csv(file_path,sep='\t',dtype='str',keep_default_na=False)
+
+    return dict(zip(lookup[column],lookup[column + '_id'].astype(int)))
+
+def encode_lookups(df):
+    """
+    Replace the values of the columns of df in LOOKUP_TABLES by their codes,
+    adding new values to output['lookups']. Codes start after those read by
+    read_lookup (or at 1) in the order the values first appear in the rows,
+    NULLs are kept.
+    """
+
+    df = df.copy()
+
+    for column in df.columns.intersection(list(LOOKUP_TABLES)):
+
+        if column not in output['lookups']:
+            output['lookups'][column] = read_lookup(column)
+        codes = output['lookups'][column]
+        values = pd.Categorical(df[column])
+
+        # Categories in the order they first appear, not sorted, so that a
+        # whole file and its chunks give the same codes
+        seen = pd.unique(values.codes[values.codes != -1])
+        for value in values.categories[seen]:
+            if value not in codes:
+                codes[value] = max(codes.values(),default=0) + 1
+
+        # Code of each category (0 if unused), then of each row (-1 is NULL)
+        category_codes = np.array([codes.get(value,0)
+            for value in values.categories] + [0],dtype='int32')
+        df[column] = pd.Series(category_codes[values.codes],index=df.index,
+            dtype='Int32').mask(values.codes == -1)
+
+    return df
+
+def write_lookups():
+    """
+    Write the lookup tables of output['lookups'] and clear them.
+    """
+
+    for column, codes in output['lookups'].items():
+        write_table(pd.DataFrame({column + '_id': list(codes.values()),
+            column: list(codes.keys())}),LOOKUP_TABLES[column])
+
+    output['lookups'] = {}
+
+#-------------------------------------------------------------------------------
+
+# Output formats
+#---------------
+# Each table is written in each of the formats in output['formats']:
+# - 'tsv'      <table>.tsv, for LOAD DATA in imdb-load-data.sql
+# - 'parquet'  <table>.parquet, compressed columnar file
+# - 'arrow'    <table>.arrow, Arrow IPC file, which can be memory-mapped
+# - 'mysql'    loaded straight into the IMDb database, see imdb_loader.py
+# The columnar formats keep the column types, e.g. nullable integers, and can
+# be read a few columns at a time (see read_output_table). They need pyarrow.
+
+# Used to record the reads, makes and writes of a conversion
+def stage(kind,name,**fields):
+    """
+    Context manager recording stage name of kind 'read', 'make' or 'write' with
+    output['telemetry'], see imdb_telemetry.Telemetry.stage. Yields the
+    stage's record, a dict, which is not recorded if there is no telemetry.
+    """
+
+    if output['telemetry'] is None:
+        return contextlib.nullcontext({})
+
+    return output['telemetry'].stage(kind,name,**fields)
+
+# Used to write (or append a chunk to) an output table
+def write_table(df,table,append=False):
+    """
+    Write DataFrame df as table in each of the formats in output['formats']. If
+    append is True the rows are appended to the table, this is used when a
+    table is built one chunk at a time.
+
+    The rows referring to titles or names outside the subset are left out, see
+    check_subset. The foreign keys of tables in output['foreign_keys'] are
+    checked for orphans, see check_orphans. The search index of the rows is
+    written to output['search_path'], see imdb_search.write_segments, and the
+    edges of Principals are added to output['graph_edges']. In lookup table
+    mode (see output) the low cardinality columns are written as codes. Tables
+    in output['sort_keys'] are sorted by their keys. The write is recorded as
+    a stage, see stage.
+    """
+
+    with stage('write',table,rows_in=len(df)) as record:
+
+        if table in output['subset_foreign_keys']:
+            df = check_subset(df,table)
+
+        if table in output['foreign_keys']:
+            df = check_orphans(df,table)
+
+        if output['search_path'] is not None:
+            import imdb_search
+            if table in imdb_search.SEARCH_COLUMNS:
+                imdb_search.write_segments(df,table,output['search_path'],
+                    append)
+
+        if output['graph_edges'] is not None and table == 'Principals':
+            import imdb_graph
+            output['graph_edges'].append(imdb_graph.edges(df))
+
+        if output['lookup_tables'] and table not in LOOKUP_TABLES.values():
+            df = encode_lookups(df)
+
+        if table in output['sort_keys']:
+            df = df.sort_values(list(df.columns[output['sort_keys'][table]]),
+                kind='stable')
+
+        for format in output['formats']:
+            if format == 'tsv':
+                write_tsv(df,table + '.tsv',append)
+            elif format == 'mysql':
+                write_mysql(df,table)
+            else:
+                write_columnar(df,table + '.' + format,format,append)
+
+        record['frame'] = df
+
+#-------------------------------------------------------------------------------
+
+# Used to write (or append a chunk to) a TSV file
+def write_tsv(df,file_name,append=False):
+    """
+    Write DataFrame df to the TSV file file_name. If append is True the rows
+    are appended to an existing file and no header line is written.
+    """
+
+    df.to_csv(file_name,index=False,na_rep=r'\N',sep='\t',
+        mode='a' if append else 'w',header=not append)
+
+#-------------------------------------------------------------------------------
+
+# Used to load (a chunk of) a table into the IMDb database
+def write_mysql(df,table):
+    """
+    Load DataFrame df into table in the IMDb database with output['loader'] (an
+    imdb_loader.Loader). The rows are formatted as they are in the TSV files
+    and loaded in the background, see imdb_loader.load_data.
+    """
+
+    data = io.BytesIO()
+    df.to_csv(data,index=False,na_rep=r'\N',sep='\t',header=False)
+
+    output['loader'].load(table,data.getvalue())
+
+#-------------------------------------------------------------------------------
+
+def arrow_schema(df):
+    """
+    Arrow schema for DataFrame df. Text columns (including categoricals) are
+    always strings, so that every chunk of a table has the same schema even if
+    a column is all NULL in some chunks.
+    """
+
+    import pyarrow as pa
+
+    fields = []
+    for column in df.columns:
+        dtype = df[column].dtype
+        if pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype,
+            pd.CategoricalDtype):
+            fields.append(pa.field(column,pa.from_numpy_dtype(
+                np.dtype(dtype.numpy_dtype if hasattr(dtype,'numpy_dtype')
+                else dtype))))
+        else:
+            fields.append(pa.field(column,pa.string()))
+
+    return pa.schema(fields)
+
+# Used to write (or append a chunk to) a Parquet or Arrow IPC file
+def write_columnar(df,file_name,format,append=False):
+    """
+    Write DataFrame df to the Parquet (format 'parquet') or Arrow IPC (format
+    'arrow') file file_name. The file is kept open in output['writers'] so
+    later chunks can be appended, close_writers closes it.
+
+    Uses output['compression'] (e.g. 'zstd', 'snappy', 'lz4' or 'none') and
+    output['row_group_size'] (rows per Parquet row group or Arrow record batch,
+    default whole chunks). By default Parquet files are compressed with zstd and
+    Arrow files are not compressed, so that memory-mapping them reads nothing
+    but the columns used.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not append:
+        close_writers(file_name)
+        schema = arrow_schema(df)
+        compression = output['compression']
+        if compression is None:
+            compression = 'zstd' if format == 'parquet' else None
+        elif compression == 'none':
+            compression = None
+        if format == 'parquet':
+            writer = pq.ParquetWriter(file_name,schema,compression=compression)
+        elif format == 'arrow':
+            writer = pa.ipc.new_file(file_name,schema,
+                options=pa.ipc.IpcWriteOptions(compression=compression))
+        else:
+            raise ValueError('Unknown output format: ' + format)
+        output['writers'][file_name] = (writer, schema)
+
+    writer, schema = output['writers'][file_name]
+
+    writer.write_table(pa.Table.from_pandas(df,schema=schema,
+        preserve_index=False),output['row_group_size'])
+
+def close_writers(file_name=None):
+    """
+    Close the open columnar file writer of file_name, or all of them if
+    file_name is None.
+    """
+
+    for name in list(output['writers']):
+        if file_name is None or name == file_name:
+            output['writers'].pop(name)[0].close()
+
+#-------------------------------------------------------------------------------
+
+# Used to read a table output in a columnar format
+def read_output_table(table,columns=None,folder='.'):
+    """
+    Read table, as output by imdb_converter.py to folder, into a DataFrame.
+    Only the list of columns are read if given, e.g.
+    read_output_table('Titles',['title_id','start_year']).
+
+    The Arrow IPC file (<table>.arrow) is memory-mapped if there is one,
+    otherwise the Parquet file (<table>.parquet) is read.
+    """
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    file_path = os.path.join(folder,table)
+
+    if os.path.exists(file_path + '.arrow'):
+        with pa.memory_map(file_path + '.arrow') as source:
+            arrow_table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            arrow_table = arrow_table.select(columns)
+    else:
+        arrow_table = pq.read_table(file_path + '.parquet',columns=columns,
+            memory_map=True)
+
+    return arrow_table.to_pandas(types_mapper=pd.ArrowDtype)
+
+#-------------------------------------------------------------------------------
+
+# Integer IDs
+#------------
+# In integer ID mode the IMDb identifiers tconst and nconst, e.g. 'tt0165362'
+# and 'nm0220672', are stored as the integers 165362 and 220672. These take 4
+# bytes rather than a python string each, in the DataFrames, the TSV files and
+# the database (see imdb-create-tables-integer-ids.sql). All current IMDb
+# identifiers fit in an int32.
+
+def parse_ids(ids):
+    """
+    Parse the Series of IMDb identifiers ids, e.g. 'tt0165362', to integers.
+    """
+
+    return ids.str.slice(2).astype('int32')
+
+def encode_ids(df,columns):
+    """
+    Replace the IMDb identifiers in columns of DataFrame df by integers.
+    """
+
+    for column in columns:
+        df[column] = parse_ids(df[column])
+
+    return df
+
+def has_integer_ids(df):
+    """
+    True if the first column of df, a title_id or name_id, holds integer IDs.
+    """
+
+    return pd.api.types.is_integer_dtype(df.iloc[:,0])
+
+#-------------------------------------------------------------------------------
+
+# Referential integrity
+#----------------------
+# Some rows of the IMDb data files refer to titles or names which are missing
+# from title.basics.tsv and name.basics.tsv (see IMDb_data_issues.md), which is
+# why imdb-add-constraints.sql adds the foreign keys without checking them.
+# With --orphans the converter finds these orphans as it makes the tables: the
+# IDs of Titles and Names_ are read first (see write_parent_keys), then the
+# foreign key columns of each table are looked up in them as it is written (see
+# check_orphans). The orphans of each foreign key are written to the orphan
+# folder, along with a report. Depending on the mode they are then:
+# - 'report'       kept
+# - 'drop'         left out of the tables
+# - 'placeholder'  kept, and a placeholder row is added to Titles or Names_
+#                  for each missing ID (see write_placeholders)
+# With 'drop' or 'placeholder' the foreign keys hold, so MySQL can check them.
+
+ORPHAN_MODES = ['report', 'drop', 'placeholder']
+
+# IMDb data file and ID column of the tables foreign keys refer to
+PARENT_FILES = {'Titles': ('title.basics.tsv', 'tconst'),
+    'Names_': ('name.basics.tsv', 'nconst')}
+
+# Values of the NOT NULL columns of placeholder rows, other than the ID
+PLACEHOLDER_VALUES = {'Names_': {'name_': ''}}
+
+def foreign_key_columns():
+    """
+    Foreign keys of each table in imdb-add-constraints.sql, as a list of
+    (constraint name, position of its column, referenced table).
+    """
+
+    columns = imdb_schema.table_columns()
+
+    return {table: [(constraint, columns[table].index(key_columns[0]), parent)
+        for constraint, key_columns, parent, parent_columns in keys]
+        for table, keys in imdb_schema.foreign_keys().items()}
+
+# Used to read the IDs foreign keys refer to, before the tables are made
+def write_parent_keys(data_path,orphan_path,unzip=False,integer_ids=False,
+    engine=None):
+    """
+    Read the IDs of each table in PARENT_FILES from its IMDb data file in
+    folder data_path, and write them to orphan_path/<table>.keys (a pickled
+    Series) for check_orphans.
+    """
+
+    os.makedirs(orphan_path,exist_ok=True)
+
+    for table, (file, column) in PARENT_FILES.items():
+
+        print('\n','Reading the IDs of '+file+' ...','\n')
+
+        keys = next(read_imdb_file(open_imdb_file(os.path.join(data_path,file),
+            unzip),engine=engine or default_engine(),dtype={column:'str'},
+            sep='\t',na_values='\\N',quoting=IMDB_FILES[file]['quoting'],
+            usecols=[column]))[column]
+
+        if integer_ids:
+            keys = parse_ids(keys)
+
+        keys.to_pickle(os.path.join(orphan_path,table + '.keys'))
+
+def parent_keys(table):
+    """
+    The IDs of table, written by write_parent_keys, as a pd.Index. It is read
+    once per process, and its hash table is built on its first lookup and kept.
+    """
+
+    if table not in output['parent_keys']:
+        output['parent_keys'][table] = pd.Index(pd.read_pickle(os.path.join(
+            output['orphan_path'],table + '.keys'))).drop_duplicates()
+
+    return output['parent_keys'][table]
+
+# Used to find the orphans of (a chunk of) a table, see write_table
+def check_orphans(df,table):
+    """
+    Look up the foreign key columns of DataFrame df, rows of table, in the IDs
+    of the tables they refer to, adding the orphans of each foreign key to
+    output['orphan_counts']. Returns df, without its orphans in 'drop' mode.
+    """
+
+    orphans = np.zeros(len(df),dtype=bool)
+
+    for constraint, position, parent in output['foreign_keys'][table]:
+        ids = df.iloc[:,position]
+        missing = ((parent_keys(parent).get_indexer(ids) < 0) &
+            ids.notna().to_numpy())
+        output['orphan_counts'].setdefault(constraint,[]).append(
+            ids[missing].value_counts())
+        orphans |= missing
+
+    if output['orphans'] == 'drop' and orphans.any():
+        df = df[~orphans]
+
+    return df
+
+def write_orphans():
+    """
+    Write the orphans found by check_orphans to orphan_path/<constraint>.tsv,
+    one row per missing ID with the number of rows referring to it, and clear
+    them.
+    """
+
+    for constraint, counts in output['orphan_counts'].items():
+        counts = pd.concat(counts).groupby(level=0).sum()
+        write_tsv(counts.rename('rows').reset_index(),
+            os.path.join(output['orphan_path'],constraint + '.tsv'))
+
+    output['orphan_counts'] = {}
+
+def read_orphans(constraint):
+    """
+    The orphans of foreign key constraint written by write_orphans, or None if
+    its table was not made.
+    """
+
+    file_path = os.path.join(output['orphan_path'],constraint + '.tsv')
+
+    if not os.path.exists(file_path):
+        return None
+
+    return pd.read_csv(file_path,sep='\t',keep_default_na=False)
+
+# Used to add the titles and names which foreign keys refer to, but are missing
+def write_placeholders(table,append=True):
+    """
+    Write a placeholder row to table (e.g. Titles) for each of the missing IDs
+    foreign keys refer to, as written by write_orphans. Placeholder rows hold
+    nothing but the ID, and the values in PLACEHOLDER_VALUES.
+    """
+
+    ids = []
+    for keys in foreign_key_columns().values():
+        for constraint, position, parent in keys:
+            orphans = read_orphans(constraint)
+            if parent == table and orphans is not None:
+                ids.append(orphans.iloc[:,0])
+
+    if not ids:
+        return
+
+    ids = pd.concat(ids).drop_duplicates().sort_values()
+
+    print("\tAdding",len(ids),"placeholder rows to '"+table+"'")
+
+    columns = imdb_schema.table_columns()[table]
+    placeholders = pd.DataFrame({column: pd.Series([None]*len(ids),dtype=object)
+        for column in columns})
+    placeholders[columns[0]] = ids.to_numpy()
+    for column, value in PLACEHOLDER_VALUES.get(table,{}).items():
+        placeholders[column] = value
+
+    write_table(placeholders,table,append)
+
+# Used to report the orphans of every foreign key once the tables are made
+def write_orphan_report(orphan_path):
+    """
+    Write a report of the orphans written by write_orphans to
+    orphan_path/report.tsv, one row per foreign key, and print it.
+    """
+
+    output['orphan_path'] = orphan_path
+    columns = imdb_schema.table_columns()
+    report = []
+
+    for table, keys in imdb_schema.foreign_keys().items():
+        for constraint, key_columns, parent, parent_columns in keys:
+            orphans = read_orphans(constraint)
+            if orphans is not None:
+                report.append({'constraint': constraint, 'table': table,
+                    'column': key_columns[0], 'parent': parent,
+                    'orphan_ids': len(orphans),
+                    'orphan_rows': int(orphans['rows'].sum())})
+
+    report = pd.DataFrame(report,columns=['constraint','table','column',
+        'parent','orphan_ids','orphan_rows'])
+    write_tsv(report,os.path.join(orphan_path,'report.tsv'))
+
+    print('\n','Orphans (see',os.path.join(orphan_path,'report.tsv') + ')','\n')
+    print(report.to_string(index=False))
+
+# Subsets
+#--------
+# With --subset-percent, --subset-titles, --subset-types or --subset-years the
+# converter makes the tables of a small part of the IMDb data, for development
+# and tests, which still joins up: every title and name a row refers to is in
+# Titles and Names_. The titles of the subset are chosen first, by a pass
+# reading only the ID columns of the files (see write_subset_keys):
+# - the seed, the titles chosen by the options, e.g. 1% of the movies of the
+#   1990s. The percentage is chosen by a hash of the title_id, so the same
+#   titles are chosen in every run with the same seed
+# - the shows of the episodes of the seed, and the episodes of its shows
+# The people of the subset are those in title.principals.tsv and
+# title.crew.tsv for its titles. They are collected by the tasks converting
+# those files, see convert_file, so title.principals.tsv is read only once.
+# Each chunk of a file is then cut down to the rows of the subset's titles (or
+# names) before the tables are made, and rows whose foreign keys refer to
+# titles or names outside it, e.g. of Known_for, are left out of the tables
+# (see check_subset).
+
+# IMDb data files naming the people of the subset, with their name ID columns
+SUBSET_NAME_FILES = {'title.principals.tsv': ['nconst'],
+    'title.crew.tsv': ['directors', 'writers']}
+
+# Rows of the ID columns read at a time by write_subset_keys
+SUBSET_CHUNK_SIZE = 1000000
+
+def read_id_columns(data_path,file,columns,unzip=False,engine=None,
+    chunk_size=None):
+    """
+    Read columns of IMDb data file file in folder data_path, as strings, in
+    chunks of chunk_size rows (default: SUBSET_CHUNK_SIZE).
+    """
+
+    return read_imdb_file(open_imdb_file(os.path.join(data_path,file),unzip),
+        chunk_size or SUBSET_CHUNK_SIZE,None,engine or default_engine(),
+        dtype={column:'str' for column in columns},sep='\t',na_values='\\N',
+        quoting=IMDB_FILES[file]['quoting'],usecols=columns)
+
+def seed_titles(title_basics,subset):
+    """
+    True for the rows of title_basics (tconst, titleType and startYear, as a
+    number) in the seed of subset, a dict with any of 'percent', 'types' (a
+    list of title types), 'years' (first and last start year), 'titles' (a
+    list of tconsts, which are added to the others) and 'seed' (of the hash
+    choosing the percentage).
+    """
+
+    seed = np.ones(len(title_basics),dtype=bool)
+
+    if subset.get('types'):
+        seed &= title_basics['titleType'].isin(subset['types']).to_numpy()
+    if subset.get('years'):
+        first, last = subset['years']
+        seed &= title_basics['startYear'].between(first,last).fillna(
+            False).to_numpy(dtype=bool)
+    if subset.get('percent') is not None:
+        hashes = pd.util.hash_pandas_object(title_basics['tconst'],index=False,
+            hash_key='{:016d}'.format(subset.get('seed',0))).to_numpy()
+        seed &= hashes % 10000 < subset['percent']*100
+
+    if subset.get('titles'):
+        titles = title_basics['tconst'].isin(subset['titles']).to_numpy()
+        if any(subset.get(key) is not None for key in ['types','years',
+            'percent']):
+            seed |= titles
+        else:
+            seed = titles
+
+    return seed
+
+def name_ids(df,columns,integer_ids=False):
+    """
+    The name IDs in columns of DataFrame df, which may hold comma separated
+    lists of them (e.g. directors), without duplicates.
+    """
+
+    names = []
+    for column in columns:
+        ids = df[column].dropna()
+        if not pd.api.types.is_integer_dtype(ids):
+            ids = ids.str.split(',').explode()
+        names.append(ids)
+
+    names = pd.concat(names,ignore_index=True).drop_duplicates()
+
+    if integer_ids and not pd.api.types.is_integer_dtype(names):
+        names = parse_ids(names)
+
+    return names
+
+# Used to choose the titles and names of a subset, before the tables are made
+def write_subset_keys(data_path,subset_path,subset,name_files=(),unzip=False,
+    integer_ids=False,engine=None,chunk_size=None):
+    """
+    Find the titles of subset (see seed_titles) in the IMDb data files in
+    folder data_path, and write them to subset_path/Titles.keys (a pickled
+    Series), along with the IDs of name.basics.tsv to subset_path/Names_.keys.
+    The people of the subset in each of name_files (see SUBSET_NAME_FILES) are
+    written to subset_path/<file>.names, see write_subset_names.
+    """
+
+    os.makedirs(subset_path,exist_ok=True)
+
+    print('\n','Reading the IDs of title.basics.tsv ...','\n')
+
+    titles, seeds = [], []
+    for df in read_id_columns(data_path,'title.basics.tsv',['tconst',
+        'titleType','startYear'],unzip,engine,chunk_size):
+        df['startYear'] = pd.to_numeric(df['startYear'],errors='coerce')
+        titles.append(df['tconst'])
+        seeds.append(df['tconst'][seed_titles(df,subset)])
+    titles = pd.concat(titles,ignore_index=True)
+    seeds = pd.concat(seeds,ignore_index=True)
+
+    print('\n','Reading the IDs of title.episode.tsv ...','\n')
+
+    # The shows of the episodes of the seed, and the episodes of its shows
+    keys = [seeds]
+    for df in read_id_columns(data_path,'title.episode.tsv',['tconst',
+        'parentTconst'],unzip,engine,chunk_size):
+        linked = (df['tconst'].isin(seeds) | df['parentTconst'].isin(
+            seeds)).to_numpy()
+        keys += [df.loc[linked,'tconst'], df.loc[linked,'parentTconst']]
+    keys = pd.concat(keys,ignore_index=True).dropna().drop_duplicates()
+
+    # Shows missing from title.basics.tsv are left out
+    keys = keys[keys.isin(titles)].reset_index(drop=True)
+    del titles
+
+    print("\tSubset of",len(keys),"titles,",len(seeds),"chosen")
+
+    print('\n','Reading the IDs of name.basics.tsv ...','\n')
+
+    names = pd.concat([df['nconst'] for df in read_id_columns(data_path,
+        'name.basics.tsv',['nconst'],unzip,engine,chunk_size)],
+        ignore_index=True)
+
+    for file in name_files:
+
+        print('\n','Reading the IDs of '+file+' ...','\n')
+
+        people = [name_ids(df[df['tconst'].isin(keys).to_numpy()],
+            SUBSET_NAME_FILES[file])
+            for df in read_id_columns(data_path,file,
+            ['tconst'] + SUBSET_NAME_FILES[file],unzip,engine,chunk_size)]
+        people = pd.concat(people,ignore_index=True).drop_duplicates()
+        people = people[people.isin(names)]
+        if integer_ids:
+            people = parse_ids(people)
+        people.to_pickle(os.path.join(subset_path,file + '.names'))
+
+    if integer_ids:
+        keys, names = parse_ids(keys), parse_ids(names)
+
+    keys.to_pickle(os.path.join(subset_path,'Titles.keys'))
+    names.to_pickle(os.path.join(subset_path,'Names_.keys'))
+
+def read_subset_keys(subset_path,file):
+    """
+    The IDs of Titles and Names_ in the subset, written by write_subset_keys,
+    as a dict of pd.Index. For name.basics.tsv the names are those of the
+    people of the subset, otherwise they are every name.
+    """
+
+    keys = {'Titles': pd.Index(pd.read_pickle(os.path.join(subset_path,
+        'Titles.keys')))}
+
+    if file == 'name.basics.tsv':
+        names = [pd.read_pickle(os.path.join(subset_path,name_file + '.names'))
+            for name_file in SUBSET_NAME_FILES
+            if os.path.exists(os.path.join(subset_path,name_file + '.names'))]
+        keys['Names_'] = pd.Index(pd.concat(names,ignore_index=True) if names
+            else pd.Series([],dtype=object)).drop_duplicates()
+        print("\tSubset of",len(keys['Names_']),"names")
+    else:
+        keys['Names_'] = pd.Index(pd.read_pickle(os.path.join(subset_path,
+            'Names_.keys'))).drop_duplicates()
+
+    return keys
+
+def subset_rows(df,columns):
+    """
+    The rows of chunk df whose ID columns (e.g. tconst and nconst) are NULL or
+    in the subset, see read_subset_keys.
+    """
+
+    keep = np.ones(len(df),dtype=bool)
+
+    for column in columns:
+        keys = output['subset_keys']['Names_' if column == 'nconst' else
+            'Titles']
+        keep &= (keys.get_indexer(df[column]) >= 0) | df[column].isna(
+            ).to_numpy()
+
+    return df if keep.all() else df[keep]
+
+# Used to leave out the rows referring to titles or names outside the subset
+def check_subset(df,table):
+    """
+    Returns DataFrame df, rows of table, without the rows whose foreign keys
+    refer to titles or names outside the subset.
+    """
+
+    keep = np.ones(len(df),dtype=bool)
+
+    for constraint, position, parent in output['subset_foreign_keys'][table]:
+        ids = df.iloc[:,position]
+        keep &= ((output['subset_keys'][parent].get_indexer(ids) >= 0) |
+            ids.isna().to_numpy())
+
+    return df if keep.all() else df[keep]
+
+def write_subset_names(subset_path,file):
+    """
+    Write the people of the subset collected from the chunks of file,
+    output['subset_names'], to subset_path/<file>.names for the task of
+    name.basics.tsv, unless write_subset_keys has written them.
+    """
+
+    names_file = os.path.join(subset_path,file + '.names')
+
+    if not os.path.exists(names_file):
+        names = pd.concat(output['subset_names'],ignore_index=True)
+        names = names.drop_duplicates().reset_index(drop=True)
+        names[names.isin(output['subset_keys']['Names_'])].to_pickle(
+            names_file)
+
+    output['subset_names'] = None
+
+#-------------------------------------------------------------------------------
+
 # Functions to process IMDb data
 #-------------------------------
 
 # Create Aliases table
-def make_Aliases(title_akas):
+def make_Aliases(title_akas,append=False):
     # title.akas.tsv
     # FORMAT: ['titleId', 'ordering', 'title', 'region', 'language', 'types',
     # 'attributes', 'isOriginalTitle']
 
-    print("\tMaking 'Aliases' table")
+    if not append:
+        print("\tMaking 'Aliases' table")
 
     # Extract columns
     Aliases = title_akas[['titleId','ordering','title','region','language',
@@ -95,17 +1342,18 @@ def make_Aliases(title_akas):
     })
 
     # Output to file
-    Aliases.to_csv('Aliases.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Aliases,'Aliases',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Alias_types table
-def make_Alias_types(title_akas):
+def make_Alias_types(title_akas,append=False):
     # title.akas.tsv
     # FORMAT: ['titleId', 'ordering', 'title', 'region', 'language', 'types',
     # 'attributes', 'isOriginalTitle']
 
-    print("\tMaking 'Alias_types' table")
+    if not append:
+        print("\tMaking 'Alias_types' table")
 
     # Extract columns
     Alias_types = title_akas[['titleId','ordering','types']]
@@ -125,17 +1373,18 @@ def make_Alias_types(title_akas):
     Alias_types = Alias_types.dropna()
 
     # Output to file
-    Alias_types.to_csv('Alias_types.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Alias_types,'Alias_types',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Alias_attributes table
-def make_Alias_attributes(title_akas):
+def make_Alias_attributes(title_akas,append=False):
     # title.akas.tsv
     # FORMAT: ['titleId', 'ordering', 'title', 'region', 'language', 'types',
     # 'attributes', 'isOriginalTitle']
 
-    print("\tMaking 'Alias_attributes' table")
+    if not append:
+        print("\tMaking 'Alias_attributes' table")
 
     # Extract columns
     Alias_attributes =  title_akas[['titleId','ordering','attributes']]
@@ -155,16 +1404,17 @@ def make_Alias_attributes(title_akas):
     Alias_attributes = Alias_attributes.dropna()
 
     # Output to file
-    Alias_attributes.to_csv('Alias_attributes.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Alias_attributes,'Alias_attributes',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Directors and Writers tables
-def make_Directors_and_Writers(title_crew):
+def make_Directors_and_Writers(title_crew,append=False):
     # title.crew.tsv
     # FORMAT: ['tconst', 'directors', 'writers']
 
-    print("\tMaking 'Directors' and 'Writers' tables")
+    if not append:
+        print("\tMaking 'Directors' and 'Writers' tables")
 
     # Here we have directors and writers which contain a comma separated list of
     # nconst. We will output title_id (tconst), name_id (nconst)
@@ -189,18 +1439,24 @@ def make_Directors_and_Writers(title_crew):
     Directors = Directors.assign(name_id=Directors.name_id.str.split(',')).explode('name_id').reset_index(drop=True)
     Writers = Writers.assign(name_id=Writers.name_id.str.split(',')).explode('name_id').reset_index(drop=True)
 
+    # In integer ID mode (see encode_ids) the exploded IDs are parsed too
+    if has_integer_ids(Directors):
+        Directors['name_id'] = parse_ids(Directors['name_id'])
+        Writers['name_id'] = parse_ids(Writers['name_id'])
+
     # Output to file
-    Directors.to_csv('Directors.tsv',index=False,na_rep=r'\N',sep='\t')
-    Writers.to_csv('Writers.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Directors,'Directors',append)
+    write_table(Writers,'Writers',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Episode_belongs_to table
-def make_Episode_belongs_to(title_episode):
+def make_Episode_belongs_to(title_episode,append=False):
     # title.episode.tsv
     # FORMAT: ['tconst', 'parentTconst', 'seasonNumber', 'episodeNumber']
 
-    print("\tMaking 'Episode_belongs_to' table")
+    if not append:
+        print("\tMaking 'Episode_belongs_to' table")
 
     # No change other than column names
 
@@ -213,17 +1469,18 @@ def make_Episode_belongs_to(title_episode):
     })
 
     # Output to file
-    Episode_belongs_to.to_csv('Episode_belongs_to.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Episode_belongs_to,'Episode_belongs_to',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Names_ table
-def make_Names_(name_basics):
+def make_Names_(name_basics,append=False):
     # name.basics.tsv has columns:
     # FORMAT: ['nconst', 'primaryName', 'birthYear', 'deathYear',
     # 'primaryProfession', 'knownForTitles']
 
-    print("\tMaking 'Names_' table")
+    if not append:
+        print("\tMaking 'Names_' table")
 
     # Extract columns from name_basics for Names_ table
     Names_ = name_basics[['nconst','primaryName','birthYear','deathYear']]
@@ -237,17 +1494,18 @@ def make_Names_(name_basics):
     })
 
     # Output to file
-    Names_.to_csv('Names_.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Names_,'Names_',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Name_worked_as table
-def make_Name_worked_as(name_basics):
+def make_Name_worked_as(name_basics,append=False):
     # name.basics.tsv has columns:
     # FORMAT: ['nconst', 'primaryName', 'birthYear', 'deathYear',
     # 'primaryProfession', 'knownForTitles']
 
-    print("\tMaking 'Name_worked_as' table")
+    if not append:
+        print("\tMaking 'Name_worked_as' table")
 
     # Extract columns from name_basics for Name_worked_as table
     Name_worked_as = name_basics[['nconst','primaryProfession']]
@@ -265,17 +1523,18 @@ def make_Name_worked_as(name_basics):
     Name_worked_as = Name_worked_as.assign(profession=Name_worked_as.profession.str.split(',')).explode('profession').reset_index(drop=True)
 
     # Output to file
-    Name_worked_as.to_csv('Name_worked_as.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Name_worked_as,'Name_worked_as',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Known_for table
-def make_Known_for(name_basics):
+def make_Known_for(name_basics,append=False):
     # name.basics.tsv has columns:
     # FORMAT: ['nconst', 'primaryName', 'birthYear', 'deathYear',
     # 'primaryProfession', 'knownForTitles']
 
-    print("\tMaking 'Known_for' table")
+    if not append:
+        print("\tMaking 'Known_for' table")
 
     # Extract columns from name_basics for Known_for table
     Known_for = name_basics[['nconst','knownForTitles']]
@@ -292,17 +1551,22 @@ def make_Known_for(name_basics):
     # knownForTitles is a comma separated string, we need to 'explode' this
     Known_for = Known_for.assign(title_id=Known_for.title_id.str.split(',')).explode('title_id').reset_index(drop=True)
 
+    # In integer ID mode (see encode_ids) the exploded IDs are parsed too
+    if has_integer_ids(Known_for):
+        Known_for['title_id'] = parse_ids(Known_for['title_id'])
+
     # Output to file
-    Known_for.to_csv('Known_for.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Known_for,'Known_for',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Principals table
-def make_Principals(title_principals):
+def make_Principals(title_principals,append=False):
     # title.principals.tsv
     # FORMAT: ['tconst', 'ordering', 'nconst', 'category', 'job', 'characters']
 
-    print("\tMaking 'Principals' table")
+    if not append:
+        print("\tMaking 'Principals' table")
 
     # Extract columnns
     Principals = title_principals[['tconst','ordering','nconst','category','job']]
@@ -315,27 +1579,94 @@ def make_Principals(title_principals):
     })
 
     # Output to file
-    Principals.to_csv('Principals.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Principals,'Principals',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Had_role table
-def make_Had_role(title_principals):
-    # title.principals.tsv
-    # FORMAT: ['tconst', 'ordering', 'nconst', 'category', 'job', 'characters']
+# Used to parse the roles of title.principals.tsv
+def parse_roles(title_id,name_id,characters):
+    """
+    Parse the characters column of title.principals.tsv, e.g.
+    ["Mum","Tidy Ted","Fang"], into a DataFrame of the rows (title_id, name_id,
+    role_) of Had_role, one per role, before duplicates are dropped.
+
+    The roles are normalised as by parse_roles_pandas, but in one pass over the
+    bytes of the column rather than one pass per step: the characters "[] are
+    dropped, \\ is replaced by |, the roles are split on commas, one space is
+    removed from the start and end of each role, and they are given title
+    capitalisation. The titles and names of the roles are taken from title_id
+    and name_id, rows with NULL characters are dropped.
+
+    Falls back to parse_roles_pandas if pyarrow is not installed.
+    """
 
-    print("\tMaking 'Had_role' table")
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return parse_roles_pandas(title_id,name_id,characters)
 
-    # Extract columns
-    Had_role = title_principals[['tconst','nconst','characters']]
-
-    # Rename columns
-    Had_role =  Had_role.rename(columns={
-    'tconst':'title_id',
-    'nconst':'name_id',
-    'characters':'role_'
+    # Drop NULL entries (~50%)
+    rows = np.flatnonzero(characters.notna().to_numpy())
+    array = pa.array(characters.iloc[rows],type=pa.large_string())
+    if isinstance(array,pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    # The UTF-8 bytes of all of the entries and where each entry starts
+    offsets = np.frombuffer(array.buffers()[1],dtype=np.int64)[
+        array.offset:array.offset + len(array) + 1]
+    data = np.frombuffer(array.buffers()[2],dtype=np.uint8)[
+        offsets[0]:offsets[-1]]
+    offsets = offsets - offsets[0]
+
+    # Drop "[] and the commas between roles. Each role starts at the start of
+    # an entry or at a comma, moved back by the number of bytes dropped before
+    # it.
+    comma = data == ord(',')
+    drop = comma | (data == ord('"')) | (data == ord('[')) | (data == ord(']'))
+    dropped = np.concatenate([[0],np.cumsum(drop)])
+    commas = np.flatnonzero(comma)
+    bounds = np.sort(np.concatenate([offsets - dropped[offsets],
+        commas - dropped[commas]]))
+    counts = np.diff(np.concatenate([[0],np.cumsum(comma)])[offsets]) + 1
+
+    data = data[~drop]
+    data[data == ord('\\')] = ord('|')
+
+    # Drop a space at the start and at the end of each role
+    starts = bounds[:-1]
+    ends = bounds[1:] - 1
+    not_empty = ends >= starts
+    starts = starts[not_empty]
+    ends = ends[not_empty]
+    strip = np.zeros(len(data),dtype=bool)
+    strip[starts[data[starts] == ord(' ')]] = True
+    strip[ends[data[ends] == ord(' ')]] = True
+    stripped = np.concatenate([[0],np.cumsum(strip)])
+    bounds = bounds - stripped[bounds]
+    data = data[~strip]
+
+    roles = pc.utf8_title(pa.LargeStringArray.from_buffers(len(bounds) - 1,
+        pa.py_buffer(bounds),pa.py_buffer(data)))
+
+    rows = np.repeat(rows,counts)
+
+    return pd.DataFrame({
+        'title_id': title_id.iloc[rows].reset_index(drop=True),
+        'name_id': name_id.iloc[rows].reset_index(drop=True),
+        'role_': roles.to_pandas()
     })
 
+def parse_roles_pandas(title_id,name_id,characters):
+    """
+    Parse the roles of title.principals.tsv as parse_roles does, one pandas
+    string method at a time.
+    """
+
+    Had_role = pd.DataFrame({'title_id': title_id, 'name_id': name_id,
+        'role_': characters})
+
     # Drop NULL entries (~50%)
     Had_role = Had_role.dropna()
 
@@ -348,6 +1679,26 @@ def make_Had_role(title_principals):
     # and explode the list into separate entries
     Had_role = Had_role.assign(role_=Had_role.role_.str.split(',')).explode('role_').reset_index(drop=True)
 
+    # Ensure that every entry has title capitalisation, see make_Had_role
+    Had_role['role_'] = Had_role['role_'].str.title()
+
+    # Remove spaces at the start and end of an value
+    Had_role['role_'] = Had_role['role_'].str.replace('^ | $','',regex=True)
+
+    return Had_role
+
+def make_Had_role(title_principals,append=False):
+    # title.principals.tsv
+    # FORMAT: ['tconst', 'ordering', 'nconst', 'category', 'job', 'characters']
+
+    if not append:
+        print("\tMaking 'Had_role' table")
+
+    # role_ entries are formatted as ["Mum","Tidy Ted","Fang"], these are
+    # split into separate entries, see parse_roles
+    Had_role = parse_roles(title_principals['tconst'],
+        title_principals['nconst'],title_principals['characters'])
+
     # There is some duplicate data, this is easily seen
     #Had_role[Had_role.duplicated()]
     # See a specific example
@@ -361,26 +1712,25 @@ def make_Had_role(title_principals):
     # Also, MySQL cannot tell the difference between lower and upper case unless
     # you change the character set! There are some entries which differ only by
     # capitalisation, so we ensure that every entry has title capitalisation.
-    Had_role['role_'] = Had_role['role_'].str.title()
-
-    # Remove spaces at the start and end of an value
-    Had_role['role_'] = Had_role['role_'].str.replace('^ | $','',regex=True)
 
-    # Drop these duplicates
+    # Drop these duplicates. Duplicates always share a title_id, so when
+    # streaming this is done per chunk with chunks aligned on tconst (see
+    # read_imdb_file).
     Had_role.drop_duplicates(keep=False,inplace=True)
 
     # Output to file
-    Had_role.to_csv('Had_role.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Had_role,'Had_role',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Titles table
-def make_Titles(title_basics):
+def make_Titles(title_basics,append=False):
     # title.basics.tsv
     # FORMAT: ['tconst', 'titleType', 'primaryTitle', 'originalTitle',
     # 'isAdult', 'startYear', 'endYear', 'runtimeMinutes', 'genres']
 
-    print("\tMaking 'Titles' table")
+    if not append:
+        print("\tMaking 'Titles' table")
 
     # Extract columns from title_basics for Titles table
     Titles = title_basics[['tconst','titleType','primaryTitle',
@@ -399,17 +1749,18 @@ def make_Titles(title_basics):
     })
 
     # Output to file
-    Titles.to_csv('Titles.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Titles,'Titles',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Title_genres table
-def make_Title_genres(title_basics):
+def make_Title_genres(title_basics,append=False):
     # title.basics.tsv
     # FORMAT: ['tconst', 'titleType', 'primaryTitle', 'originalTitle',
     # 'isAdult', 'startYear', 'endYear', 'runtimeMinutes', 'genres']
 
-    print("\tMaking 'Title_genres' table")
+    if not append:
+        print("\tMaking 'Title_genres' table")
 
     # Extract columns
     Title_genres = title_basics[['tconst','genres']]
@@ -427,16 +1778,17 @@ def make_Title_genres(title_basics):
     Title_genres = Title_genres.assign(genre=Title_genres.genre.str.split(',')).explode('genre').reset_index(drop=True)
 
     # Output to file
-    Title_genres.to_csv('Title_genres.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Title_genres,'Title_genres',append)
 
 #-------------------------------------------------------------------------------
 
 # Create Title_ratings (just renaming columns)
-def make_Title_ratings(title_ratings):
+def make_Title_ratings(title_ratings,append=False):
     # title.ratings.tsv
     # FORMAT: ['tconst', 'averageRating', 'numVotes']
 
-    print("\tMaking 'Title_ratings' table")
+    if not append:
+        print("\tMaking 'Title_ratings' table")
 
     # Rename columns
     Title_ratings = title_ratings.rename(columns={
@@ -446,124 +1798,982 @@ def make_Title_ratings(title_ratings):
     })
 
     # Output to file
-    Title_ratings.to_csv('Title_ratings.tsv',index=False,na_rep=r'\N',sep='\t')
+    write_table(Title_ratings,'Title_ratings',append)
 
-#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+#-------------------------------------------------------------------------------
 
+# IMDb data files
+#----------------
 
+# Options used to read each IMDb data file with pd.read_csv, along with the
+# column chunks must be aligned on in streaming mode (see read_imdb_file), the
+# columns holding IMDb identifiers (see encode_ids) and the functions which make
+# tables from it. Low cardinality columns are read as categoricals, which hold
+# a small code per row rather than a python string.
+IMDB_FILES = {
 
-# Set path to IMDb data
-# ---------------------
-data_path = './imdb_data'
-print('Looking for IMDb data in: ',data_path,'\n')
+    # FORMAT: ['titleId', 'ordering', 'title', 'region', 'language', 'types',
+    # 'attributes', 'isOriginalTitle']
+    'title.akas.tsv': {
+        'dtype': {'titleId':'str', 'ordering':'int64', 'title':'str',
+        'region':'category', 'language':'category', 'types':'category',
+        'attributes':'category', 'isOriginalTitle':'Int64'},
+        'quoting': 3,
+        'key': None,
+        'ids': ['titleId'],
+        'make': [make_Aliases, make_Alias_types, make_Alias_attributes]
+    },
+
+    # FORMAT:  ['tconst', 'directors', 'writers']
+    'title.crew.tsv': {
+        'dtype': {'tconst':'str', 'directors':'str', 'writers':'str'},
+        'quoting': 0,
+        'key': None,
+        'ids': ['tconst'],
+        'make': [make_Directors_and_Writers]
+    },
 
+    # FORMAT: ['tconst', 'parentTconst', 'seasonNumber', 'episodeNumber']
+    'title.episode.tsv': {
+        'dtype': {'tconst':'str', 'parentTconst':'str', 'seasonNumber':'Int64',
+        'episodeNumber':'Int64'},
+        'quoting': 0,
+        'key': None,
+        'ids': ['tconst', 'parentTconst'],
+        'make': [make_Episode_belongs_to]
+    },
+
+    # FORMAT:  ['nconst', 'primaryName', 'birthYear', 'deathYear',
+    # 'primaryProfession', 'knownForTitles']
+    'name.basics.tsv': {
+        'dtype': {'nconst':'str', 'primaryName':'str', 'birthYear':'Int64',
+        'deathYear':'Int64', 'primaryProfession':'str', 'knownForTitles':'str'},
+        'quoting': 0,
+        'key': None,
+        'ids': ['nconst'],
+        'make': [make_Names_, make_Name_worked_as, make_Known_for]
+    },
 
-# Unzip IMDb data files
-#----------------------
-data_files = unzip_files(data_path)
+    # FORMAT: ['tconst', 'ordering', 'nconst', 'category', 'job', 'characters']
+    'title.principals.tsv': {
+        'dtype': {'tconst':'str', 'ordering':'int64', 'nconst':'str',
+        'category':'category', 'job':'str', 'characters':'str'},
+        'quoting': 0,
+        'key': 'tconst',
+        'ids': ['tconst', 'nconst'],
+        'make': [make_Principals, make_Had_role]
+    },
+
+    # FORMAT: ['tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult',
+    # 'startYear', 'endYear', 'runtimeMinutes', 'genres']
+    # quoting = 3 used to ignore quotation marks, done because in some cases the
+    # was one missing, e.g., primaryTitle was "Rolling in the Deep Dish
+    'title.basics.tsv': {
+        'dtype': {'tconst':'str', 'titleType':'category', 'primaryTitle':'str',
+        'originalTitle':'str', 'isAdult':'int64', 'startYear':'Int64',
+        'endYear':'Int64', 'runtimeMinutes':'Int64', 'genres':'str'},
+        'quoting': 3,
+        'key': None,
+        'ids': ['tconst'],
+        'make': [make_Titles, make_Title_genres]
+    },
 
+    # FORMAT: ['tconst', 'averageRating', 'numVotes']
+    'title.ratings.tsv': {
+        'dtype': {'tconst':'str', 'averageRating':'float64',
+        'numVotes':'int64'},
+        'quoting': 0,
+        'key': None,
+        'ids': ['tconst'],
+        'make': [make_Title_ratings]
+    },
+}
 
-# Read in and process all IMDb data files
-# ---------------------------------------
+#-------------------------------------------------------------------------------
 
-# title.akas.tsv
-#----------------
-# FORMAT: ['titleId', 'ordering', 'title', 'region', 'language', 'types',
-# 'attributes', 'isOriginalTitle']
-# Read title.akas
-print('\n','Reading title.akas.tsv ...','\n')
-title_akas = pd.read_csv(os.path.join(data_path,'title.akas.tsv'),
-    dtype = {'titleId':'str', 'ordering':'int', 'title':'str', 'region':'str',
-    'language':'str', 'types':'str','attributes':'str',
-    'isOriginalTitle':'Int64'},
-    sep='\t',na_values='\\N',quoting=3)
-# Make tables
-make_Aliases(title_akas)
-make_Alias_types(title_akas)
-make_Alias_attributes(title_akas)
-# Delete title_akas
-del title_akas
-
-# title.crew.tsv
-#----------------
-# FORMAT:  ['tconst', 'directors', 'writers']
-print('\n','Reading title.crew.tsv','\n')
-# Read title.crew
-title_crew = pd.read_csv(os.path.join(data_path,'title.crew.tsv'),sep='\t',na_values='\\N')
-# Make table
-make_Directors_and_Writers(title_crew)
-# Delete title_crew
-del title_crew
-
-# title.episode.tsv
-#------------------
-# FORMAT: ['tconst', 'parentTconst', 'seasonNumber', 'episodeNumber']
-print('\n','Reading title.episode.tsv ...','\n')
-# Read title.episode
-title_episode = pd.read_csv(os.path.join(data_path,'title.episode.tsv'),
-    dtype = {'tconst':'str', 'parentTconst':'str', 'seasonNumber':'Int64',
-    'episodeNumber':'Int64'},
-    sep='\t',na_values='\\N')
-# Make table
-make_Episode_belongs_to(title_episode)
-# Delete title_episode
-del title_episode
-
-# name.basics.tsv
-#-----------------
-# FORMAT:  ['nconst', 'primaryName', 'birthYear', 'deathYear',
-# 'primaryProfession', 'knownForTitles']
-print('\n','Reading name.basics.tsv ...','\n')
-# Read name.basics
-name_basics  = pd.read_csv(os.path.join(data_path,'name.basics.tsv'),
-    dtype = {'nconst':'str', 'primaryName':'str', 'birthYear':'Int64',
-    'deathYear':'Int64', 'primaryProfession':'str', 'knownForTitles':'str'},
-    sep='\t',na_values='\\N')
-# Make tables
-make_Names_(name_basics)
-make_Name_worked_as(name_basics)
-make_Known_for(name_basics)
-# Delete name_basics
-del name_basics
-
-# title.principals.tsv
-#---------------------
-# FORMAT: ['tconst', 'ordering', 'nconst', 'category', 'job', 'characters']
-print('\n','Reading title.principals.tsv ...','\n')
-# Read title.principals
-title_principals = pd.read_csv(os.path.join(data_path,'title.principals.tsv'),sep='\t',na_values='\\N')
-# Make tables
-make_Principals(title_principals)
-make_Had_role(title_principals)
-# Delete title_principals
-del title_principals
-
-# title.basics.tsv
-#------------------
-# FORMAT: ['tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult',
-# 'startYear', 'endYear', 'runtimeMinutes', 'genres']
-# quoting = 3 used to ignore quotation marks, done because in some cases the was
-# one missing, e.g., primaryTitle was "Rolling in the Deep Dish
-print('\n','Reading title.basics.tsv ...','\n')
-# Read title.basics
-title_basics = pd.read_csv(os.path.join(data_path,'title.basics.tsv'),
-    dtype = {'tconst':'str', 'titleType':'str', 'primaryTitle':'str',
-    'originalTitle':'str', 'isAdult':'int', 'startYear':'Int64',
-    'endYear':'Int64', 'runtimeMinutes':'Int64', 'genres':'str'},
-    sep='\t',na_values='\\N',quoting=3)
-# Make tables
-make_Titles(title_basics)
-make_Title_genres(title_basics)
-# Delete title_basics
-del title_basics
-
-# title.ratings.tsv
-#-------------------
-# FORMAT: ['tconst', 'averageRating', 'numVotes']
-print('\n','Reading title.ratings.tsv ...','\n')
-# Read title.ratings
-title_ratings = pd.read_csv(os.path.join(data_path,'title.ratings.tsv'),sep='\t',na_values='\\N')
-# Make table
-make_Title_ratings(title_ratings)
-# Delete title_ratings
-del title_ratings
+# Summary tables
+#---------------
+# The queries of SQL_Queries_1.sql and MySQL_IMDb_visualisation.ipynb keep
+# computing the same aggregates over the largest tables, e.g. the number of
+# movies in each genre (Query 3) or the average episode rating of each season
+# of The X-Files (Query 24). With --summaries the converter makes these as
+# small tables while the data is in memory (see imdb-summary-tables.sql):
+# - Genre_counts       titles of each type in each genre
+# - Genre_year_counts  titles of each type in each genre, per start year
+# - Season_ratings     episodes, and their average rating, in each season of
+#                      each show
+# - Leading_people     the first billed actor and actress of each movie, as in
+#                      the notebook, with their age
+#
+# A summary is made from the chunks of one IMDb data file, along with parts of
+# other files (e.g. the start year of each movie), which the tasks of those
+# files write to parts_path. Each chunk gives a partial summary, these are
+# added up on the keys of the summary once the file has been read.
+
+# Used to make the parts of the IMDb data files needed by other files' summaries
+def part_Movies(title_basics):
+    """
+    Start year of each movie, indexed by title_id.
+    """
+
+    movies = title_basics.loc[title_basics['titleType'] == 'movie',
+        ['tconst','startYear']].dropna()
+
+    return movies.rename(columns={'tconst':'title_id',
+        'startYear':'start_year'}).set_index('title_id')
+
+def part_Births(name_basics):
+    """
+    Birth year of each person, where it is known, indexed by name_id.
+    """
+
+    births = name_basics[['nconst','birthYear']].dropna()
+
+    return births.rename(columns={'nconst':'name_id',
+        'birthYear':'birth_year'}).set_index('name_id')
+
+def part_Ratings(title_ratings):
+    """
+    Average rating and number of votes of each title, indexed by title_id.
+    """
+
+    return title_ratings.rename(columns={'tconst':'title_id',
+        'averageRating':'average_rating',
+        'numVotes':'num_votes'}).set_index('title_id')
+
+#-------------------------------------------------------------------------------
+
+# Used to make the partial summaries of a chunk of an IMDb data file
+def title_genres(title_basics):
+    """
+    The type, start year and genre of each title in each of its genres.
+    """
+
+    genres = title_basics[['titleType','startYear','genres']].dropna(
+        subset=['genres'])
+    genres = genres.assign(genres=genres.genres.str.split(',')).explode(
+        'genres')
+
+    return genres.rename(columns={'titleType':'title_type',
+        'startYear':'start_year','genres':'genre'})
+
+def summarise_Genre_counts(title_basics,parts):
+    # Query 3: SELECT genre, num_titles FROM Genre_counts
+    # WHERE title_type = 'movie' ORDER BY num_titles DESC;
+
+    return title_genres(title_basics).groupby(['title_type','genre'],
+        observed=True,dropna=False).size().rename('num_titles').reset_index()
+
+def summarise_Genre_year_counts(title_basics,parts):
+    # Genre movie count vs year of the notebook
+
+    return title_genres(title_basics).groupby(['title_type','start_year',
+        'genre'],observed=True,dropna=False).size().rename(
+        'num_titles').reset_index()
+
+def summarise_Season_ratings(title_episode,parts):
+    # Query 24 for any show, e.g. The X-Files
+
+    ratings = parts['Ratings'].reindex(title_episode['tconst'].to_numpy())
+
+    episodes = pd.DataFrame({
+        'parent_tv_show_title_id': title_episode['parentTconst'].to_numpy(),
+        'season_number': title_episode['seasonNumber'].array,
+        'num_episodes': 1,
+        'num_rated_episodes': ratings['average_rating'].notna().to_numpy(),
+        'rating_sum': ratings['average_rating'].fillna(0).to_numpy(),
+        'num_votes': ratings['num_votes'].fillna(0).to_numpy()})
+
+    return episodes.groupby(['parent_tv_show_title_id','season_number'],
+        dropna=False).sum().reset_index()
+
+def finish_Season_ratings(Season_ratings):
+    """
+    Average rating of the rated episodes of each season, from their sum.
+    """
+
+    Season_ratings['average_rating'] = (Season_ratings['rating_sum']/
+        Season_ratings['num_rated_episodes'].where(
+        Season_ratings['num_rated_episodes'] > 0))
+    Season_ratings['num_votes'] = Season_ratings['num_votes'].astype('int64')
+
+    return Season_ratings[['parent_tv_show_title_id','season_number',
+        'num_episodes','num_rated_episodes','average_rating','num_votes']]
+
+def summarise_Leading_people(title_principals,parts):
+    # The Leading_people table of the notebook (for movies of every year), with
+    # the name_id and age of each person. Chunks are aligned on tconst, so the
+    # principals of a movie are all in the same chunk.
+
+    people = title_principals.loc[title_principals['category'].isin(
+        ['actor','actress']),['tconst','ordering','nconst','category']]
+
+    people = people.assign(
+        start_year=parts['Movies']['start_year'].reindex(
+            people['tconst'].to_numpy()).array,
+        birth_year=parts['Births']['birth_year'].reindex(
+            people['nconst'].to_numpy()).array).dropna(
+        subset=['start_year','birth_year'])
+
+    # First billed actor and actress of each movie
+    people = people.sort_values('ordering',kind='stable').drop_duplicates(
+        ['tconst','category'])
+
+    return pd.DataFrame({'start_year': people['start_year'],
+        'title_id': people['tconst'],
+        'job_category': people['category'].astype(str),
+        'ordering': people['ordering'],
+        'name_id': people['nconst'],
+        'age': people['start_year'] - people['birth_year']})
+
+def finish_Leading_people(Leading_people):
+    """
+    Order Leading_people as the notebook does.
+    """
+
+    return Leading_people.sort_values(['start_year','title_id','job_category'],
+        kind='stable').reset_index(drop=True)
+
+#-------------------------------------------------------------------------------
+
+# Parts of the IMDb data files needed by the summaries of other files, with the
+# IMDb data file and the function making them from its chunks
+SUMMARY_PARTS = {
+    'Movies': {'file': 'title.basics.tsv', 'make': part_Movies},
+    'Births': {'file': 'name.basics.tsv', 'make': part_Births},
+    'Ratings': {'file': 'title.ratings.tsv', 'make': part_Ratings},
+}
+
+# Summary tables, with the IMDb data file they are made from, the parts of
+# other files they need, the function making the partial summary of a chunk,
+# the keys the partial summaries are added up on (or None if each chunk gives
+# its own rows) and the function finishing the summary.
+SUMMARY_TABLES = {
+    'Genre_counts': {'file': 'title.basics.tsv', 'parts': [],
+        'summarise': summarise_Genre_counts,
+        'keys': ['title_type','genre'], 'finish': None},
+    'Genre_year_counts': {'file': 'title.basics.tsv', 'parts': [],
+        'summarise': summarise_Genre_year_counts,
+        'keys': ['title_type','start_year','genre'], 'finish': None},
+    'Season_ratings': {'file': 'title.episode.tsv', 'parts': ['Ratings'],
+        'summarise': summarise_Season_ratings,
+        'keys': ['parent_tv_show_title_id','season_number'],
+        'finish': finish_Season_ratings},
+    'Leading_people': {'file': 'title.principals.tsv',
+        'parts': ['Movies','Births'], 'summarise': summarise_Leading_people,
+        'keys': None, 'finish': finish_Leading_people},
+}
+
+def write_parts(parts_path):
+    """
+    Write the parts made from the chunks of the file being converted,
+    output['parts'], to parts_path/<part>.part (a pickled DataFrame).
+    """
+
+    for part, chunks in output['parts'].items():
+        pd.concat(chunks).to_pickle(os.path.join(parts_path,part + '.part'))
+
+    output['parts'] = {}
+
+def write_summaries():
+    """
+    Add up the partial summaries of the chunks of the file being converted,
+    output['summaries'], and write the summary tables.
+    """
+
+    for table, partials in output['summaries'].items():
+
+        print("\tMaking '"+table+"' table")
+
+        summary = SUMMARY_TABLES[table]
+        df = pd.concat(partials,ignore_index=True)
+        if summary['keys'] is not None:
+            df = df.groupby(summary['keys'],observed=True,dropna=False).sum(
+                ).reset_index()
+        if summary['finish'] is not None:
+            df = summary['finish'](df)
+
+        write_table(df,table)
+
+    output['summaries'] = {}
+
+#-------------------------------------------------------------------------------
+
+# Used to sort the tables by their primary keys, see --sort-by-key
+def sort_keys():
+    """
+    Primary key of each table in imdb-add-constraints.sql, as the positions of
+    its columns (the column names of the TSV files are not always those of the
+    database, e.g. title_id is episode_title_id in Episode_belongs_to).
+    """
+
+    columns = imdb_schema.table_columns()
+
+    return {table: [columns[table].index(column) for column in key]
+        for table, key in imdb_schema.primary_keys().items()}
+
+#-------------------------------------------------------------------------------
+
+# Used to select the tables to make, see --only
+def select_makes(file,only=None):
+    """
+    The functions making the tables of IMDb data file file in IMDB_FILES, or if
+    only is given (a list of tables, e.g. ['Had_role']) those making a table in
+    only.
+    """
+
+    makes = IMDB_FILES[file]['make']
+
+    if only is None:
+        return makes
+
+    # e.g. make_Directors_and_Writers makes Directors and Writers
+    return [make for make in makes
+        if set(make.__name__[len('make_'):].split('_and_')) & set(only)]
+
+# Read an IMDb data file and make its tables
+def convert_file(data_path,file,chunk_size=None,unzip=False,integer_ids=False,
+    lookup_tables=False,lookup_path=None,formats=('tsv',),compression=None,
+    row_group_size=None,engine=None,cache_path=None,cache_size=None,only=None,
+    mysql=None,sort_by_key=False,orphans=None,orphan_path='./orphans',
+    summaries=(),parts_path=None,search_path=None,graph_path=None,
+    telemetry=None,subset=None,subset_path=None):
+    """
+    Read the IMDb data file file (e.g. 'title.akas.tsv') in folder data_path
+    and make the tables listed for it in IMDB_FILES, or only those in list
+    only. If integer_ids is True the IMDb identifiers are output as integers.
+    If lookup_tables is True the low cardinality columns are output as codes,
+    along with their lookup tables, keeping the codes of the lookup tables in
+    folder lookup_path if given. The tables are written in each of formats,
+    see write_table. The file is parsed with engine, 'pyarrow' or 'c', see
+    read_imdb_file (default: see default_engine). If cache_path is given the
+    parsed file is read from, or added to, the cache in that folder, which is
+    kept within cache_size bytes (see read_cached_imdb_file). With the 'mysql'
+    format the tables are loaded into the IMDb database with an
+    imdb_loader.Loader(**mysql), e.g. mysql={'user': 'root', 'connections': 2}.
+
+    If sort_by_key is True each table is sorted by its primary key (from
+    imdb-add-constraints.sql), so that MySQL can load it into a table which
+    already has its primary key in key order, see imdb_loader.build. When
+    streaming only each chunk is sorted.
+
+    If orphans is given ('report', 'drop' or 'placeholder') the foreign keys
+    of the tables are checked, with the IDs written to orphan_path by
+    write_parent_keys, and their orphans written there, see check_orphans.
+
+    The summary tables in summaries (see SUMMARY_TABLES) made from file are
+    made too, with the parts of other files written to parts_path by their
+    tasks. The parts of file needed by the summaries of other files are
+    written there.
+
+    If search_path is given the substring search index of Had_role.role_,
+    Titles.primary_title and Names_.name_ is written to that folder, see
+    imdb_search.py. If graph_path is given the graph of Principals is saved
+    to that folder, see imdb_graph.py.
+
+    If telemetry is given, e.g. {'path': 'telemetry.jsonl'}, each read of file
+    and each make and write is recorded by an imdb_telemetry.Telemetry(
+    **telemetry), see stage.
+
+    If subset is given (see seed_titles) only the rows of the titles and names
+    of the subset written to subset_path by write_subset_keys are converted.
+    The people of the subset found in the files in SUBSET_NAME_FILES are
+    written there for name.basics.tsv, see write_subset_names.
+    """
+
+    print('\n','Reading '+file+' ...','\n')
+
+    options = IMDB_FILES[file]
+
+    output['lookup_tables'] = lookup_tables
+    output['lookups'] = {}
+    output['lookup_path'] = lookup_path
+    output['formats'] = list(formats)
+    output['compression'] = compression
+    output['row_group_size'] = row_group_size
+    output['sort_keys'] = sort_keys() if sort_by_key else {}
+    output['orphans'] = orphans
+    output['orphan_path'] = orphan_path
+    output['foreign_keys'] = foreign_key_columns() if orphans else {}
+    output['parent_keys'] = {}
+    output['orphan_counts'] = {}
+    output['search_path'] = search_path
+    output['graph_edges'] = [] if graph_path is not None else None
+    output['subset_keys'] = (read_subset_keys(subset_path,file) if subset
+        else {})
+    output['subset_foreign_keys'] = foreign_key_columns() if subset else {}
+    output['subset_names'] = ([] if subset and file in SUBSET_NAME_FILES
+        else None)
+    if telemetry:
+        import imdb_telemetry
+        output['telemetry'] = imdb_telemetry.Telemetry(**telemetry)
+
+    file_path = os.path.join(data_path,file)
+    read_options = dict(dtype=options['dtype'],sep='\t',na_values='\\N',
+        quoting=options['quoting'])
+
+    # Bytes read by this process before the file is opened, for the progress
+    # of the read
+    if output['telemetry'] is not None:
+        read_start = imdb_telemetry.io_counters()[0]
+
+    if cache_path is None:
+        chunks = read_imdb_file(open_imdb_file(file_path,unzip),chunk_size,
+            options['key'],engine or default_engine(),**read_options)
+    else:
+        chunks = read_cached_imdb_file(cache_path,file_path,chunk_size,
+            options['key'],unzip,engine or default_engine(),cache_size,
+            **read_options)
+
+    if output['telemetry'] is not None:
+        # Size of the file read, as in open_imdb_file, for the progress of the
+        # read (not known when read from the cache)
+        file_size = None
+        if cache_path is None:
+            file_size = os.path.getsize(file_path + '.gz' if not unzip and
+                os.path.exists(file_path + '.gz') else file_path)
+        chunks = output['telemetry'].read(chunks,file,file_size,read_start)
+
+    makes = select_makes(file,only)
+
+    # Parts of file needed by the summaries of other files, then the summaries
+    # made from file, with the parts of other files they need
+    make_parts = sorted({part for table in summaries
+        for part in SUMMARY_TABLES[table]['parts']
+        if SUMMARY_PARTS[part]['file'] == file})
+    summaries = [table for table in summaries
+        if SUMMARY_TABLES[table]['file'] == file]
+    parts = {part: pd.read_pickle(os.path.join(parts_path,part + '.part'))
+        for table in summaries for part in SUMMARY_TABLES[table]['parts']}
+    output['summaries'] = {}
+    output['parts'] = {}
+
+    if 'mysql' in formats:
+        import imdb_loader
+        output['loader'] = imdb_loader.Loader(**(mysql or {}))
+
+    try:
+        for i, df in enumerate(chunks):
+
+            if integer_ids:
+                df = encode_ids(df,options['ids'])
+
+            # Rows of the subset, and its people
+            if subset:
+                df = subset_rows(df,options['ids'])
+            if output['subset_names'] is not None:
+                output['subset_names'].append(name_ids(df,
+                    SUBSET_NAME_FILES[file],integer_ids))
+
+            # Make tables
+            for make in makes:
+                with stage('make',make.__name__,rows_in=len(df)):
+                    make(df,append=i>0)
+
+            # Make the partial summaries, and the parts other files need
+            for table in summaries:
+                output['summaries'].setdefault(table,[]).append(
+                    SUMMARY_TABLES[table]['summarise'](df,parts))
+            for part in make_parts:
+                output['parts'].setdefault(part,[]).append(
+                    SUMMARY_PARTS[part]['make'](df))
+
+        if output['subset_names'] is not None:
+            write_subset_names(subset_path,file)
+
+        if summaries:
+            write_summaries()
+        if make_parts:
+            write_parts(parts_path)
+
+        if output['graph_edges']:
+            import imdb_graph
+            imdb_graph.write_graph(output['graph_edges'],graph_path)
+            output['graph_edges'] = None
+
+        if orphans:
+            write_orphans()
+
+        # Once the tables referring to them are made, see make_tasks
+        if orphans == 'placeholder':
+            for make in makes:
+                if make.__name__[len('make_'):] in PARENT_FILES:
+                    write_placeholders(make.__name__[len('make_'):])
+
+        if lookup_tables:
+            write_lookups()
+
+    finally:
+        close_writers()
+
+        # Wait for the tables to load
+        if output['loader'] is not None:
+            output['loader'].close()
+            output['loader'] = None
+
+        if output['telemetry'] is not None:
+            output['telemetry'].close()
+            output['telemetry'] = None
+
+#-------------------------------------------------------------------------------
+
+# Pipeline
+#---------
+
+# Rough factors used to estimate the memory needed to convert a file: the size
+# of a gzipped IMDb file once unzipped, and the size of a DataFrame (with its
+# python string objects) plus the tables made from it, per byte of TSV.
+GZIP_RATIO = 4
+MEMORY_PER_BYTE = 6
+
+def estimate_memory(data_path,file,chunk_size=None,unzip=False):
+    """
+    Rough estimate, in bytes, of the memory needed by convert_file to convert
+    the IMDb data file file in folder data_path.
+    """
+
+    file_path = os.path.join(data_path,file)
+
+    if not unzip and os.path.exists(file_path + '.gz'):
+        size = GZIP_RATIO*os.path.getsize(file_path + '.gz')
+    else:
+        size = os.path.getsize(file_path)
+
+    # In streaming mode only a chunk is held at a time, estimate its size from
+    # the length of the first lines of the file
+    if chunk_size is not None:
+        with open_imdb_file(file_path,unzip) as f:
+            sample = f.read(2**20)
+        line_size = len(sample)/max(sample.count(b'\n'),1)
+        size = min(size,chunk_size*line_size)
+
+    return int(MEMORY_PER_BYTE*size)
+
+#-------------------------------------------------------------------------------
+
+def make_tasks(data_path,chunk_size=None,unzip=False,**options):
+    """
+    Make the conversion tasks, one per IMDb data file with tables to make,
+    passing options on to convert_file. Returns a dict mapping a task name to
+    a dict with the task's function, args, kwargs, the names of the tasks it
+    depends on and its estimated memory.
+
+    When checking for orphans (see check_orphans) every task depends on a
+    first task reading the IDs of Titles and Names_. With placeholders the
+    tasks making Titles and Names_ also depend on those making the tables
+    which refer to them. The tasks making summary tables depend on those
+    making the parts they need.
+
+    With a subset every task depends on a first task choosing its titles (see
+    write_subset_keys), and the task converting name.basics.tsv on those
+    finding its people (see SUBSET_NAME_FILES). The first task finds them
+    instead in the files which are not converted, or whose task waits for
+    name.basics.tsv's.
+    """
+
+    tasks = {}
+    orphans = options.get('orphans')
+    subset = options.get('subset')
+
+    for file in IMDB_FILES:
+        if not select_makes(file,options.get('only')):
+            continue
+        tasks[file] = {
+            'function': convert_file,
+            'args': (data_path,file),
+            'kwargs': dict(chunk_size=chunk_size,unzip=unzip,**options),
+            'depends': ((['parent keys'] if orphans else []) +
+                (['subset keys'] if subset else [])),
+            'memory': estimate_memory(data_path,file,chunk_size,unzip)
+        }
+
+    # The summaries of a file need the parts of other files, see write_parts
+    for table in options.get('summaries',()):
+        for part in SUMMARY_TABLES[table]['parts']:
+            tasks[SUMMARY_TABLES[table]['file']]['depends'].append(
+                SUMMARY_PARTS[part]['file'])
+
+    if orphans == 'placeholder':
+        foreign_keys = foreign_key_columns()
+        tables = {file: [table for make in select_makes(file,options.get('only'))
+            for table in make.__name__[len('make_'):].split('_and_')]
+            for file in tasks}
+        # Tables each task's tables refer to
+        parents = {file: {key[2] for table in tables[file]
+            for key in foreign_keys.get(table,[])} for file in tasks}
+        for file in tasks:
+            for other in tasks:
+                if other != file and parents[other] & set(tables[file]):
+                    tasks[file]['depends'].append(other)
+
+    if subset:
+        name_files = []
+        for file in SUBSET_NAME_FILES:
+            if 'name.basics.tsv' not in tasks:
+                continue
+            if (file in tasks and
+                'name.basics.tsv' not in tasks[file]['depends']):
+                tasks['name.basics.tsv']['depends'].append(file)
+            else:
+                name_files.append(file)
+        # Only the ID columns are read, and it runs before any other task
+        tasks['subset keys'] = {
+            'function': write_subset_keys,
+            'args': (data_path,options['subset_path'],subset),
+            'kwargs': dict(name_files=name_files,unzip=unzip,
+                integer_ids=options.get('integer_ids'),
+                engine=options.get('engine'),chunk_size=chunk_size),
+            'depends': [],
+            'memory': 0
+        }
+
+    if orphans:
+        # Only the ID columns are read, and it runs before any other task
+        tasks['parent keys'] = {
+            'function': write_parent_keys,
+            'args': (data_path,options.get('orphan_path','./orphans')),
+            'kwargs': dict(unzip=unzip,integer_ids=options.get('integer_ids'),
+                engine=options.get('engine')),
+            'depends': [],
+            'memory': 0
+        }
+
+    return tasks
+
+#-------------------------------------------------------------------------------
+
+def run_tasks(tasks,workers=1,memory_budget=None):
+    """
+    Run tasks (see make_tasks) on a pool of workers processes, each task once
+    all of the tasks it depends on have finished.
+
+    If memory_budget (bytes) is given a task is only started if the estimated
+    memory of the running tasks plus its own is within the budget, e.g., two
+    large files such as title.principals.tsv and title.akas.tsv are not
+    converted at the same time unless there is room for both. A task larger
+    than the budget is still run, on its own.
+    """
+
+    for name, task in tasks.items():
+        for depend in task['depends']:
+            if depend not in tasks:
+                raise ValueError('Task ' + name + ' depends on unknown task ' +
+                    depend)
+
+    # Start the largest tasks first
+    pending = sorted(tasks,key=lambda name: -tasks[name]['memory'])
+    done = set()
+
+    def ready(name,running,memory):
+        return (all(depend in done for depend in tasks[name]['depends'])
+            and (memory_budget is None or not running
+            or memory + tasks[name]['memory'] <= memory_budget))
+
+    # Run in this process, one task at a time
+    if workers == 1:
+        while pending:
+            name = next((name for name in pending if ready(name,False,0)),None)
+            if name is None:
+                raise ValueError('Tasks have circular dependencies: ' +
+                    ', '.join(pending))
+            tasks[name]['function'](*tasks[name]['args'],
+                **tasks[name]['kwargs'])
+            pending.remove(name)
+            done.add(name)
+        return
+
+    running = {}
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+
+        while pending or running:
+
+            # Start as many ready tasks as we can
+            for name in list(pending):
+                memory = sum(tasks[n]['memory'] for n in running.values())
+                if len(running) < workers and ready(name,running,memory):
+                    future = pool.submit(tasks[name]['function'],
+                        *tasks[name]['args'],**tasks[name]['kwargs'])
+                    running[future] = name
+                    pending.remove(name)
+
+            if not running:
+                raise ValueError('Tasks have circular dependencies: ' +
+                    ', '.join(pending))
+
+            # Wait for a task to finish
+            finished, _ = concurrent.futures.wait(running,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in finished:
+                # Raises any exception from the task
+                future.result()
+                done.add(running.pop(future))
+
+#-------------------------------------------------------------------------------
+
+def total_memory():
+    """
+    Total physical memory in bytes, or None if it cannot be found.
+    """
+
+    try:
+        return os.sysconf('SC_PAGE_SIZE')*os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+#-------------------------------------------------------------------------------
+
+def convert(data_path='./imdb_data',workers=1,memory_budget=None,**options):
+    """
+    Convert the IMDb data files in folder data_path to TSV files (and other
+    formats) for the IMDb database, which are written to the current directory.
+    options are passed on to convert_file, see main for a description of all of
+    the arguments. With telemetry the summary of the stages recorded is printed
+    at the end, see imdb_telemetry.print_summary.
+    """
+
+    print('Looking for IMDb data in: ',data_path,'\n')
+
+    if options.get('only') is not None:
+        tables = [table for file in IMDB_FILES for make in select_makes(file)
+            for table in make.__name__[len('make_'):].split('_and_')]
+        for table in options['only']:
+            if table not in tables:
+                raise ValueError('Unknown table: ' + table)
+
+    # Unzip IMDb data files
+    if options.get('unzip'):
+        unzip_files(data_path)
+
+    # Summary tables of the files converted, see SUMMARY_TABLES
+    if options.get('summaries'):
+        if options.get('orphans') == 'placeholder':
+            raise ValueError('Summary tables cannot be made with orphan '
+                'placeholders, title.principals.tsv would wait for the parts '
+                'of title.basics.tsv and name.basics.tsv, and they for it')
+        files = [file for file in IMDB_FILES
+            if select_makes(file,options.get('only'))]
+        options['summaries'] = [table
+            for table, summary in SUMMARY_TABLES.items()
+            if summary['file'] in files and all(SUMMARY_PARTS[part]['file']
+            in files for part in summary['parts'])]
+        options['parts_path'] = tempfile.mkdtemp(prefix='imdb_parts_')
+    else:
+        options['summaries'] = []
+
+    orphan_path = options.get('orphan_path','./orphans')
+    if options.get('orphans'):
+        # Orphans of an earlier run
+        for keys in imdb_schema.foreign_keys().values():
+            for constraint, columns, parent, parent_columns in keys:
+                if os.path.exists(os.path.join(orphan_path,constraint + '.tsv')):
+                    os.remove(os.path.join(orphan_path,constraint + '.tsv'))
+
+    # IDs of the subset, see write_subset_keys
+    if options.get('subset'):
+        options['subset_path'] = tempfile.mkdtemp(prefix='imdb_subset_')
+
+    # Telemetry of an earlier run
+    telemetry = options.get('telemetry')
+    if telemetry and os.path.exists(telemetry['path']):
+        os.remove(telemetry['path'])
+
+    tasks = make_tasks(data_path,**options)
+
+    try:
+        run_tasks(tasks,workers,memory_budget)
+    finally:
+        for table in PARENT_FILES:
+            if os.path.exists(os.path.join(orphan_path,table + '.keys')):
+                os.remove(os.path.join(orphan_path,table + '.keys'))
+        if options.get('parts_path'):
+            shutil.rmtree(options['parts_path'],ignore_errors=True)
+        if options.get('subset_path'):
+            shutil.rmtree(options['subset_path'],ignore_errors=True)
+
+    if options.get('orphans'):
+        write_orphan_report(orphan_path)
+
+    if telemetry and os.path.exists(telemetry['path']):
+        import imdb_telemetry
+        imdb_telemetry.print_summary(telemetry['path'])
+
+#-------------------------------------------------------------------------------
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Convert the IMDb data files to TSV files for the IMDb database.')
+    parser.add_argument('--data-path',default='./imdb_data',
+        help='folder containing the IMDb data files (default: ./imdb_data)')
+    # Streaming mode: read each IMDb data file and build each table in chunks
+    # of this many rows, e.g. 1000000. Peak memory is then set by the chunk
+    # size rather than by the size of the data files. The output is the same as
+    # when each file is read whole (the default).
+    parser.add_argument('--chunk-size',type=int,default=None,
+        help='read the IMDb data files in chunks of this many rows')
+    # By default the gzipped IMDb data files are read directly, see
+    # open_imdb_file
+    parser.add_argument('--unzip',action='store_true',
+        help='unzip the IMDb data files to disk before reading them')
+    # The IMDb data files are converted in parallel, one per worker process
+    parser.add_argument('--workers',type=int,default=os.cpu_count() or 1,
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--memory-budget',type=float,default=None,
+        help='memory, in GB, the workers may use together (default: total '
+        'physical memory)')
+    # Output tconst and nconst as integers, for imdb-create-tables-integer-ids.sql
+    parser.add_argument('--integer-ids',action='store_true',
+        help='output IMDb identifiers as integers, e.g. tt0165362 as 165362')
+    # Output low cardinality columns as codes, for imdb-lookup-tables.sql
+    parser.add_argument('--lookup-tables',action='store_true',
+        help='output low cardinality columns, e.g. genre, as codes along with '
+        'lookup tables')
+    parser.add_argument('--lookup-path',default=None,
+        help='folder of the lookup tables of an earlier conversion, whose '
+        'codes are kept (default: codes start at 1)')
+    # Output formats, TSV is needed for imdb-load-data.sql
+    parser.add_argument('--formats',default='tsv',
+        help='comma separated list of output formats: tsv, parquet, arrow, '
+        'mysql (default: tsv)')
+    parser.add_argument('--compression',default=None,
+        help='compression of parquet and arrow files, e.g. zstd, snappy, lz4, '
+        'none (default: zstd for parquet, none for arrow)')
+    parser.add_argument('--row-group-size',type=int,default=None,
+        help='rows per parquet row group or arrow record batch')
+    # pyarrow parses each file on all cores, pd.read_csv ('c') on one
+    parser.add_argument('--engine',choices=['pyarrow','c'],default=None,
+        help='CSV parser (default: pyarrow if it is installed, otherwise c)')
+    # Sort the tables in the order MySQL stores them, see imdb_loader.build
+    parser.add_argument('--sort-by-key',action='store_true',
+        help='sort each table by its primary key')
+    # Connection to the IMDb database for the 'mysql' format, see imdb_loader.py
+    parser.add_argument('--mysql-host',default='localhost')
+    parser.add_argument('--mysql-user',default='root')
+    parser.add_argument('--mysql-database',default='IMDb')
+    parser.add_argument('--load-connections',type=int,default=2,
+        help='connections per worker used to load tables into MySQL '
+        '(default: 2)')
+    # Cache of the parsed IMDb data files, see read_cached_imdb_file
+    parser.add_argument('--cache-path',default=None,
+        help='folder to cache the parsed IMDb data files in (default: no '
+        'cache)')
+    parser.add_argument('--cache-size',type=float,default=10,
+        help='disk space, in GB, the cache may use (default: 10)')
+    # e.g. --only Had_role, to work on a single table
+    parser.add_argument('--only',default=None,
+        help='comma separated list of the tables to make (default: all)')
+    # Small tables of the aggregates the queries keep computing, see
+    # SUMMARY_TABLES
+    parser.add_argument('--summaries',action='store_true',
+        help='also make the summary tables, e.g. Genre_counts')
+    # Find the rows referring to titles and names missing from the IMDb data
+    # files, see check_orphans
+    parser.add_argument('--orphans',choices=ORPHAN_MODES,default=None,
+        help='check the foreign keys, and report, drop or add placeholders '
+        'for orphans (default: no check)')
+    parser.add_argument('--orphan-path',default='./orphans',
+        help='folder to write the orphans and their report to (default: '
+        './orphans)')
+    # Trigram index for LIKE '%...%' style searches of roles, titles and
+    # names, see imdb_search.py
+    parser.add_argument('--search-index',action='store_true',
+        help='also build the substring search index of role_, primary_title '
+        'and name_')
+    parser.add_argument('--search-path',default='./search_index',
+        help='folder to write the search index to (default: ./search_index)')
+    # CSR arrays of who worked with whom, for imdb_graph.py
+    parser.add_argument('--graph',action='store_true',
+        help='also build the graph of Principals linking titles and people')
+    parser.add_argument('--graph-path',default='./graph',
+        help='folder to write the graph to (default: ./graph)')
+    # A small part of the data which still joins up, for development and tests,
+    # see write_subset_keys
+    parser.add_argument('--subset-percent',type=float,default=None,
+        help='only convert about this percentage of the titles, e.g. 1, with '
+        'the titles and names they refer to (default: all titles)')
+    parser.add_argument('--subset-titles',default=None,
+        help='comma separated list of titles to convert, e.g. tt0106179')
+    parser.add_argument('--subset-types',default=None,
+        help='comma separated list of title types to convert, e.g. movie')
+    parser.add_argument('--subset-years',default=None,
+        help='start years of the titles to convert, e.g. 1990-1999')
+    parser.add_argument('--subset-seed',type=int,default=0,
+        help='seed choosing the --subset-percent titles (default: 0)')
+    # Time, rows, bytes and memory of each read, make and write, see
+    # imdb_telemetry.py
+    parser.add_argument('--telemetry',default=None,
+        help='file to record each stage to as JSON lines, e.g. '
+        'telemetry.jsonl (default: none)')
+    parser.add_argument('--profile-stage',default=None,
+        help='run the stages with this name under cProfile, e.g. '
+        'make_Had_role, title.principals.tsv (reads) or write:Had_role')
+    parser.add_argument('--profile-path',default='./profiles',
+        help='folder to save the profiles to (default: ./profiles)')
+    args = parser.parse_args(argv)
+
+    if args.profile_stage is not None and args.telemetry is None:
+        parser.error('--profile-stage needs --telemetry')
+
+    subset = None
+    if any(option is not None for option in [args.subset_percent,
+        args.subset_titles,args.subset_types,args.subset_years]):
+        subset = {'percent': args.subset_percent, 'seed': args.subset_seed}
+        if args.subset_titles:
+            subset['titles'] = args.subset_titles.split(',')
+        if args.subset_types:
+            subset['types'] = args.subset_types.split(',')
+        if args.subset_years:
+            try:
+                years = [int(year) for year in args.subset_years.split('-')]
+            except ValueError:
+                parser.error('--subset-years should be e.g. 1990-1999 or 1994')
+            subset['years'] = (years[0],years[-1])
+
+    formats = args.formats.split(',')
+
+    mysql = None
+    if 'mysql' in formats:
+        mysql = {'host': args.mysql_host, 'user': args.mysql_user,
+            'password': getpass.getpass('MySQL password: '),
+            'database': args.mysql_database,
+            'connections': args.load_connections}
+
+    if args.memory_budget is not None:
+        memory_budget = int(args.memory_budget*2**30)
+    else:
+        memory_budget = total_memory()
+
+    convert(args.data_path,args.workers,memory_budget,
+        chunk_size=args.chunk_size,unzip=args.unzip,
+        integer_ids=args.integer_ids,lookup_tables=args.lookup_tables,
+        lookup_path=args.lookup_path,formats=formats,
+        compression=args.compression,row_group_size=args.row_group_size,
+        engine=args.engine,
+        cache_path=args.cache_path,cache_size=int(args.cache_size*2**30),
+        only=args.only.split(',') if args.only else None,mysql=mysql,
+        sort_by_key=args.sort_by_key,orphans=args.orphans,
+        orphan_path=args.orphan_path,summaries=args.summaries,
+        search_path=args.search_path if args.search_index else None,
+        graph_path=args.graph_path if args.graph else None,
+        telemetry={'path': args.telemetry,
+        'profile_stage': args.profile_stage,
+        'profile_path': args.profile_path} if args.telemetry else None,
+        subset=subset)
+
+    # As at the end of imdb-load-data.sql, see imdb_schema.version_statements
+    if 'mysql' in formats:
+        import imdb_loader
+        connection = imdb_loader.connect(mysql['host'],mysql['user'],
+            mysql['password'],mysql['database'])
+        try:
+            imdb_loader.execute(connection,imdb_schema.version_statements())
+        finally:
+            connection.close()
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+if __name__ == '__main__':
+    main()
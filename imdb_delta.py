@@ -0,0 +1,295 @@
+#===============================================================================
+# imdb_delta.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to refresh the IMDb
+# database from a new IMDb dump without reloading every table.
+#
+# This script does the following:
+# - Compares the TSV files output by imdb_converter.py for a new IMDb dump with
+#   those for the previous dump (the snapshot), table by table, keyed on the
+#   primary keys in imdb-add-constraints.sql
+# - Outputs the change sets for each table as TSV files:
+#     <table>.insert.tsv   rows which are new
+#     <table>.update.tsv   rows whose non-key columns have changed
+#     <table>.delete.tsv   primary keys of rows which have gone
+# - Applies the change sets to the IMDb database in MySQL, in batches
+#
+# To refresh the database, run imdb_converter.py for each new dump in a new
+# folder, then in terminal:
+# $ python imdb_delta.py diff ./old_tsv_folder ./new_tsv_folder
+# $ python imdb_delta.py apply --user root --database IMDb
+#
+# The folder for the new dump is then the snapshot for the next refresh.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import argparse
+import getpass
+import pandas as pd
+
+import imdb_schema
+
+#-------------------------------------------------------------------------------
+
+# Used to read an output table of imdb_converter.py
+def read_table(folder,table,columns):
+    """
+    Read <table>.tsv from folder, with the table's columns from
+    imdb-create-tables.sql. Every value is read as the string it is written as
+    (NULLs stay as \\N), so rows compare exactly as they will be loaded.
+    """
+
+    return pd.read_csv(os.path.join(folder,table + '.tsv'),sep='\t',header=0,
+        names=columns,dtype='str',na_filter=False)
+
+#-------------------------------------------------------------------------------
+
+# Used to write a change set
+def write_changes(df,file_path):
+    """
+    Write change set df to file_path in the same format as imdb_converter.py
+    writes its tables, so it can also be loaded with LOAD DATA.
+    """
+
+    df.to_csv(file_path,index=False,sep='\t')
+
+#-------------------------------------------------------------------------------
+
+# Used to keep one row per primary key
+def drop_repeated_keys(df,key):
+    """
+    DataFrame df without the rows which repeat a primary key key (a list of
+    columns), keeping the first row of each key. Returns it, the number of rows
+    dropped and the number of those which differ from the row kept.
+    """
+
+    repeated = df.duplicated(subset=key)
+    if not repeated.any():
+        return df, 0, 0
+
+    kept = df[~repeated]
+    dropped = df[repeated].merge(kept,on=key,how='left',suffixes=('','_kept'))
+    differ = pd.Series(False,index=dropped.index)
+    for column in df.columns:
+        if column not in key:
+            differ |= dropped[column] != dropped[column + '_kept']
+
+    return kept, int(repeated.sum()), int(differ.sum())
+
+# Compare two versions of a table
+def diff_table(old,new,key):
+    """
+    Compare DataFrames old and new of a table with primary key key (a list of
+    columns). Returns the DataFrames (inserts, updates, deletes), where deletes
+    only has the key columns, and a dict of the rows of 'old' and 'new'
+    dropped as they repeat a key, (rows, rows differing from the row kept),
+    see drop_repeated_keys.
+    """
+
+    columns = list(new.columns)
+    values = [column for column in columns if column not in key]
+
+    # A primary key can only hold one row per key (LOAD DATA LOCAL keeps the
+    # first), the others are dropped but counted
+    old, old_rows, old_differ = drop_repeated_keys(old,key)
+    new, new_rows, new_differ = drop_repeated_keys(new,key)
+    dropped = {'old': (old_rows,old_differ), 'new': (new_rows,new_differ)}
+
+    merged = old.merge(new,on=key,how='outer',suffixes=('_old',''),
+        indicator=True)
+
+    inserts = merged.loc[merged['_merge'] == 'right_only',columns]
+    deletes = merged.loc[merged['_merge'] == 'left_only',key]
+
+    both = merged[merged['_merge'] == 'both']
+    changed = pd.Series(False,index=both.index)
+    for column in values:
+        changed |= both[column + '_old'] != both[column]
+    updates = both.loc[changed,columns]
+
+    return inserts, updates, deletes, dropped
+
+#-------------------------------------------------------------------------------
+
+def diff(old_path,new_path,delta_path='./imdb_delta'):
+    """
+    Compare the tables output by imdb_converter.py in folder old_path with those
+    in folder new_path and write their change sets to folder delta_path.
+    """
+
+    columns = imdb_schema.table_columns()
+    keys = imdb_schema.primary_keys()
+
+    os.makedirs(delta_path,exist_ok=True)
+
+    # Tables whose rows repeating a primary key have other values
+    conflicts = {}
+
+    for table in imdb_schema.TABLES:
+
+        print("\tComparing '" + table + "' table")
+
+        inserts, updates, deletes, dropped = diff_table(
+            read_table(old_path,table,columns[table]),
+            read_table(new_path,table,columns[table]),keys[table])
+
+        print('\t\t',len(inserts),'inserts,',len(updates),'updates,',
+            len(deletes),'deletes')
+
+        for version, (rows, differ) in dropped.items():
+            if rows:
+                print('\t\t',rows,'rows of the',version,'table repeat a '
+                    'primary key and were dropped,',differ,'with other values '
+                    'than the row kept')
+            if differ:
+                conflicts[(table,version)] = differ
+
+        write_changes(inserts,os.path.join(delta_path,table + '.insert.tsv'))
+        write_changes(updates,os.path.join(delta_path,table + '.update.tsv'))
+        write_changes(deletes,os.path.join(delta_path,table + '.delete.tsv'))
+
+    if conflicts:
+        print('\nWARNING: rows repeating a primary key with other values were '
+            'dropped, changes to these keys may be missing from the change '
+            'sets. Check the converter output:')
+        for (table, version), differ in conflicts.items():
+            print('\t{} ({}): {} rows'.format(table,version,differ))
+
+#-------------------------------------------------------------------------------
+
+# Used to read a change set in batches of rows
+def read_changes(file_path,batch_size):
+    """
+    Yield the rows of change set file_path in lists of up to batch_size tuples,
+    with \\N replaced by None. Quotes are kept as they are (quoting=3), as they
+    are by LOAD DATA in imdb-load-data.sql.
+    """
+
+    for chunk in pd.read_csv(file_path,sep='\t',dtype='str',na_filter=False,
+        quoting=3,chunksize=batch_size):
+        chunk = chunk.astype(object).where(chunk != r'\N',None)
+        yield list(chunk.itertuples(index=False,name=None))
+
+#-------------------------------------------------------------------------------
+
+def apply_table(cursor,connection,delta_path,table,columns,key,batch_size):
+    """
+    Apply the change sets of table in folder delta_path to the database, see
+    apply.
+    """
+
+    # Deletes
+    #--------
+    where = '(' + ','.join(key) + ') IN ({})'
+    row = '(' + ','.join(['%s']*len(key)) + ')'
+    for rows in read_changes(os.path.join(delta_path,table + '.delete.tsv'),
+        batch_size):
+        if rows:
+            cursor.execute('DELETE FROM ' + table + ' WHERE ' +
+                where.format(','.join([row]*len(rows))),
+                [value for r in rows for value in r])
+            connection.commit()
+
+    # Inserts and updates
+    #--------------------
+    values = [column for column in columns if column not in key]
+    insert = ('INSERT INTO ' + table + ' (' + ','.join(columns) + ') VALUES (' +
+        ','.join(['%s']*len(columns)) + ')')
+    if values:
+        insert += (' ON DUPLICATE KEY UPDATE ' +
+            ','.join(column + '=VALUES(' + column + ')' for column in values))
+    else:
+        # Every column is in the key, there is nothing to update
+        insert = insert.replace('INSERT INTO','INSERT IGNORE INTO',1)
+
+    for change in ['insert','update']:
+        for rows in read_changes(os.path.join(delta_path,
+            table + '.' + change + '.tsv'),batch_size):
+            if rows:
+                cursor.executemany(insert,rows)
+                connection.commit()
+
+#-------------------------------------------------------------------------------
+
+def apply(connection,delta_path='./imdb_delta',batch_size=10000):
+    """
+    Apply the change sets in folder delta_path (see diff) to the IMDb database
+    on connection, a mysql.connector connection. For each table the deletes
+    are applied first, then the inserts and updates, batch_size rows at a time.
+
+    Foreign key checks are disabled while the changes are applied, as the IMDb
+    data has missing titles and names (see IMDb_data_issues.md). The data is
+    then stamped with a new version, see imdb_schema.version_statements.
+    """
+
+    columns = imdb_schema.table_columns()
+    keys = imdb_schema.primary_keys()
+
+    cursor = connection.cursor()
+    cursor.execute('SET foreign_key_checks = 0')
+
+    try:
+        for table in imdb_schema.TABLES:
+            print("\tApplying changes to '" + table + "' table")
+            apply_table(cursor,connection,delta_path,table,columns[table],
+                keys[table],batch_size)
+
+        for statement in imdb_schema.version_statements():
+            cursor.execute(statement)
+        connection.commit()
+    finally:
+        cursor.execute('SET foreign_key_checks = 1')
+        cursor.close()
+
+#-------------------------------------------------------------------------------
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Compare and apply changes between IMDb dumps.')
+    subparsers = parser.add_subparsers(dest='command',required=True)
+
+    diff_parser = subparsers.add_parser('diff',
+        help='write the change sets between two converted IMDb dumps')
+    diff_parser.add_argument('old_path',
+        help='folder of TSV files for the previous dump')
+    diff_parser.add_argument('new_path',
+        help='folder of TSV files for the new dump')
+    diff_parser.add_argument('--delta-path',default='./imdb_delta',
+        help='folder to write the change sets to (default: ./imdb_delta)')
+
+    apply_parser = subparsers.add_parser('apply',
+        help='apply change sets to the IMDb database')
+    apply_parser.add_argument('--delta-path',default='./imdb_delta',
+        help='folder containing the change sets (default: ./imdb_delta)')
+    apply_parser.add_argument('--host',default='localhost')
+    apply_parser.add_argument('--user',default='root')
+    apply_parser.add_argument('--database',default='IMDb')
+    apply_parser.add_argument('--batch-size',type=int,default=10000,
+        help='number of rows per batch (default: 10000)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'diff':
+        diff(args.old_path,args.new_path,args.delta_path)
+
+    else:
+        import mysql.connector
+
+        connection = mysql.connector.connect(host=args.host,user=args.user,
+            passwd=getpass.getpass('MySQL password: '),database=args.database)
+        try:
+            apply(connection,args.delta_path,args.batch_size)
+        finally:
+            connection.close()
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+if __name__ == '__main__':
+    main()
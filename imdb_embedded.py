@@ -0,0 +1,257 @@
+#===============================================================================
+# imdb_embedded.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to run the queries of
+# SQL_Queries_1.sql (and others) over the files output by imdb_converter.py
+# without a MySQL server, using the embedded analytical database DuckDB.
+#
+# This script does the following:
+# - Registers each table output by imdb_converter.py in a folder as a DuckDB
+#   view of its file: parquet (--formats parquet) or arrow files are preferred
+#   to TSV files, the TSV files are read with the column types of
+#   imdb-create-tables.sql (or imdb-create-tables-integer-ids.sql)
+# - Runs queries written for MySQL, changing the little that DuckDB reads
+#   differently (see mysql_to_duckdb), on all cores
+# - Runs the SQL scripts of the project, e.g. SQL_Queries_1.sql, statement by
+#   statement, printing the result of each query
+#
+# Nothing is loaded first, the files are read as each query runs.
+#
+# Run in terminal, from the folder containing the converter's output:
+# $ python imdb_embedded.py --script SQL_Queries_1.sql
+# $ python imdb_embedded.py --query "SELECT COUNT(*) FROM Titles"
+#
+# Use from python:
+# >>> import imdb_embedded
+# >>> connection = imdb_embedded.connect('.')
+# >>> imdb_embedded.query(connection,'SELECT * FROM Titles LIMIT 10')
+#
+# The benchmark benchmarks/bench_embedded.py compares the time of each query
+# of SQL_Queries_1.sql with that of MySQL.
+#
+# Needs duckdb (pip install duckdb), and pyarrow for arrow files.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import re
+import time
+import argparse
+
+import imdb_schema
+
+# Formats of the converter's output, in the order they are preferred
+FORMATS = ['parquet', 'arrow', 'tsv']
+
+#-------------------------------------------------------------------------------
+
+# Used to find the converter's output in a folder
+def output_files(output_path='.'):
+    """
+    The file of each table in folder output_path, <table>.parquet, .arrow or
+    .tsv (the first of FORMATS found). Returns a dict mapping table name to
+    file path.
+    """
+
+    files = {}
+
+    for name in sorted(os.listdir(output_path)):
+        table, _, extension = name.rpartition('.')
+        if extension in FORMATS and (table not in files or
+            FORMATS.index(extension) < FORMATS.index(
+            files[table].rpartition('.')[2])):
+            files[table] = os.path.join(output_path,name)
+
+    return files
+
+def duckdb_type(sql_type):
+    """
+    The DuckDB type of the MySQL column type sql_type, e.g. VARCHAR for
+    VARCHAR(255) or TEXT.
+    """
+
+    sql_type = re.sub(r'\(.*\)','',sql_type).upper()
+
+    return 'VARCHAR' if sql_type in ['TEXT', 'CHAR'] else sql_type
+
+def has_integer_ids(file_path):
+    """
+    True if the TSV file file_path holds integer IDs (imdb_converter.py
+    --integer-ids) in its first column, a title_id or name_id.
+    """
+
+    with open(file_path,encoding='utf-8') as f:
+        f.readline()
+        return f.readline().split('\t')[0].isdigit()
+
+#-------------------------------------------------------------------------------
+
+# Used to register the converter's output as tables
+def register_table(connection,table,file_path,types=None):
+    """
+    Make table a view of file file_path in DuckDB connection, with the
+    columns of types (a list of (column, MySQL type)) if given: TSV files are
+    read with these types, and the columns of each format renamed to these
+    names (e.g. Episode_belongs_to.title_id is episode_title_id). Otherwise the
+    names and types of the file are used.
+    """
+
+    path = file_path.replace("'","''")
+
+    if file_path.endswith('.parquet'):
+        source = "read_parquet('" + path + "')"
+    elif file_path.endswith('.arrow'):
+        import pyarrow as pa
+        # Memory mapped, so only the columns a query uses are read
+        with pa.memory_map(file_path) as source_file:
+            arrow_table = pa.ipc.open_file(source_file).read_all()
+        connection.register(table + '_arrow',arrow_table)
+        source = table + '_arrow'
+    else:
+        # As written by imdb_converter.write_tsv
+        options = ("delim='\\t', header=true, nullstr='\\N', quote='\"', "
+            "escape='\"'")
+        if types is not None:
+            options += ', columns={' + ', '.join("'" + column + "': '" +
+                duckdb_type(sql_type) + "'" for column, sql_type in types) + '}'
+        source = "read_csv('" + path + "', " + options + ')'
+
+    if types is not None:
+        source += ' AS ' + table + '_file(' + ', '.join(column
+            for column, sql_type in types) + ')'
+
+    connection.execute('CREATE OR REPLACE VIEW ' + table +
+        ' AS SELECT * FROM ' + source)
+
+def connect(output_path='.',threads=None):
+    """
+    A DuckDB connection (in memory) with a view of each table in folder
+    output_path, see output_files. DuckDB uses threads threads (default: one
+    per core).
+    """
+
+    import duckdb
+
+    connection = duckdb.connect()
+    if threads is not None:
+        connection.execute('SET threads = ' + str(int(threads)))
+
+    files = output_files(output_path)
+
+    # Column types of the tables of imdb-create-tables.sql
+    script = 'imdb-create-tables.sql'
+    if 'Titles' in files and files['Titles'].endswith('.tsv') and \
+        has_integer_ids(files['Titles']):
+        script = 'imdb-create-tables-integer-ids.sql'
+    types = imdb_schema.column_types(script)
+
+    for table, file_path in files.items():
+        register_table(connection,table,file_path,types.get(table))
+
+    return connection
+
+#-------------------------------------------------------------------------------
+
+# Used to run queries written for MySQL
+def mysql_to_duckdb(sql):
+    """
+    Query sql, written for MySQL, as DuckDB reads it: x REGEXP 'pattern' is
+    regexp_matches(x,'pattern'). Returns None for statements which have no
+    meaning here, e.g. USE IMDb.
+    """
+
+    if re.match(r'\s*(USE|SET GLOBAL)\s',sql,flags=re.I):
+        return None
+
+    return re.sub(r"([\w.]+)\s+REGEXP\s+('(?:[^']|'')*')",
+        r'regexp_matches(\1,\2)',sql,flags=re.I)
+
+def group_by_all(sql):
+    """
+    Query sql with its GROUP BY lists replaced by GROUP BY ALL. MySQL allows
+    columns which depend on the GROUP BY columns to be selected, e.g. name_
+    when grouping by name_id, DuckDB needs them grouped by too.
+    """
+
+    return re.sub(r'GROUP BY\s+.*?(?=\s+(HAVING|ORDER BY|LIMIT)\b|\s*\)?\s*$)',
+        'GROUP BY ALL',sql,flags=re.I | re.S)
+
+def query(connection,sql):
+    """
+    Run sql, a statement written for MySQL, on DuckDB connection. Returns its
+    result as a DataFrame, or None if it returns no rows.
+    """
+
+    import duckdb
+
+    sql = mysql_to_duckdb(sql)
+    if sql is None:
+        return None
+
+    try:
+        result = connection.execute(sql)
+    except duckdb.BinderException as e:
+        if 'GROUP BY' not in str(e):
+            raise
+        result = connection.execute(group_by_all(sql))
+
+    if result.description is None or re.match(r'\s*(CREATE|DROP)\s',sql,
+        flags=re.I):
+        return None
+
+    return result.df()
+
+def run_script(connection,file_name):
+    """
+    Run the statements of SQL script file_name (in the project folder, or a
+    path) on DuckDB connection in turn. Yields (statement, result, seconds)
+    for each, where result is a DataFrame or None, see query.
+    """
+
+    for statement in imdb_schema.statements(file_name):
+        start = time.perf_counter()
+        result = query(connection,statement)
+        yield statement, result, time.perf_counter() - start
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Query the output of imdb_converter.py without MySQL.')
+    parser.add_argument('--output-path',default='.',
+        help='folder containing the output of imdb_converter.py (default: .)')
+    parser.add_argument('--script',default=None,
+        help='SQL script to run, e.g. SQL_Queries_1.sql')
+    parser.add_argument('--query',default=None,
+        help='query to run')
+    parser.add_argument('--threads',type=int,default=None,
+        help='threads DuckDB uses (default: one per core)')
+    parser.add_argument('--limit',type=int,default=20,
+        help='rows of each result to print (default: 20)')
+    args = parser.parse_args(argv)
+
+    connection = connect(args.output_path,args.threads)
+
+    if args.script is not None:
+        results = run_script(connection,args.script)
+    else:
+        sql = args.query or 'SHOW TABLES'
+        start = time.perf_counter()
+        result = query(connection,sql)
+        results = [(sql,result,time.perf_counter() - start)]
+
+    for statement, result, seconds in results:
+        if result is not None:
+            print(statement,'\n')
+            print(result.head(args.limit).to_string(index=False))
+            print('\n{} rows in {:.1f} ms\n'.format(len(result),1000*seconds))
+
+
+if __name__ == '__main__':
+    main()
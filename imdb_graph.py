@@ -0,0 +1,423 @@
+#===============================================================================
+# imdb_graph.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to answer questions about
+# who worked with whom, e.g. the collaborators of a person, the shortest chain
+# of collaborations between two people ("six degrees") or the most connected
+# people of a decade. In MySQL these need self joins of Principals repeated for
+# each step, which soon take too long.
+#
+# This script does the following:
+# - Builds the graph of Principals, linking each title to the people credited
+#   on it, as arrays of integer IDs in compressed sparse row (CSR) form: the
+#   people of the i-th title are title_names[title_offsets[i]:
+#   title_offsets[i+1]], and the titles of each person likewise
+# - Saves the arrays as .npy files in a folder (./graph), which are memory
+#   mapped when read, so the graph loads at once whatever its size
+# - Finds the titles, people and collaborators of a person, the people within
+#   k steps of them and the shortest path between two people, by breadth first
+#   search over whole levels of the graph at a time
+#
+# The graph is built by the converter:
+# $ python imdb_converter.py --graph
+# or from the Principals.tsv it output:
+# $ python imdb_graph.py build --tsv-path .
+# Then query it in terminal:
+# $ python imdb_graph.py collaborators nm0000102
+# $ python imdb_graph.py path nm0000102 nm0000158
+# $ python imdb_graph.py most-connected --decade 1990 --tsv-path .
+# or from python:
+# >>> import imdb_graph
+# >>> graph = imdb_graph.Graph('./graph')
+# >>> graph.shortest_path('nm0000102','nm0000158')
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Arrays of the graph, each saved as <array>.npy
+GRAPH_ARRAYS = ['title_ids', 'name_ids', 'title_offsets', 'title_names',
+    'name_offsets', 'name_titles']
+
+#-------------------------------------------------------------------------------
+
+# Used to read IMDb identifiers as integers, e.g. 'nm0000102' as 102
+def integer_ids(ids):
+    """
+    The array of integer IDs of ids, a Series of IMDb identifiers or of integer
+    IDs (as output with --integer-ids).
+    """
+
+    if pd.api.types.is_integer_dtype(ids):
+        return ids.to_numpy(dtype='int32')
+
+    return ids.str.slice(2).astype('int32').to_numpy()
+
+def integer_id(id_):
+    """
+    The integer ID of id_, an IMDb identifier or an integer ID.
+    """
+
+    if isinstance(id_,str) and not id_.isdigit():
+        return int(id_[2:])
+
+    return int(id_)
+
+def edges(df):
+    """
+    The edges of DataFrame df, rows of Principals, as the arrays (title IDs,
+    name IDs).
+    """
+
+    return integer_ids(df['title_id']), integer_ids(df['name_id'])
+
+#-------------------------------------------------------------------------------
+
+# Used to build the graph
+def build_graph(titles,names):
+    """
+    The graph of the edges between the titles and names of arrays titles and
+    names (integer IDs), a dict of the arrays of GRAPH_ARRAYS. A person
+    credited more than once on a title is linked to it once.
+    """
+
+    title_ids, title_nodes = np.unique(titles,return_inverse=True)
+    name_ids, name_nodes = np.unique(names,return_inverse=True)
+
+    # Edges sorted by title then name, without repeats
+    keys = np.unique(title_nodes.astype(np.int64)*len(name_ids) + name_nodes)
+    title_nodes = (keys // len(name_ids)).astype(np.int32)
+    name_nodes = (keys % len(name_ids)).astype(np.int32)
+
+    # The same edges sorted by name then title
+    order = np.argsort(name_nodes,kind='stable')
+
+    return {'title_ids': title_ids.astype(np.int32),
+        'name_ids': name_ids.astype(np.int32),
+        'title_offsets': np.concatenate([[0],np.cumsum(np.bincount(
+            title_nodes,minlength=len(title_ids)))]).astype(np.int64),
+        'title_names': name_nodes,
+        'name_offsets': np.concatenate([[0],np.cumsum(np.bincount(
+            name_nodes,minlength=len(name_ids)))]).astype(np.int64),
+        'name_titles': title_nodes[order]}
+
+def write_graph(edge_list,graph_path='./graph'):
+    """
+    Build the graph of edge_list, a list of (title IDs, name IDs) arrays, e.g.
+    one per chunk of Principals, and save it to folder graph_path.
+    """
+
+    print("\tMaking the graph of 'Principals'")
+
+    graph = build_graph(np.concatenate([titles for titles, names in edge_list]),
+        np.concatenate([names for titles, names in edge_list]))
+
+    os.makedirs(graph_path,exist_ok=True)
+    for array in GRAPH_ARRAYS:
+        np.save(os.path.join(graph_path,array + '.npy'),graph[array])
+
+# Used to build the graph from the TSV files output by imdb_converter.py
+def build(tsv_path='.',graph_path='./graph',chunk_size=10000000):
+    """
+    Build the graph from Principals.tsv in folder tsv_path, reading it in
+    chunks of chunk_size rows, and save it to folder graph_path.
+    """
+
+    chunks = pd.read_csv(os.path.join(tsv_path,'Principals.tsv'),sep='\t',
+        usecols=['title_id','name_id'],chunksize=chunk_size)
+
+    write_graph([(integer_ids(chunk['title_id']),integer_ids(chunk['name_id']))
+        for chunk in chunks],graph_path)
+
+#-------------------------------------------------------------------------------
+
+# Used to gather the neighbours of many nodes at once
+def neighbours(offsets,targets,nodes):
+    """
+    The neighbours of the nodes in array nodes, in CSR arrays offsets and
+    targets. Returns the arrays (neighbours, sources), where sources holds the
+    node each neighbour is a neighbour of.
+    """
+
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+
+    # Position of each neighbour in targets
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) -
+        lengths - starts,lengths)
+
+    return np.asarray(targets[positions]), np.repeat(nodes,lengths)
+
+#-------------------------------------------------------------------------------
+
+class Graph:
+    """
+    The graph of Principals saved in folder graph_path (see write_graph), with
+    its arrays memory mapped. Titles and people are given and returned as
+    integer IDs, e.g. 102 for nm0000102, IMDb identifiers are also accepted.
+    """
+
+    def __init__(self,graph_path='./graph'):
+
+        for array in GRAPH_ARRAYS:
+            file_path = os.path.join(graph_path,array + '.npy')
+            if not os.path.exists(file_path):
+                raise ValueError('No graph in ' + graph_path +
+                    ', see imdb_graph.build')
+            setattr(self,array,np.load(file_path,mmap_mode='r'))
+
+    def node(self,ids,id_):
+        """
+        Position of id_ in the sorted array of IDs ids.
+        """
+
+        i = np.searchsorted(ids,integer_id(id_))
+        if i == len(ids) or ids[i] != integer_id(id_):
+            raise KeyError(id_)
+
+        return int(i)
+
+    def titles(self,name):
+        """
+        IDs of the titles name is credited on.
+        """
+
+        i = self.node(self.name_ids,name)
+
+        return np.asarray(self.title_ids)[self.name_titles[
+            self.name_offsets[i]:self.name_offsets[i + 1]]]
+
+    def names(self,title):
+        """
+        IDs of the people credited on title.
+        """
+
+        i = self.node(self.title_ids,title)
+
+        return np.asarray(self.name_ids)[self.title_names[
+            self.title_offsets[i]:self.title_offsets[i + 1]]]
+
+    def collaborators(self,name):
+        """
+        People credited on a title with name. Returns a DataFrame of their IDs
+        and the number of titles they share with name, most shared first.
+        """
+
+        i = self.node(self.name_ids,name)
+        titles = np.asarray(self.name_titles[self.name_offsets[i]:
+            self.name_offsets[i + 1]])
+        names, sources = neighbours(self.title_offsets,self.title_names,titles)
+
+        nodes, counts = np.unique(names[names != i],return_counts=True)
+        df = pd.DataFrame({'name_id': np.asarray(self.name_ids)[nodes],
+            'shared_titles': counts})
+
+        return df.sort_values(['shared_titles','name_id'],
+            ascending=[False,True],ignore_index=True)
+
+    def expand(self,name,hops=2):
+        """
+        People within hops collaborations of name (including name). Returns a
+        DataFrame of their IDs and the number of hops to each.
+        """
+
+        hop = np.full(len(self.name_ids),-1,dtype=np.int32)
+        seen_titles = np.zeros(len(self.title_ids),dtype=bool)
+        frontier = np.array([self.node(self.name_ids,name)])
+        hop[frontier] = 0
+
+        for k in range(1,hops + 1):
+            titles = np.unique(neighbours(self.name_offsets,self.name_titles,
+                frontier)[0])
+            titles = titles[~seen_titles[titles]]
+            seen_titles[titles] = True
+            names = np.unique(neighbours(self.title_offsets,self.title_names,
+                titles)[0])
+            frontier = names[hop[names] < 0]
+            hop[frontier] = k
+            if len(frontier) == 0:
+                break
+
+        nodes = np.flatnonzero(hop >= 0)
+        df = pd.DataFrame({'name_id': np.asarray(self.name_ids)[nodes],
+            'hops': hop[nodes]})
+
+        return df.sort_values(['hops','name_id'],ignore_index=True)
+
+    def shortest_path(self,name1,name2,max_hops=None):
+        """
+        A shortest chain of collaborations from name1 to name2, as a list of
+        IDs alternating between people and the titles they share: [name1,
+        title, name, ..., title, name2]. Returns None if there is none (within
+        max_hops collaborations).
+        """
+
+        start = self.node(self.name_ids,name1)
+        end = self.node(self.name_ids,name2)
+
+        # The title each person was reached by, and the person each title was
+        # reached from (-1 if not reached)
+        name_parent = np.full(len(self.name_ids),-1,dtype=np.int64)
+        title_parent = np.full(len(self.title_ids),-1,dtype=np.int64)
+        name_parent[start] = start
+        frontier = np.array([start])
+        hops = 0
+
+        while name_parent[end] < 0 and len(frontier) > 0:
+            if max_hops is not None and hops == max_hops:
+                return None
+            hops += 1
+
+            titles, sources = neighbours(self.name_offsets,self.name_titles,
+                frontier)
+            new = title_parent[titles] < 0
+            titles, first = np.unique(titles[new],return_index=True)
+            title_parent[titles] = sources[new][first]
+
+            names, sources = neighbours(self.title_offsets,self.title_names,
+                titles)
+            new = name_parent[names] < 0
+            frontier, first = np.unique(names[new],return_index=True)
+            name_parent[frontier] = sources[new][first]
+
+        if name_parent[end] < 0:
+            return None
+
+        # Walk back from name2
+        path = [int(self.name_ids[end])]
+        node = end
+        while node != start:
+            title = name_parent[node]
+            node = title_parent[title]
+            path = [int(self.name_ids[node]),int(self.title_ids[title])] + path
+
+        return path
+
+    def most_connected(self,titles=None,n=10):
+        """
+        The n people with the most collaborators on titles (a list of title IDs,
+        default: all titles). Returns a DataFrame of their IDs and numbers of
+        collaborators. Every pair of people credited on a title is counted, so
+        this needs memory for the pairs of the titles given.
+        """
+
+        if titles is None:
+            nodes = np.arange(len(self.title_ids))
+        else:
+            ids = np.unique([integer_id(title) for title in titles])
+            nodes = np.searchsorted(self.title_ids,ids)
+            found = nodes < len(self.title_ids)
+            nodes = nodes[found][self.title_ids[nodes[found]] == ids[found]]
+
+        # Every pair (name, collaborator) of every title, without repeats
+        names, sources = neighbours(self.title_offsets,self.title_names,nodes)
+        collaborators = neighbours(self.title_offsets,self.title_names,
+            sources)[0]
+        pair_names = np.repeat(names,np.diff(self.title_offsets)[sources])
+        keep = pair_names != collaborators
+        pairs = np.unique(pair_names[keep].astype(np.int64)*len(self.name_ids) +
+            collaborators[keep])
+
+        counts = np.bincount(pairs // len(self.name_ids),
+            minlength=len(self.name_ids))
+        top = np.argsort(-counts,kind='stable')[:n]
+        top = top[counts[top] > 0]
+
+        return pd.DataFrame({'name_id': np.asarray(self.name_ids)[top],
+            'collaborators': counts[top]})
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Query the graph of who worked with whom in Principals.')
+    subparsers = parser.add_subparsers(dest='command',required=True)
+
+    build_parser = subparsers.add_parser('build',
+        help='build the graph from the Principals.tsv output by '
+        'imdb_converter.py')
+    build_parser.add_argument('--tsv-path',default='.',
+        help='folder containing Principals.tsv (default: .)')
+
+    collaborators_parser = subparsers.add_parser('collaborators',
+        help='people who worked with a person')
+    collaborators_parser.add_argument('name')
+    collaborators_parser.add_argument('--limit',type=int,default=20,
+        help='rows to print (default: 20)')
+
+    expand_parser = subparsers.add_parser('expand',
+        help='people within a number of collaborations of a person')
+    expand_parser.add_argument('name')
+    expand_parser.add_argument('--hops',type=int,default=2)
+
+    path_parser = subparsers.add_parser('path',
+        help='shortest chain of collaborations between two people')
+    path_parser.add_argument('name1')
+    path_parser.add_argument('name2')
+
+    connected_parser = subparsers.add_parser('most-connected',
+        help='people with the most collaborators')
+    connected_parser.add_argument('--decade',type=int,default=None,
+        help='only count titles starting in this decade, e.g. 1990, read from '
+        'Titles.tsv (default: all titles)')
+    connected_parser.add_argument('--tsv-path',default='.',
+        help='folder containing Titles.tsv (default: .)')
+    connected_parser.add_argument('--limit',type=int,default=20,
+        help='people to print (default: 20)')
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument('--graph-path',default='./graph',
+            help='folder containing the graph (default: ./graph)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build(args.tsv_path,args.graph_path)
+        return
+
+    start = time.perf_counter()
+    graph = Graph(args.graph_path)
+
+    if args.command == 'collaborators':
+        people = graph.collaborators(args.name).head(args.limit)
+        people['name_id'] = people['name_id'].map('nm{:07d}'.format)
+        print(people.to_string(index=False))
+    elif args.command == 'expand':
+        people = graph.expand(args.name,args.hops)
+        print(people.groupby('hops').size().rename('people').to_string())
+    elif args.command == 'path':
+        path = graph.shortest_path(args.name1,args.name2)
+        if path is None:
+            print('No path')
+        else:
+            print(' -> '.join(('nm' if i % 2 == 0 else 'tt') +
+                '{:07d}'.format(id_) for i, id_ in enumerate(path)))
+            print('\n{} collaborations'.format(len(path)//2))
+    else:
+        titles = None
+        if args.decade is not None:
+            Titles = pd.read_csv(os.path.join(args.tsv_path,'Titles.tsv'),
+                sep='\t',usecols=['title_id','start_year'],na_values='\\N',
+                keep_default_na=False)
+            titles = Titles['title_id'][Titles['start_year'].between(
+                args.decade,args.decade + 9)]
+            titles = integer_ids(titles)
+        people = graph.most_connected(titles,args.limit)
+        people['name_id'] = people['name_id'].map('nm{:07d}'.format)
+        print(people.to_string(index=False))
+
+    print('\nAnswered in {:.1f} ms'.format(1000*(time.perf_counter() - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,599 @@
+#===============================================================================
+# imdb_loader.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to build the IMDb database
+# in MySQL faster than running imdb-create-tables.sql, imdb-load-data.sql,
+# imdb-add-constraints.sql and imdb-index-tables.sql one after another.
+#
+# This script does the following:
+# - Keeps a pool of connections to the IMDb database in MySQL
+# - Loads each table (or chunk of a table) made by imdb_converter.py with
+#   LOAD DATA LOCAL INFILE, streaming it from memory to MySQL through a named
+#   pipe (or, where there are none, a temporary file)
+# - Loads the tables in background threads, so several tables load at the same
+#   time and loading overlaps with making the next table or chunk
+# - Builds the database (see build): creates the tables with their primary
+#   keys, loads them in parallel (best sorted by primary key, see
+#   imdb_converter.py --sort-by-key), then adds the secondary indexes and the
+#   foreign keys, several tables at a time. Indexes which repeat the start of a
+#   primary key (e.g. Titles_index) are left out.
+#
+# MySQL must allow LOAD DATA LOCAL INFILE (SET GLOBAL local_infile = 1;).
+#
+# To load the tables while converting the IMDb data files, with the database
+# created first (imdb-create-tables.sql), run in terminal:
+# $ python imdb_converter.py --formats mysql --mysql-user root
+# and add the constraints and indexes (imdb-add-constraints.sql and
+# imdb-index-tables.sql) as usual.
+#
+# To build the database from TSV files made with
+# $ python imdb_converter.py --sort-by-key
+# run in terminal:
+# $ python imdb_loader.py --tsv-path . [--compare]
+# or to make the tables from the IMDb data files and stream them into MySQL:
+# $ python imdb_loader.py --data-path ./imdb_data
+#
+# Options:
+# --tsv-path PATH    folder containing the TSV files (.)
+# --data-path PATH   make the tables from the IMDb data files in PATH instead
+# --chunk-size N     with --data-path, read the IMDb data files in chunks
+# --workers N        with --data-path, number of worker processes converting
+#                    the IMDb data files (number of CPUs)
+# --memory-budget GB with --data-path, memory the workers may use together
+#                    (physical memory)
+# --integer-ids      use imdb-create-tables-integer-ids.sql
+# --orphans MODE     with --data-path, find the orphans of each foreign key
+#                    as imdb_converter.py --orphans does
+# --check-foreign-keys
+#                    check the foreign keys as they are added, for tables made
+#                    without orphans (--orphans drop or placeholder)
+# --mysql-host, --mysql-user, --mysql-database
+#                    IMDb database to build (localhost, root, IMDb)
+# --load-connections N
+#                    connections working at the same time (4)
+# --compare          also build the database with the SQL scripts first, and
+#                    report the time of each step of both
+# --drop-redundant-indexes
+#                    only drop the redundant indexes from a database built
+#                    with the SQL scripts
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import re
+import time
+import shutil
+import getpass
+import argparse
+import tempfile
+import threading
+import contextlib
+import concurrent.futures
+
+import imdb_schema
+
+#-------------------------------------------------------------------------------
+
+# Used to connect to the IMDb database
+def connect(host='localhost',user='root',password=None,database='IMDb'):
+    """
+    Connect to the IMDb database in MySQL, allowing LOAD DATA LOCAL INFILE.
+    Returns a mysql.connector connection.
+    """
+
+    import mysql.connector
+
+    return mysql.connector.connect(host=host,user=user,passwd=password,
+        database=database,allow_local_infile=True)
+
+#-------------------------------------------------------------------------------
+
+# LOAD DATA statement of imdb-load-data.sql, for data without a header line
+LOAD_DATA = ("LOAD DATA LOCAL INFILE '{}' INTO TABLE {} "
+    "COLUMNS TERMINATED BY '\\t'")
+
+# Used to load a table from memory
+def load_data(connection,table,data):
+    """
+    Load data, rows of table as written to TSV files by imdb_converter.py (bytes,
+    without the header line), into table on connection.
+
+    The data is written to a named pipe in a background thread while MySQL
+    reads it, so it is never written to disk. Where there are no named pipes
+    (Windows) it is written to a temporary file instead.
+    """
+
+    folder = tempfile.mkdtemp(prefix='imdb_loader_')
+    file_path = os.path.join(folder,table + '.tsv')
+    writer = None
+
+    try:
+        if hasattr(os,'mkfifo'):
+            os.mkfifo(file_path)
+            writer = threading.Thread(target=write_pipe,args=(file_path,data),
+                daemon=True)
+            writer.start()
+        else:
+            with open(file_path,'wb') as f:
+                f.write(data)
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(LOAD_DATA.format(
+                file_path.replace('\\','\\\\').replace("'","\\'"),table))
+            connection.commit()
+        finally:
+            cursor.close()
+            if writer is not None:
+                close_pipe(file_path,writer)
+
+    finally:
+        shutil.rmtree(folder,ignore_errors=True)
+
+def write_pipe(file_path,data):
+    """
+    Write data to the named pipe file_path.
+    """
+
+    try:
+        with open(file_path,'wb') as f:
+            f.write(data)
+    except BrokenPipeError:
+        # MySQL stopped reading, the load failed and load_data raises the error
+        pass
+
+def close_pipe(file_path,writer):
+    """
+    Wait for thread writer, writing to the named pipe file_path, to finish. If
+    the load failed before MySQL opened the pipe the writer is still waiting
+    for a reader, so the pipe is opened and closed to let it finish.
+    """
+
+    while writer.is_alive():
+        try:
+            os.close(os.open(file_path,os.O_RDONLY | os.O_NONBLOCK))
+        except OSError:
+            pass
+        writer.join(0.1)
+
+#-------------------------------------------------------------------------------
+
+class Loader:
+    """
+    Load tables into the IMDb database in background threads. Each thread has
+    its own connection, made by connect(**connect_options), so up to
+    connections tables load at the same time. At most max_pending tables
+    (default 2*connections) wait to be loaded, once there are that many load
+    waits for one to finish, which bounds the memory they use.
+    """
+
+    def __init__(self,connections=2,max_pending=None,**connect_options):
+
+        self.connect_options = connect_options
+
+        self._pool = concurrent.futures.ThreadPoolExecutor(connections)
+        self._pending = threading.BoundedSemaphore(max_pending or
+            2*connections)
+        self._futures = []
+
+        # Connection of each thread
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if not hasattr(self._local,'connection'):
+            self._local.connection = connect(**self.connect_options)
+            with self._lock:
+                self._connections.append(self._local.connection)
+        return self._local.connection
+
+    def _run(self,function,args,pending):
+        try:
+            return function(self._connection(),*args)
+        finally:
+            if pending:
+                self._pending.release()
+
+    def submit(self,function,*args):
+        """
+        Run function(connection,*args) in the background, on the connection of
+        the thread it runs in. Returns a concurrent.futures.Future.
+        """
+
+        future = self._pool.submit(self._run,function,args,False)
+        self._futures.append(future)
+
+        return future
+
+    def load(self,table,data):
+        """
+        Load data (see load_data) into table in the background.
+        """
+
+        self._pending.acquire()
+        self._futures.append(self._pool.submit(self._run,load_data,
+            (table,data),True))
+
+    def wait(self):
+        """
+        Wait for the tables to load (and the functions submitted to run).
+        Raises the error of the first which failed, if any.
+        """
+
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """
+        Wait for the tables to load, then close the connections.
+        """
+
+        try:
+            self.wait()
+        finally:
+            self._pool.shutdown()
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+#-------------------------------------------------------------------------------
+
+# Used to run SQL statements
+def execute(connection,statements):
+    """
+    Run the SQL statements (a list of str) on connection in turn, then commit.
+    """
+
+    cursor = connection.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+        connection.commit()
+    finally:
+        cursor.close()
+
+# Used to read the SQL scripts for a database which may not be called IMDb
+def script_statements(file_name,database='IMDb'):
+    """
+    The SQL statements of the SQL script file_name, for the database database
+    rather than IMDb.
+    """
+
+    return [re.sub(r'^((DROP|CREATE|ALTER) DATABASE( IF EXISTS)?|USE) IMDb\b',
+        r'\1 ' + database,statement)
+        for statement in imdb_schema.statements(file_name)]
+
+#-------------------------------------------------------------------------------
+
+# Used to create the IMDb database and its tables
+def create_tables(connection,database='IMDb',primary_keys=True,
+    script='imdb-create-tables.sql'):
+    """
+    Create the IMDb database, called database, and its tables with the SQL
+    script script. If primary_keys is True each table is created with its
+    primary key (from imdb-add-constraints.sql) already in place, so InnoDB
+    builds it as the rows are loaded rather than rebuilding the whole table
+    when it is added afterwards.
+    """
+
+    keys = imdb_schema.primary_keys(lengths=True)
+    statements = []
+
+    for statement in script_statements(script,database):
+        table = re.match(r'CREATE TABLE (\w+)',statement)
+        if primary_keys and table:
+            key = keys[imdb_schema.table_name(table.group(1))]
+            statement = (statement[:statement.rindex(')')].rstrip() +
+                ',\n  PRIMARY KEY (' + ','.join(key) + ')\n)')
+        statements.append(statement)
+
+    execute(connection,statements)
+
+# Used to load a TSV file made by imdb_converter.py
+def load_file(connection,table,file_path):
+    """
+    Load the TSV file file_path, with a header line, into table on connection,
+    as imdb-load-data.sql does.
+    """
+
+    execute(connection,[LOAD_DATA.format(
+        os.path.abspath(file_path).replace('\\','\\\\').replace("'","\\'"),
+        table) + ' IGNORE 1 LINES'])
+
+# Used to add the secondary indexes of a table
+def add_indexes(connection,table,table_indexes):
+    """
+    Add table_indexes, a list of (index name, columns), to table on connection
+    with a single ALTER TABLE, so the table is read once for all of them.
+    """
+
+    execute(connection,['ALTER TABLE ' + table + ' ' + ', '.join(
+        'ADD INDEX ' + index + ' (' + ','.join(columns) + ')'
+        for index, columns in table_indexes)])
+
+# Used to add the foreign keys of a table
+def add_foreign_keys(connection,table,keys,check=False):
+    """
+    Add keys, a list of (constraint name, columns, referenced table, referenced
+    columns), to table on connection. Like imdb-add-constraints.sql the rows
+    are not checked (see IMDb_data_issues.md), which also lets InnoDB add them
+    without copying the table. If check is True they are, which only succeeds
+    if the tables were made without orphans (imdb_converter.py --orphans drop
+    or placeholder).
+    """
+
+    statement = 'ALTER TABLE ' + table + ' ' + ', '.join(
+        'ADD CONSTRAINT ' + constraint + ' FOREIGN KEY (' + ','.join(columns) +
+        ') REFERENCES ' + parent + ' (' + ','.join(parent_columns) + ')'
+        for constraint, columns, parent, parent_columns in keys)
+
+    if check:
+        execute(connection,[statement])
+    else:
+        execute(connection,['SET foreign_key_checks = 0',statement,
+            'SET foreign_key_checks = 1'])
+
+# Used to drop the redundant indexes of a database made with the SQL scripts
+def drop_redundant_indexes(connection):
+    """
+    Drop the indexes of imdb_schema.redundant_indexes, which duplicate the
+    start of their table's primary key, from the IMDb database on connection.
+    """
+
+    execute(connection,['DROP INDEX ' + index + ' ON ' + table
+        for table, index in imdb_schema.redundant_indexes()])
+
+#-------------------------------------------------------------------------------
+
+# Used to time the steps of build and build_baseline
+class Timer:
+    """
+    Wall time in seconds of each step, in times. Used as
+    with timer('load'): ...
+    """
+
+    def __init__(self):
+        self.times = {}
+
+    @contextlib.contextmanager
+    def __call__(self,step):
+        print(step.capitalize(),'...')
+        start = time.perf_counter()
+        yield
+        self.times[step] = time.perf_counter() - start
+        print(step.capitalize(),'took {:.1f} s'.format(self.times[step]),'\n')
+
+def build(tsv_path='.',data_path=None,database='IMDb',connections=4,
+    integer_ids=False,convert_options=None,check_foreign_keys=False,
+    **connect_options):
+    """
+    Build the IMDb database, called database, with connections connections
+    (made by connect(**connect_options)) working in parallel:
+    1) Create the tables with their primary keys (see create_tables)
+    2) Load the tables, largest first, from the TSV files in folder tsv_path.
+       If data_path is given the tables are made from the IMDb data files in
+       data_path instead, and streamed straight into MySQL (see
+       imdb_converter.convert, which is passed convert_options, e.g.
+       {'workers': 4, 'memory_budget': 8*2**30}, each worker process then
+       loading over connections connections). Either way
+       the rows are best sorted by primary key (imdb_converter.py
+       --sort-by-key), so InnoDB appends them to the primary key. The data
+       is then stamped with a new version, see imdb_schema.version_statements
+    3) Add the secondary indexes of imdb-index-tables.sql, one ALTER TABLE per
+       table, leaving out those of imdb_schema.redundant_indexes
+    4) Add the foreign keys of imdb-add-constraints.sql, checking them if
+       check_foreign_keys is True (see add_foreign_keys)
+    Returns a dict of the wall time in seconds of each step.
+    """
+
+    timer = Timer()
+    script = ('imdb-create-tables-integer-ids.sql' if integer_ids else
+        'imdb-create-tables.sql')
+
+    with timer('create'):
+        connection = connect(database=None,**connect_options)
+        try:
+            create_tables(connection,database,True,script)
+        finally:
+            connection.close()
+
+    with timer('load'):
+        if data_path is not None:
+            import imdb_converter
+            imdb_converter.convert(data_path,formats=['mysql'],
+                sort_by_key=True,integer_ids=integer_ids,
+                mysql=dict(connect_options,database=database,
+                connections=connections),**(convert_options or {}))
+        else:
+            files = {table: os.path.join(tsv_path,table + '.tsv')
+                for table in imdb_schema.TABLES}
+            loader = Loader(connections,database=database,**connect_options)
+            try:
+                for table in sorted(files,key=lambda table:
+                    os.path.getsize(files[table]),reverse=True):
+                    loader.submit(load_file,table,files[table])
+            finally:
+                loader.close()
+
+        # As at the end of imdb-load-data.sql
+        connection = connect(database=database,**connect_options)
+        try:
+            execute(connection,imdb_schema.version_statements())
+        finally:
+            connection.close()
+
+    redundant = imdb_schema.redundant_indexes()
+    print('Leaving out redundant indexes:',
+        ', '.join(index for table, index in redundant),'\n')
+
+    loader = Loader(connections,database=database,**connect_options)
+    try:
+        with timer('indexes'):
+            for table, table_indexes in imdb_schema.indexes().items():
+                table_indexes = [(index, columns)
+                    for index, columns in table_indexes
+                    if (table, index) not in redundant]
+                if table_indexes:
+                    loader.submit(add_indexes,table,table_indexes)
+            loader.wait()
+
+        with timer('constraints'):
+            for table, keys in imdb_schema.foreign_keys().items():
+                loader.submit(add_foreign_keys,table,keys,
+                    check_foreign_keys)
+            loader.wait()
+    finally:
+        loader.close()
+
+    timer.times['total'] = sum(timer.times.values())
+
+    return timer.times
+
+def build_baseline(tsv_path='.',database='IMDb',integer_ids=False,
+    **connect_options):
+    """
+    Build the IMDb database, called database, from the TSV files in folder
+    tsv_path as the SQL scripts do, one statement after another on a single
+    connection: imdb-create-tables.sql, imdb-load-data.sql,
+    imdb-add-constraints.sql then imdb-index-tables.sql. Returns a dict of the
+    wall time in seconds of each script.
+    """
+
+    timer = Timer()
+    script = ('imdb-create-tables-integer-ids.sql' if integer_ids else
+        'imdb-create-tables.sql')
+    folder = os.path.abspath(tsv_path).replace('\\','\\\\').replace("'","\\'")
+
+    connection = connect(database=None,**connect_options)
+    try:
+        with timer('create'):
+            execute(connection,script_statements(script,database))
+        with timer('load'):
+            execute(connection,[re.sub(r"INFILE\s+'[^']*/",
+                "INFILE '" + folder + '/',statement)
+                for statement in script_statements('imdb-load-data.sql',
+                database)])
+        with timer('constraints'):
+            execute(connection,script_statements('imdb-add-constraints.sql',
+                database))
+        with timer('indexes'):
+            execute(connection,script_statements('imdb-index-tables.sql',
+                database))
+    finally:
+        connection.close()
+
+    timer.times['total'] = sum(timer.times.values())
+
+    return timer.times
+
+# Used to compare build with build_baseline
+def print_report(times,baseline=None):
+    """
+    Print the wall time of each step of build, times, and if given of
+    build_baseline, baseline.
+    """
+
+    if baseline is None:
+        print('{:<12} {:>10}'.format('','build (s)'))
+        for step, seconds in times.items():
+            print('{:<12} {:>10.1f}'.format(step,seconds))
+    else:
+        print('{:<12} {:>16} {:>10} {:>8}'.format('','SQL scripts (s)',
+            'build (s)','speedup'))
+        for step, seconds in times.items():
+            print('{:<12} {:>16.1f} {:>10.1f} {:>7.1f}x'.format(step,
+                baseline[step],seconds,baseline[step]/max(seconds,1e-9)))
+        print('\nThe primary keys are added in the load step of build and in '
+            'the constraints step of the SQL scripts.')
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Build the IMDb database in MySQL.')
+    parser.add_argument('--tsv-path',default='.',
+        help='folder containing the TSV files made by imdb_converter.py '
+        '(default: .)')
+    # Make the tables with imdb_converter.py and stream them into MySQL,
+    # rather than loading TSV files
+    parser.add_argument('--data-path',default=None,
+        help='folder containing the IMDb data files, to make the tables from '
+        'rather than loading TSV files')
+    parser.add_argument('--chunk-size',type=int,default=None,
+        help='with --data-path, read the IMDb data files in chunks of this '
+        'many rows')
+    # With --data-path, as for imdb_converter.py, see imdb_converter.run_tasks
+    parser.add_argument('--workers',type=int,default=os.cpu_count() or 1,
+        help='with --data-path, number of worker processes (default: number '
+        'of CPUs)')
+    parser.add_argument('--memory-budget',type=float,default=None,
+        help='with --data-path, memory, in GB, the workers may use together '
+        '(default: total physical memory)')
+    parser.add_argument('--integer-ids',action='store_true',
+        help='use imdb-create-tables-integer-ids.sql')
+    # With --data-path, e.g. --orphans drop, see imdb_converter.check_orphans
+    parser.add_argument('--orphans',choices=['report','drop','placeholder'],
+        default=None,help='with --data-path, check the foreign keys for '
+        'orphans as imdb_converter.py --orphans does')
+    # Only for tables without orphans
+    parser.add_argument('--check-foreign-keys',action='store_true',
+        help='check the foreign keys as they are added')
+    parser.add_argument('--mysql-host',default='localhost')
+    parser.add_argument('--mysql-user',default='root')
+    parser.add_argument('--mysql-database',default='IMDb')
+    parser.add_argument('--load-connections',type=int,default=4,
+        help='connections loading tables and adding indexes at the same time '
+        '(default: 4)')
+    # Build the database with the SQL scripts first, and report both times
+    parser.add_argument('--compare',action='store_true',
+        help='also build the database with the SQL scripts, from --tsv-path, '
+        'and compare the times')
+    # For a database built with the SQL scripts, only drop the redundant indexes
+    parser.add_argument('--drop-redundant-indexes',action='store_true',
+        help='only drop the indexes which duplicate a primary key')
+    args = parser.parse_args(argv)
+
+    connect_options = {'host': args.mysql_host, 'user': args.mysql_user,
+        'password': getpass.getpass('MySQL password: ')}
+
+    if args.drop_redundant_indexes:
+        connection = connect(database=args.mysql_database,**connect_options)
+        try:
+            drop_redundant_indexes(connection)
+        finally:
+            connection.close()
+        return
+
+    baseline = None
+    if args.compare:
+        print('Building the IMDb database with the SQL scripts\n')
+        baseline = build_baseline(args.tsv_path,args.mysql_database,
+            args.integer_ids,**connect_options)
+
+    convert_options = {'chunk_size': args.chunk_size,'orphans': args.orphans}
+    if args.data_path is not None:
+        import imdb_converter
+        convert_options['workers'] = args.workers
+        if args.memory_budget is not None:
+            convert_options['memory_budget'] = int(args.memory_budget*2**30)
+        else:
+            convert_options['memory_budget'] = imdb_converter.total_memory()
+
+    print('Building the IMDb database\n')
+    times = build(args.tsv_path,args.data_path,args.mysql_database,
+        args.load_connections,args.integer_ids,convert_options,
+        args.check_foreign_keys,**connect_options)
+
+    print_report(times,baseline)
+
+
+if __name__ == '__main__':
+    main()
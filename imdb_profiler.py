@@ -0,0 +1,624 @@
+#===============================================================================
+# imdb_profiler.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to find which of the
+# project's queries are slow, why, and which indexes would help them.
+#
+# This script does the following:
+# - Reads the queries of SQL_Queries_1.sql (the SELECT of each view Q1 to Q24)
+#   and of the notebook MySQL_IMDb_visualisation.ipynb (Query1, Query2, ...)
+# - Runs each in the IMDb database in MySQL, recording its time, the rows it
+#   returns, the rows MySQL read for it (the session's Handler_read counters)
+#   and its plan (EXPLAIN FORMAT=JSON and EXPLAIN ANALYZE)
+# - Adds the run to a JSON history (default ./profile_history.json) and
+#   reports the queries which have become slower, read more rows or changed
+#   plan since they were last profiled
+# - Proposes composite or covering indexes for the tables the plans read in
+#   full, in the form of imdb-index-tables.sql, e.g.
+#   CREATE INDEX Titles_title_type_start_year_index ON Titles(title_type,
+#   start_year); for Q8. With --append-indexes they are added to
+#   imdb-index-tables.sql.
+#
+# Run in terminal:
+# $ python imdb_profiler.py --mysql-user root
+# $ python imdb_profiler.py --from-history
+#
+# --from-history proposes indexes from the last run in the history, without
+# connecting to MySQL.
+# --check checks the indexes proposed for plans of known shape (see
+# ADVICE_CHECKS), also without MySQL.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import re
+import sys
+import json
+import time
+import getpass
+import argparse
+import datetime
+
+import imdb_schema
+
+# Most columns of an index proposed
+MAX_INDEX_COLUMNS = 4
+
+# Length of the index of TEXT columns, as for Had_role's primary key
+TEXT_INDEX_LENGTH = 255
+
+# Access types of a plan which read the whole table (or whole index)
+FULL_SCANS = ['ALL', 'index']
+
+#-------------------------------------------------------------------------------
+
+# Used to read the queries to profile
+def script_queries(file_name='SQL_Queries_1.sql'):
+    """
+    The queries of SQL script file_name. Returns (views, queries): views is
+    the list of statements making the views, which must be run first, and
+    queries a list of (name, query), named by the view each selects from,
+    e.g. ('Q8', 'SELECT * FROM Q8').
+    """
+
+    views, queries = [], []
+
+    for statement in imdb_schema.statements(file_name):
+        if re.match(r'CREATE\s+(OR\s+REPLACE\s+)?VIEW',statement,flags=re.I):
+            views.append(statement)
+        elif statement.upper().startswith('SELECT'):
+            view = re.search(r'FROM\s+(\w+)',statement,flags=re.I)
+            queries.append((view.group(1) if view else statement,statement))
+
+    return views, queries
+
+def notebook_queries(file_name='MySQL_IMDb_visualisation.ipynb'):
+    """
+    The queries of the notebook file_name, the strings assigned to QueryN in
+    its code cells. Returns a list of (name, query). The query of a CREATE
+    TABLE ... AS SELECT is its SELECT.
+    """
+
+    with open(os.path.join(imdb_schema.sql_path,file_name),
+        encoding='utf-8') as f:
+        notebook = json.load(f)
+
+    queries = []
+
+    for cell in notebook['cells']:
+        if cell['cell_type'] != 'code':
+            continue
+        for name, sql in re.findall(r'(Query\w*)\s*=\s*"""(.*?)"""',
+            ''.join(cell['source']),flags=re.S):
+            sql = re.sub(r'^\s*CREATE\s+TABLE\s+\w+\s+AS\s+','',sql.strip(),
+                flags=re.I)
+            queries.append((name,sql.strip().rstrip(';').strip()))
+
+    return queries
+
+def view_names(views):
+    """
+    The name of each view made by the statements views, mapped to its
+    statement.
+    """
+
+    return {re.search(r'VIEW\s+(\w+)',view,flags=re.I).group(1): view
+        for view in views}
+
+def table_aliases(sql,views={}):
+    """
+    The IMDb table of each table name or alias in query sql, and in the
+    statements of the views (a dict, see view_names) it selects from, e.g.
+    {'T': 'Titles', 'G': 'Title_genres'}.
+    """
+
+    aliases = {table: table for table in imdb_schema.TABLES}
+
+    texts = [sql] + [view for name, view in views.items()
+        if re.search(r'\b' + name + r'\b',sql)]
+    for text in texts:
+        for name, alias in re.findall(r'\b(' + '|'.join(imdb_schema.TABLES) +
+            r')(?:\s+AS)?\s+(\w+)',text,flags=re.I):
+            aliases[alias] = imdb_schema.table_name(name)
+
+    return aliases
+
+#-------------------------------------------------------------------------------
+
+# Used to profile a query
+def handler_reads(cursor):
+    """
+    Rows read by the session of cursor so far, the sum of its Handler_read
+    counters.
+    """
+
+    cursor.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+
+    return sum(int(value) for name, value in cursor.fetchall())
+
+def explain(cursor,sql):
+    """
+    The plan of query sql, from EXPLAIN FORMAT=JSON, as a dict.
+    """
+
+    cursor.execute('EXPLAIN FORMAT=JSON ' + sql)
+
+    return json.loads(cursor.fetchall()[0][0])
+
+def explain_analyze(cursor,sql):
+    """
+    The plan of query sql with the time and rows of each step, from EXPLAIN
+    ANALYZE (which runs it), as text. None if MySQL has no EXPLAIN ANALYZE
+    (before 8.0.18).
+    """
+
+    import mysql.connector
+
+    try:
+        cursor.execute('EXPLAIN ANALYZE ' + sql)
+    except mysql.connector.Error:
+        return None
+
+    return '\n'.join(row[0] for row in cursor.fetchall())
+
+def plan_tables(plan,aliases={}):
+    """
+    How each table is read in plan (from EXPLAIN FORMAT=JSON). Returns a list
+    of dicts, one per table read, with the table's alias and IMDb table (see
+    table_aliases), access type (e.g. ALL for a full scan), key used, rows
+    examined per scan, columns used, whether only the key is read, and the
+    condition checked on each row.
+    """
+
+    tables = []
+
+    if isinstance(plan,dict):
+        if isinstance(plan.get('table'),dict) and \
+            'table_name' in plan['table']:
+            table = plan['table']
+            tables.append({'alias': table['table_name'],
+                'table': aliases.get(table['table_name']),
+                'access_type': table.get('access_type'),
+                'key': table.get('key'),
+                'rows_examined': table.get('rows_examined_per_scan'),
+                'used_columns': table.get('used_columns',[]),
+                'using_index': table.get('using_index',False),
+                'condition': table.get('attached_condition')})
+        items = plan.values()
+    elif isinstance(plan,list):
+        items = plan
+    else:
+        items = []
+
+    for item in items:
+        tables += plan_tables(item,aliases)
+
+    return tables
+
+def profile(cursor,name,sql,aliases={},analyze=True,repeats=1,overhead=0):
+    """
+    Profile query sql, named name, on cursor: its best time of repeats runs,
+    rows returned and rows read, and its plan (see plan_tables). overhead is
+    the rows read by handler_reads itself. Returns a dict, or one with the
+    error if the query fails.
+    """
+
+    import mysql.connector
+
+    record = {'name': name, 'sql': sql}
+
+    try:
+        times = []
+        for i in range(repeats):
+            reads = handler_reads(cursor)
+            start = time.perf_counter()
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+            times.append(time.perf_counter() - start)
+            if i == 0:
+                record['rows_examined'] = max(handler_reads(cursor) - reads -
+                    overhead,0)
+        record['seconds'] = min(times)
+        record['rows'] = len(rows)
+        record['plan'] = plan_tables(explain(cursor,sql),aliases)
+        if analyze:
+            record['analyze'] = explain_analyze(cursor,sql)
+    except mysql.connector.Error as e:
+        record['error'] = str(e)
+
+    return record
+
+def profile_workload(connection,views,queries,analyze=True,repeats=1):
+    """
+    Profile each of queries, a list of (name, query), on connection after
+    making views (see script_queries). Returns a run for the history: a dict
+    with the time, data version (see imdb-load-data.sql) and a record of each
+    query (see profile).
+    """
+
+    import mysql.connector
+
+    cursor = connection.cursor()
+
+    for view in views:
+        cursor.execute(view)
+
+    try:
+        cursor.execute('SELECT version FROM Data_version')
+        version = cursor.fetchall()[0][0]
+    except mysql.connector.Error:
+        version = None
+
+    # Rows read by handler_reads itself
+    reads = handler_reads(cursor)
+    overhead = handler_reads(cursor) - reads
+
+    run = {'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'version': version, 'queries': {}}
+
+    names = view_names(views)
+    for name, sql in queries:
+        print('Profiling',name)
+        run['queries'][name] = profile(cursor,name,sql,table_aliases(sql,
+            names),analyze,repeats,overhead)
+
+    cursor.close()
+
+    return run
+
+#-------------------------------------------------------------------------------
+
+# Used to keep the history of the runs
+def read_history(history_path):
+    """
+    The runs in the JSON history history_path, oldest first. An empty list if
+    there is no history yet.
+    """
+
+    try:
+        with open(history_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+def write_history(history_path,history):
+    """
+    Write history, a list of runs, to the JSON file history_path.
+    """
+
+    with open(history_path,'w') as f:
+        json.dump(history,f,indent=1)
+
+def plan_summary(record):
+    """
+    How each table is read for record, e.g. ['T:ALL', 'G:ref:PRIMARY'].
+    """
+
+    return [table['alias'] + ':' + str(table['access_type']) +
+        (':' + table['key'] if table['key'] else '')
+        for table in record.get('plan',[])]
+
+def regressions(run,history,threshold=0.5):
+    """
+    The queries of run which are slower, or read more rows, by more than a
+    fraction threshold than when last profiled in history, or whose plan has
+    changed. Returns a list of (name, reason).
+    """
+
+    found = []
+
+    for name, record in run['queries'].items():
+        previous = [old['queries'][name] for old in history
+            if name in old['queries'] and 'error' not in old['queries'][name]]
+        if 'error' in record or not previous:
+            continue
+        previous = previous[-1]
+
+        # Times of a few ms are too noisy to compare
+        if record['seconds'] > (1 + threshold)*previous['seconds'] and \
+            record['seconds'] - previous['seconds'] > 0.01:
+            found.append((name,'{:.3f} s, was {:.3f} s'.format(
+                record['seconds'],previous['seconds'])))
+        if record['rows_examined'] > (1 + threshold)*previous['rows_examined']:
+            found.append((name,'read {} rows, was {}'.format(
+                record['rows_examined'],previous['rows_examined'])))
+        if plan_summary(record) != plan_summary(previous):
+            found.append((name,'plan {}, was {}'.format(
+                ' '.join(plan_summary(record)),
+                ' '.join(plan_summary(previous)))))
+
+    return found
+
+#-------------------------------------------------------------------------------
+
+# Used to propose indexes
+def condition_columns(condition,alias):
+    """
+    Columns of table alias in condition (an attached_condition of a plan)
+    compared to a value or another column. Returns (equality, range): the
+    columns compared with =, IN or IS NULL, and those compared with <, >,
+    BETWEEN, LIKE or IS NOT NULL, each in order of appearance.
+    """
+
+    equality, ranges = [], []
+    if not condition:
+        return equality, ranges
+
+    column = r'(?:`\w+`\.)?`(\w+)`\.`(\w+)`'
+
+    found = [(match.start(),match.group(1),match.group(2),
+        match.group(3).lower()) for match in re.finditer(column +
+        r"\s*(<=>|<=|>=|=|<|>|in\b|between\b|like\b|is not\b|is\b)",
+        condition,flags=re.I)]
+    # The column on the right of a join, e.g. T in G.title_id = T.title_id
+    found += [(match.start(2),match.group(2),match.group(3),'=')
+        for match in re.finditer(r'(=)\s*' + column,condition)]
+
+    for position, table, name, operator in sorted(found):
+        if table != alias:
+            continue
+        if operator in ['=', '<=>', 'in', 'is']:
+            if name not in equality:
+                equality.append(name)
+        elif name not in ranges:
+            ranges.append(name)
+
+    return equality, [name for name in ranges if name not in equality]
+
+def index_columns(table):
+    """
+    Columns of an index for table, as read in a plan (see plan_tables):
+    the columns compared to a value, those compared with = first and then the
+    first compared with a range, followed by the other columns the query uses
+    of the table if they fit in MAX_INDEX_COLUMNS, so the index covers it.
+    InnoDB cannot cover a query with a column indexed by a prefix, so the
+    other columns are only added if none of the index's columns is TEXT. The
+    primary key's columns are left out, InnoDB adds them to each index.
+    Returns an empty list if no column is compared to a value.
+    """
+
+    equality, ranges = condition_columns(table['condition'],table['alias'])
+    columns = equality + ranges[:1]
+    if not columns:
+        return []
+
+    types = dict(imdb_schema.column_types().get(table['table'],[]))
+
+    key = imdb_schema.primary_keys().get(table['table'],[])
+    others = [column for column in table['used_columns']
+        if column not in columns and column not in key]
+    if len(columns + others) <= MAX_INDEX_COLUMNS and \
+        not any(types.get(column) == 'TEXT' for column in columns + others):
+        columns = columns + others
+
+    return [column + ('({})'.format(TEXT_INDEX_LENGTH)
+        if types.get(column) == 'TEXT' else '') for column in columns]
+
+def is_prefix(columns,index):
+    """
+    True if columns are the first columns of index, ignoring index lengths.
+    """
+
+    index = [re.sub(r'\(\d+\)','',column) for column in index]
+    columns = [re.sub(r'\(\d+\)','',column) for column in columns]
+
+    return index[:len(columns)] == columns
+
+def advise(run):
+    """
+    Indexes for the tables run's queries read in full (see FULL_SCANS) while
+    checking a condition on their rows, see index_columns. Indexes whose
+    columns start an existing index, primary key or other index proposed, or
+    which start with the primary key, are left out. Returns a list of (table,
+    columns, names of the queries helped).
+    """
+
+    keys = imdb_schema.primary_keys()
+    existing = {table: [columns for index, columns in table_indexes]
+        for table, table_indexes in imdb_schema.indexes().items()}
+    for table, key in keys.items():
+        existing.setdefault(table,[]).append(key)
+
+    proposals = {}
+
+    for name, record in run['queries'].items():
+        for table in record.get('plan',[]):
+            if table['table'] is None or \
+                table['access_type'] not in FULL_SCANS:
+                continue
+            columns = index_columns(table)
+            # Rows found by their primary key are read from it in full
+            if not columns or is_prefix(keys.get(table['table'],[None]),
+                columns):
+                continue
+            if not any(is_prefix(columns,index)
+                for index in existing.get(table['table'],[])):
+                proposals.setdefault((table['table'],tuple(columns)),
+                    []).append(name)
+
+    # Leave out the indexes which start another, that one serves both
+    advice = []
+    for table, columns in proposals:
+        if any(other != columns and is_prefix(columns,other)
+            for other_table, other in proposals if other_table == table):
+            continue
+        names = [name for (other_table, other), other_names in
+            proposals.items() if other_table == table and
+            is_prefix(other,columns) for name in other_names]
+        advice.append((table,list(columns),list(dict.fromkeys(names))))
+
+    return advice
+
+def index_statements(advice):
+    """
+    The CREATE INDEX statements of advice (see advise), each after a comment
+    naming the queries it helps, in the form of imdb-index-tables.sql.
+    """
+
+    lines = []
+
+    for table, columns, names in advice:
+        index = '_'.join([table] + [re.sub(r'\(\d+\)','',column)
+            for column in columns] + ['index'])[:64]
+        lines += ['-- ' + table + ' (' + ', '.join(names) + ')',
+            'CREATE INDEX ' + index + ' ON ' + table + '(' +
+            ', '.join(columns) + ');']
+
+    return lines
+
+def append_indexes(advice,file_name='imdb-index-tables.sql'):
+    """
+    Add the indexes of advice (see advise) to the end of file_name.
+    """
+
+    with open(os.path.join(imdb_schema.sql_path,file_name),'a') as f:
+        f.write('\n-- Proposed by imdb_profiler.py\n\n' +
+            '\n'.join(index_statements(advice)) + '\n')
+
+#-------------------------------------------------------------------------------
+
+# Plans of known shape and the indexes advise should propose for them, checked
+# by check_advice (python imdb_profiler.py --check)
+ADVICE_CHECKS = [
+    # Q8: the used columns include primary_title, TEXT, which cannot make the
+    # index covering, so it stops at the columns of the condition
+    ({'alias': 'T', 'table': 'Titles', 'access_type': 'ALL', 'key': None,
+    'used_columns': ['title_id', 'title_type', 'primary_title', 'start_year'],
+    'condition': "((`IMDb`.`T`.`title_type` in ('movie','video')) and "
+    "(`IMDb`.`T`.`start_year` between 1990 and 2019))"},
+    [('Titles', ['title_type', 'start_year'])]),
+    # Q8 as written, where a covering index fits
+    ({'alias': 'T', 'table': 'Titles', 'access_type': 'ALL', 'key': None,
+    'used_columns': ['title_id', 'title_type', 'start_year'],
+    'condition': "((`IMDb`.`T`.`title_type` in ('movie','video')) and "
+    "(`IMDb`.`T`.`start_year` between 1990 and 2019))"},
+    [('Titles', ['title_type', 'start_year'])]),
+    # A TEXT column in the condition is indexed by its prefix, and no index
+    # with it covers a query
+    ({'alias': 'T', 'table': 'Titles', 'access_type': 'ALL', 'key': None,
+    'used_columns': ['title_id', 'primary_title', 'start_year'],
+    'condition': "(`IMDb`.`T`.`primary_title` = 'The X-Files')"},
+    [('Titles', ['primary_title(255)'])]),
+]
+
+def check_advice():
+    """
+    Check that advise proposes the indexes of ADVICE_CHECKS for their plans.
+    Returns a list of the plans for which it does not, with what it proposed.
+    """
+
+    failed = []
+
+    for table, expected in ADVICE_CHECKS:
+        advice = [(name, columns) for name, columns, names in
+            advise({'queries': {'check': {'plan': [table]}}})]
+        if advice != expected:
+            failed.append((table,advice))
+
+    return failed
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Profile the queries of the project and propose indexes.')
+    parser.add_argument('--script',default='SQL_Queries_1.sql',
+        help='SQL script of queries (default: SQL_Queries_1.sql)')
+    parser.add_argument('--notebook',default='MySQL_IMDb_visualisation.ipynb',
+        help='notebook of queries (default: MySQL_IMDb_visualisation.ipynb)')
+    parser.add_argument('--only',nargs='+',default=None,
+        help='profile only these queries, e.g. Q8 Query4')
+    parser.add_argument('--history',default='./profile_history.json',
+        help='JSON history of the runs (default: ./profile_history.json)')
+    parser.add_argument('--threshold',type=float,default=0.5,
+        help='report queries this fraction slower than their last run '
+        '(default: 0.5)')
+    parser.add_argument('--repeats',type=int,default=1,
+        help='runs of each query, the best time is kept (default: 1)')
+    # EXPLAIN ANALYZE runs each query again
+    parser.add_argument('--no-analyze',action='store_true',
+        help='do not run EXPLAIN ANALYZE')
+    parser.add_argument('--from-history',action='store_true',
+        help='propose indexes from the last run in the history, without '
+        'profiling')
+    parser.add_argument('--append-indexes',action='store_true',
+        help='add the indexes proposed to imdb-index-tables.sql')
+    parser.add_argument('--check',action='store_true',
+        help='check the indexes proposed for plans of known shape, without '
+        'connecting to MySQL')
+    parser.add_argument('--mysql-host',default='localhost')
+    parser.add_argument('--mysql-user',default='root')
+    parser.add_argument('--mysql-database',default='IMDb')
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failed = check_advice()
+        for table, advice in failed:
+            print('Proposed',advice,'for the plan of',table['table'],
+                'with condition',table['condition'])
+        print(len(ADVICE_CHECKS) - len(failed),'of',len(ADVICE_CHECKS),
+            'plans checked')
+        sys.exit(1 if failed else 0)
+
+    history = read_history(args.history)
+
+    if args.from_history:
+        if not history:
+            parser.error('no runs in ' + args.history)
+        run = history[-1]
+    else:
+        import imdb_loader
+
+        views, queries = script_queries(args.script)
+        queries += notebook_queries(args.notebook)
+        if args.only is not None:
+            queries = [(name, sql) for name, sql in queries
+                if name in args.only]
+
+        connection = imdb_loader.connect(args.mysql_host,args.mysql_user,
+            getpass.getpass('MySQL password: '),args.mysql_database)
+        try:
+            run = profile_workload(connection,views,queries,
+                not args.no_analyze,args.repeats)
+        finally:
+            connection.close()
+
+        print('\n{:<10} {:>10} {:>10} {:>14}  {}'.format('Query','seconds',
+            'rows','rows examined','plan'))
+        for name, record in run['queries'].items():
+            if 'error' in record:
+                print('{:<10} {}'.format(name,record['error']))
+            else:
+                print('{:<10} {:>10.3f} {:>10} {:>14}  {}'.format(name,
+                    record['seconds'],record['rows'],record['rows_examined'],
+                    ' '.join(plan_summary(record))))
+
+        found = regressions(run,history,args.threshold)
+        if found:
+            print('\nRegressions since the last run:')
+            for name, reason in found:
+                print(' ',name,reason)
+
+        write_history(args.history,history + [run])
+
+    advice = advise(run)
+    if not advice:
+        print('\nNo indexes to propose')
+        return
+
+    print('\nIndexes proposed:\n')
+    print('\n'.join(index_statements(advice)))
+
+    if args.append_indexes:
+        append_indexes(advice)
+        print('\nAdded to imdb-index-tables.sql')
+
+
+if __name__ == '__main__':
+    main()
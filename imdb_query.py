@@ -0,0 +1,516 @@
+#===============================================================================
+# imdb_query.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to read the results of
+# queries of the IMDb database into pandas, e.g. in
+# MySQL_IMDb_visualisation.ipynb.
+#
+# This script does the following:
+# - Keeps a pool of connections to the IMDb database, so a connection is not
+#   made for each query and several queries can run at once (e.g. in threads)
+# - Reads the rows of a query from an unbuffered cursor, which streams them
+#   from the server as they are fetched, a batch at a time
+# - Turns each batch straight into typed columns (nullable integers, floats
+#   and strings, from the column types MySQL sends), so only one batch of row
+#   tuples is held at once rather than the whole result as from fetchall
+# - Returns the result as a DataFrame, or as an iterator of DataFrames of
+#   chunk_size rows for results too big to hold in memory
+# - Caches the results of queries as parquet files (see Cache), so a query
+#   run again, e.g. when a notebook is rerun, is read from disk. Entries are
+#   for the version of the data in the database, which is stamped with a new
+#   version each time it is loaded (see imdb_schema.version_statements), so
+#   they are not used once the data changes
+# - Builds tables from queries (see build_table), e.g. Leading_people in the
+#   notebook, only once for each version of the data
+#
+# Use from python:
+# >>> import imdb_query
+# >>> pool = imdb_query.connect_pool(user='root',password='...')
+# >>> df = imdb_query.query('SELECT * FROM Titles LIMIT 10',pool=pool)
+# >>> for chunk in imdb_query.query_chunks('SELECT * FROM Principals',
+# ...     chunk_size=1000000,pool=pool):
+# ...     ...
+# >>> cache = imdb_query.use_cache('./query_cache')
+# >>> df = imdb_query.query('SELECT * FROM Titles LIMIT 10')
+# >>> cache.stats()
+# >>> imdb_query.build_table('Top_titles','SELECT * FROM Titles LIMIT 10')
+#
+# Run in terminal:
+# $ python imdb_query.py "SELECT genre, COUNT(*) FROM Title_genres GROUP BY genre"
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import re
+import time
+import getpass
+import hashlib
+import argparse
+import pandas as pd
+
+# Rows fetched from MySQL at a time
+CHUNK_SIZE = 100000
+
+# Pool and cache used when none is given, see connect_pool and use_cache
+default_pool = None
+default_cache = None
+
+#-------------------------------------------------------------------------------
+
+# Used to connect to the IMDb database
+def connect_pool(host='localhost',user='root',password=None,database='IMDb',
+    size=4,**connect_options):
+    """
+    Make a pool of size connections to the IMDb database in MySQL, and use it
+    for the queries which are not given a pool. Returns a
+    mysql.connector.pooling.MySQLConnectionPool, connections are taken from it
+    with get_connection() and given back with close().
+    """
+
+    global default_pool
+
+    import mysql.connector.pooling
+
+    default_pool = mysql.connector.pooling.MySQLConnectionPool(
+        pool_name='imdb_query',pool_size=size,host=host,user=user,
+        passwd=password,database=database,**connect_options)
+
+    return default_pool
+
+#-------------------------------------------------------------------------------
+
+# Used to find the type of each column of a result
+def column_dtypes(description):
+    """
+    The pandas dtype of each column of cursor.description: 'Int64' for integer
+    types, 'float64' for floating point and decimal types, 'str' for text types
+    and object for others (e.g. dates).
+    """
+
+    from mysql.connector.constants import FieldType
+
+    integer_types = [FieldType.TINY, FieldType.SHORT, FieldType.INT24,
+        FieldType.LONG, FieldType.LONGLONG, FieldType.YEAR]
+    float_types = [FieldType.FLOAT, FieldType.DOUBLE, FieldType.DECIMAL,
+        FieldType.NEWDECIMAL]
+    string_types = [FieldType.VARCHAR, FieldType.VAR_STRING, FieldType.STRING,
+        FieldType.BLOB, FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB,
+        FieldType.LONG_BLOB, FieldType.ENUM]
+
+    dtypes = []
+    for column in description:
+        if column[1] in integer_types:
+            dtypes.append('Int64')
+        elif column[1] in float_types:
+            dtypes.append('float64')
+        elif column[1] in string_types:
+            dtypes.append('str')
+        else:
+            dtypes.append(object)
+
+    return dtypes
+
+def batch_frame(rows,names,dtypes):
+    """
+    DataFrame of the list of row tuples rows, built a column at a time with
+    the column names and dtypes given.
+    """
+
+    if not rows:
+        return pd.DataFrame({name: pd.array([],dtype=dtype)
+            for name, dtype in zip(names,dtypes)})
+
+    columns = {}
+    for name, column, dtype in zip(names,zip(*rows),dtypes):
+        # Text in a binary collation (e.g. utf8mb4_bin) may come as bytes
+        if dtype == 'str':
+            column = [value.decode() if isinstance(value,(bytes,bytearray))
+                else value for value in column]
+        columns[name] = pd.array(column,dtype=dtype)
+
+    return pd.DataFrame(columns)
+
+#-------------------------------------------------------------------------------
+
+# Used to stream the result of a query
+def query_chunks(sql,params=None,columns=None,chunk_size=CHUNK_SIZE,pool=None):
+    """
+    Run query sql (with parameters params) and yield its result as DataFrames
+    of up to chunk_size rows, with the column names columns (default: those of
+    the query). The rows are fetched from an unbuffered cursor on a connection
+    from pool (default: the pool made by connect_pool), which is given back to
+    the pool once the rows are read or the iterator is closed.
+    """
+
+    pool = pool or default_pool
+    if pool is None:
+        raise ValueError('No connection pool, see imdb_query.connect_pool')
+
+    connection = pool.get_connection()
+    try:
+        cursor = connection.cursor(buffered=False)
+        cursor.execute(sql,params)
+
+        names = columns or [column[0] for column in cursor.description]
+        dtypes = column_dtypes(cursor.description)
+
+        # The first chunk is yielded even if empty, so the columns are known
+        rows = cursor.fetchmany(chunk_size)
+        yield batch_frame(rows,names,dtypes)
+        while rows:
+            rows = cursor.fetchmany(chunk_size)
+            if rows:
+                yield batch_frame(rows,names,dtypes)
+
+        cursor.close()
+    finally:
+        # Rows left unread if the iterator was closed early
+        if connection.unread_result:
+            connection.consume_results()
+        connection.close()
+
+def query(sql,params=None,columns=None,chunk_size=CHUNK_SIZE,pool=None,
+    cache=None,depends=()):
+    """
+    Run query sql (with parameters params) and return its result as a
+    DataFrame with the column names columns (default: those of the query). The
+    rows are fetched chunk_size at a time, see query_chunks.
+
+    The result is read from, or added to, cache (default: the cache set by
+    use_cache), unless the database has no data version, see data_version.
+    depends lists the queries of the tables built by build_table which sql
+    reads, so the result is not read from the cache once they change.
+    """
+
+    cache = cache or default_cache
+    version = data_version(pool) if cache is not None else None
+
+    if version is not None:
+        df = cache.get(sql,params,version,depends)
+        if df is not None:
+            if columns is not None:
+                df.columns = columns
+            return df
+
+    chunks = list(query_chunks(sql,params,None,chunk_size,pool))
+    if len(chunks) == 1:
+        df = chunks[0]
+    else:
+        df = pd.concat(chunks,ignore_index=True)
+
+    if version is not None:
+        cache.put(df,sql,params,version,depends)
+
+    if columns is not None:
+        df.columns = columns
+
+    return df
+
+def execute(sql,params=None,pool=None):
+    """
+    Run statement sql (with parameters params), which returns no rows, e.g.
+    CREATE TABLE, and commit it.
+    """
+
+    connection = (pool or default_pool).get_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(sql,params)
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+def build_table(table,sql,params=None,pool=None,cache=None):
+    """
+    Build table from the result of query sql (with parameters params), with
+    CREATE TABLE table AS sql, replacing any table of that name. With cache
+    (default: the cache set by use_cache) the table is not built again while
+    the data version and sql are unchanged and it still exists. Returns True
+    if the table was built.
+    """
+
+    cache = cache or default_cache
+    version = data_version(pool) if cache is not None else None
+
+    if version is not None and cache.has_table(table,sql,params,version):
+        tables = next(query_chunks('SHOW TABLES LIKE %s',(table,),pool=pool))
+        if len(tables):
+            return False
+
+    execute('DROP TABLE IF EXISTS ' + table,pool=pool)
+    execute('CREATE TABLE ' + table + ' AS ' + sql,params,pool)
+
+    if version is not None:
+        cache.put_table(table,sql,params,version)
+
+    return True
+
+#-------------------------------------------------------------------------------
+
+# Query result cache
+#-------------------
+# Results are stored as parquet files named by the data version and a hash of
+# the query (with comments and extra whitespace removed), its parameters and
+# the queries of the tables it depends on. The tables built by build_table are
+# recorded by empty .table files named in the same way. When the data version
+# changes the entries of other versions are removed, and the least recently
+# used entries are removed to keep the cache within its disk budget. Results of
+# query_chunks are not cached.
+
+# Used to find the version of the data in the database
+def data_version(pool=None):
+    """
+    The version the data in the IMDb database was stamped with when it was
+    loaded (see imdb_schema.version_statements), or None if it has none.
+    """
+
+    import mysql.connector
+
+    try:
+        df = next(query_chunks('SELECT version FROM Data_version',pool=pool))
+    except mysql.connector.Error:
+        # Loaded before versions were stamped
+        return None
+
+    return df['version'].iloc[0] if len(df) else None
+
+def normalise_sql(sql):
+    """
+    Query sql without comments, extra whitespace or a final semicolon. Quoted
+    strings are kept as they are.
+    """
+
+    parts = re.split(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")""",sql,
+        flags=re.S)
+
+    # Every other part is a quoted string
+    for i in range(0,len(parts),2):
+        part = re.sub(r'/\*.*?\*/',' ',parts[i],flags=re.S)
+        part = re.sub(r'--[^\n]*',' ',part)
+        parts[i] = re.sub(r'\s+',' ',part)
+
+    return ''.join(parts).strip().rstrip(';').strip()
+
+class Cache:
+    """
+    Cache of query results in folder cache_path, kept within cache_size bytes.
+    Counts the hits and misses of get, see stats.
+    """
+
+    def __init__(self,cache_path='./query_cache',cache_size=2**30):
+
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.version = None
+
+    def file_path(self,sql,params,version,depends=(),suffix='.parquet'):
+        """
+        Path of the entry of query sql with parameters params, reading the
+        tables built by the queries depends, for data version version.
+        """
+
+        key = (normalise_sql(sql),params)
+        if depends:
+            key += tuple(normalise_sql(definition) for definition in depends)
+        h = hashlib.sha1(repr(key).encode())
+
+        return os.path.join(self.cache_path,str(version) + '.' + h.hexdigest() +
+            suffix)
+
+    def get(self,sql,params,version,depends=()):
+        """
+        The cached result of query sql with parameters params (reading the
+        tables built by the queries depends) for data version version, or None
+        if it is not cached.
+        """
+
+        if version != self.version:
+            self.remove_versions(version)
+
+        cache_file = self.file_path(sql,params,version,depends)
+
+        try:
+            df = pd.read_parquet(cache_file)
+        except (FileNotFoundError, OSError):
+            self.misses += 1
+            return None
+
+        # Mark as recently used
+        os.utime(cache_file)
+        self.hits += 1
+
+        return df
+
+    def put(self,df,sql,params,version,depends=()):
+        """
+        Add DataFrame df, the result of query sql with parameters params
+        (reading the tables built by the queries depends) for data version
+        version, to the cache.
+        """
+
+        os.makedirs(self.cache_path,exist_ok=True)
+        cache_file = self.file_path(sql,params,version,depends)
+
+        # Written to a temporary file, so an unfinished entry is never read
+        temp_file = cache_file + '.' + str(os.getpid()) + '.tmp'
+        try:
+            df.to_parquet(temp_file,index=False)
+            os.replace(temp_file,cache_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+        self.evict(cache_file)
+
+    def has_table(self,table,sql,params,version):
+        """
+        True if table was built from query sql with parameters params for data
+        version version, see build_table.
+        """
+
+        if version != self.version:
+            self.remove_versions(version)
+
+        return os.path.exists(self.file_path('CREATE TABLE ' + table + ' AS ' +
+            sql,params,version,suffix='.table'))
+
+    def put_table(self,table,sql,params,version):
+        """
+        Record that table was built from query sql with parameters params for
+        data version version.
+        """
+
+        os.makedirs(self.cache_path,exist_ok=True)
+        open(self.file_path('CREATE TABLE ' + table + ' AS ' + sql,params,
+            version,suffix='.table'),'w').close()
+
+    def entries(self):
+        """
+        List of (last used time, size, path) of the entries of the cache, query
+        results and built tables.
+        """
+
+        if not os.path.isdir(self.cache_path):
+            return []
+
+        entries = []
+        for name in os.listdir(self.cache_path):
+            if name.endswith(('.parquet','.table')):
+                try:
+                    stat = os.stat(os.path.join(self.cache_path,name))
+                except OSError:
+                    # Removed by another process
+                    continue
+                entries.append((stat.st_mtime,stat.st_size,
+                    os.path.join(self.cache_path,name)))
+
+        return entries
+
+    def evict(self,keep=None):
+        """
+        Remove the least recently used entries until the cache takes at most
+        cache_size bytes. The entry keep is not removed.
+        """
+
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+
+        for _, file_size, file_path in sorted(entries):
+            if size <= self.cache_size:
+                break
+            if file_path == keep:
+                continue
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            size -= file_size
+            self.evictions += 1
+
+    def remove_versions(self,version):
+        """
+        Remove the entries of data versions other than version, the data has
+        been loaded again since they were added.
+        """
+
+        for _, _, file_path in self.entries():
+            if not os.path.basename(file_path).startswith(str(version) + '.'):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    continue
+
+        self.version = version
+
+    def stats(self):
+        """
+        Dict of the hits, misses and evictions of the cache so far, its hit
+        rate, and the number and total size in bytes of its entries.
+        """
+
+        entries = self.entries()
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits, 'misses': self.misses,
+            'hit_rate': self.hits/lookups if lookups else 0.0,
+            'evictions': self.evictions, 'entries': len(entries),
+            'size': sum(entry[1] for entry in entries)}
+
+def use_cache(cache_path='./query_cache',cache_size=2**30):
+    """
+    Cache the results of queries which are not given a cache in folder
+    cache_path, kept within cache_size bytes. Returns the Cache.
+    """
+
+    global default_cache
+
+    default_cache = Cache(cache_path,cache_size)
+
+    return default_cache
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Run a query of the IMDb database and print its result.')
+    parser.add_argument('sql')
+    parser.add_argument('--host',default='localhost')
+    parser.add_argument('--user',default='root')
+    parser.add_argument('--database',default='IMDb')
+    parser.add_argument('--chunk-size',type=int,default=CHUNK_SIZE,
+        help='rows fetched at a time (default: {})'.format(CHUNK_SIZE))
+    parser.add_argument('--limit',type=int,default=20,
+        help='rows to print (default: 20)')
+    parser.add_argument('--cache-path',default=None,
+        help='folder to cache query results in (default: no cache)')
+    parser.add_argument('--cache-size',type=float,default=1,
+        help='disk space, in GB, the cache may use (default: 1)')
+    args = parser.parse_args(argv)
+
+    connect_pool(args.host,args.user,getpass.getpass('MySQL password: '),
+        args.database,size=1)
+    if args.cache_path is not None:
+        cache = use_cache(args.cache_path,int(args.cache_size*2**30))
+
+    start = time.perf_counter()
+    df = query(args.sql,chunk_size=args.chunk_size)
+    seconds = time.perf_counter() - start
+
+    print(df.head(args.limit).to_string(index=False))
+    print('\n{} rows in {:.2f} s'.format(len(df),seconds))
+    if args.cache_path is not None:
+        print('Cache:',cache.stats())
+
+
+if __name__ == '__main__':
+    main()
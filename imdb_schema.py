@@ -0,0 +1,192 @@
+#===============================================================================
+# imdb_schema.py
+# ------------------------------------------------------------------------------
+#
+# The IMDb database schema, as read from the project's SQL scripts:
+# - imdb-create-tables.sql   table and column names
+# - imdb-add-constraints.sql primary and foreign keys
+# - imdb-index-tables.sql    secondary indexes
+#
+# The SQL scripts are the one place the schema is defined, the functions here
+# read it from them so that python tools (e.g. imdb_delta.py) stay in step.
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import re
+
+# Folder containing the SQL scripts
+sql_path = os.path.dirname(os.path.abspath(__file__))
+
+# Tables output by imdb_converter.py, each as <table>.tsv
+TABLES = ['Titles', 'Title_ratings', 'Aliases', 'Alias_types',
+    'Alias_attributes', 'Episode_belongs_to', 'Title_genres', 'Names_',
+    'Name_worked_as', 'Had_role', 'Known_for', 'Directors', 'Writers',
+    'Principals']
+
+#-------------------------------------------------------------------------------
+
+def read_sql(file_name):
+    """
+    Read the SQL script file_name, with comments removed.
+    """
+
+    with open(os.path.join(sql_path,file_name)) as f:
+        sql = f.read()
+
+    # Remove /* */ and -- comments
+    sql = re.sub(r'/\*.*?\*/','',sql,flags=re.S)
+    sql = re.sub(r'--[^\n]*','',sql)
+
+    return sql
+
+#-------------------------------------------------------------------------------
+
+def table_name(name):
+    """
+    The name of table name as used in TABLES, matched ignoring case.
+    """
+
+    for table in TABLES:
+        if table.lower() == name.lower():
+            return table
+
+    raise ValueError('Unknown IMDb table: ' + name)
+
+#-------------------------------------------------------------------------------
+
+def table_columns():
+    """
+    Columns of each table, in order, from imdb-create-tables.sql. Returns a
+    dict mapping table name to a list of column names.
+    """
+
+    columns = {}
+
+    for name, body in re.findall(r'CREATE TABLE (\w+) \((.*?)\);',
+        read_sql('imdb-create-tables.sql'),flags=re.S):
+        columns[table_name(name)] = [line.split()[0]
+            for line in body.strip().split('\n') if line.strip()]
+
+    return columns
+
+#-------------------------------------------------------------------------------
+
+def primary_keys(lengths=False):
+    """
+    Primary key of each table, from imdb-add-constraints.sql. Returns a dict
+    mapping table name to a list of column names. If lengths is True index
+    lengths are kept, e.g. role_(255) rather than role_.
+    """
+
+    keys = {}
+
+    for name, key in re.findall(
+        r'ALTER TABLE (\w+)\s+ADD CONSTRAINT \w+ PRIMARY KEY \(([^;]*)\);',
+        read_sql('imdb-add-constraints.sql')):
+        keys[table_name(name)] = [column.strip() if lengths else
+            re.sub(r'\(\d+\)','',column).strip() for column in key.split(',')]
+
+    return keys
+
+#-------------------------------------------------------------------------------
+
+def foreign_keys():
+    """
+    Foreign keys of each table, from imdb-add-constraints.sql. Returns a dict
+    mapping table name to a list of (constraint name, columns, referenced
+    table, referenced columns).
+    """
+
+    keys = {}
+
+    for name, constraint, columns, parent, parent_columns in re.findall(
+        r'ALTER TABLE (\w+)\s+ADD CONSTRAINT (\w+) FOREIGN KEY \(([^)]*)\)\s+'
+        r'REFERENCES (\w+)\s*\(([^)]*)\);',read_sql('imdb-add-constraints.sql')):
+        keys.setdefault(table_name(name),[]).append((constraint,
+            [column.strip() for column in columns.split(',')],
+            table_name(parent),
+            [column.strip() for column in parent_columns.split(',')]))
+
+    return keys
+
+#-------------------------------------------------------------------------------
+
+def indexes():
+    """
+    Secondary indexes of each table, from imdb-index-tables.sql. Returns a dict
+    mapping table name to a list of (index name, columns). Index lengths are
+    kept, e.g. primary_title(255).
+    """
+
+    table_indexes = {}
+
+    for index, name, columns in re.findall(
+        r'CREATE INDEX (\w+) ON (\w+)\s*\(([^;]*)\);',
+        read_sql('imdb-index-tables.sql')):
+        table_indexes.setdefault(table_name(name),[]).append((index,
+            [column.strip() for column in columns.split(',')]))
+
+    return table_indexes
+
+#-------------------------------------------------------------------------------
+
+def redundant_indexes():
+    """
+    Secondary indexes in imdb-index-tables.sql which are not needed once the
+    primary keys are in place, as their columns are the first columns of their
+    table's primary key (e.g. Titles_index on Titles(title_id)). InnoDB stores
+    a table in primary key order, so the primary key serves the same lookups.
+    Returns a list of (table, index name).
+    """
+
+    keys = primary_keys()
+
+    return [(table, index) for table, table_indexes in indexes().items()
+        for index, columns in table_indexes
+        if keys.get(table,[])[:len(columns)] == columns]
+
+#-------------------------------------------------------------------------------
+
+def statements(file_name):
+    """
+    The SQL statements of the SQL script file_name, with comments removed.
+    """
+
+    return [statement.strip() for statement in read_sql(file_name).split(';')
+        if statement.strip()]
+
+#-------------------------------------------------------------------------------
+
+def version_statements():
+    """
+    The statements at the end of imdb-load-data.sql which stamp the data
+    loaded with a new version (in table Data_version), for tools which change
+    the data in other ways, e.g. imdb_loader.py and imdb_delta.py.
+    """
+
+    return [statement for statement in statements('imdb-load-data.sql')
+        if 'Data_version' in statement]
+
+#-------------------------------------------------------------------------------
+
+def column_types(file_name='imdb-create-tables.sql'):
+    """
+    Columns of each table, in order, with their SQL types, from the create
+    tables script file_name (e.g. imdb-create-tables-integer-ids.sql). Returns
+    a dict mapping table name to a list of (column name, type), e.g.
+    ('title_id', 'VARCHAR(255)').
+    """
+
+    types = {}
+
+    for name, body in re.findall(r'CREATE TABLE (\w+) \((.*?)\);',
+        read_sql(file_name),flags=re.S):
+        types[table_name(name)] = [(line.split()[0],
+            line.split()[1].rstrip(','))
+            for line in body.strip().split('\n') if line.strip()]
+
+    return types
@@ -4,8 +4,28 @@
 #         title_id = 'tt0165362'
 #         bs = get_title_webpage(title_id)
 #         poster_link = get_imdb_title_poster_url(bs)
+#
+#     - Get poster urls for many title_ids at once, e.g., to backfill a
+#       catalogue. The pages are fetched in threads, over connections kept open
+#       and no more than rate requests a second to a host, retrying failures.
+#       Only the poster part of each page is parsed. The urls found are cached
+#       in cache_path, so a rerun only fetches the titles not yet resolved (or
+#       resolved more than ttl seconds ago)
+#         poster_links = get_poster_urls(['tt0165362','tt0354593'])
+#
+#     - Or in terminal:
+#         $ python imdb_scraper.py tt0165362 tt0354593
+#         $ python imdb_scraper.py --file title_ids.txt --workers 8 --rate 4
 
 
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import http.client
+import urllib.parse
+import concurrent.futures
 from bs4 import BeautifulSoup
 from urllib.request import urlopen
 
@@ -15,6 +35,17 @@ from urllib.request import urlopen
 # title_id = 'tt0354593'
 # https://m.media-amazon.com/images/M/MV5BOGM0Yzk1NzYtZjQzMC00OWViLTkzYmEtNGRiNzkxZDc4NjJkXkEyXkFqcGdeQXVyNzI1NzMxNzM@._V1_UY268_CR18,0,182,268_AL_.jpg
 
+IMDB_URL = 'https://www.imdb.com'
+
+# Status codes of responses worth retrying
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+class TitleNotFound(http.client.HTTPException):
+    """Raised when a title's page is not found (HTTP 404), which may not last,
+    so it is not cached."""
+
+
 def get_title_webpage(title_id):
     """Given an IMDb title_id this function will return the title's webpage as
     a BeautifulSoup object."""
@@ -40,3 +71,284 @@ def get_imdb_title_poster_url(bs):
     poster_link = data.img['src']
 
     return poster_link
+
+
+def get_poster_url_from_html(html):
+    """Given the HTML of a title's IMDb webpage (a string) this function will
+    return the url for its poster, or None if it has none. Only the poster div
+    (or, failing that, the og:image meta tag of newer pages) is parsed, not
+    the whole page."""
+
+    # Extract the poster div, up to the end of its img tag
+    start = html.find('class="poster"')
+    if start != -1:
+        start = html.rfind('<div',0,start)
+        end = html.find('>',html.find('<img',start)) + 1
+        if start != -1 and end > start:
+            data = BeautifulSoup(html[start:end],"html.parser").find('img')
+            if data is not None and data.get('src'):
+                return data['src']
+
+    # Extract the og:image meta tag
+    start = html.find('property="og:image"')
+    if start != -1:
+        start = html.rfind('<meta',0,start)
+        end = html.find('>',start) + 1
+        data = BeautifulSoup(html[start:end],"html.parser").find('meta')
+        if data is not None and data.get('content'):
+            return data['content']
+
+    return None
+
+
+class RateLimit:
+    """Spaces out the requests to each host, so there are no more than rate a
+    second to any one host. Shared by the threads fetching pages."""
+
+    def __init__(self,rate):
+        self.interval = 1/rate if rate else 0
+        # Time of the next request allowed to each host
+        self.next_time = {}
+        self.lock = threading.Lock()
+
+    def wait(self,host):
+        """Wait until a request to host is allowed."""
+
+        with self.lock:
+            now = time.monotonic()
+            start = max(now,self.next_time.get(host,now))
+            self.next_time[host] = start + self.interval
+        time.sleep(max(start - now,0))
+
+
+class PosterCache:
+    """Poster urls of titles in the SQLite database cache_path, each with the
+    time it was fetched. A title without a poster is cached as None."""
+
+    def __init__(self,cache_path='./poster_cache.sqlite'):
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS Posters '
+            '(title_id TEXT PRIMARY KEY, poster_url TEXT, fetched REAL)')
+
+    def get(self,title_ids,ttl=None):
+        """Dict of the cached poster urls of title_ids, fetched less than ttl
+        seconds ago (any time if ttl is None)."""
+
+        oldest = time.time() - ttl if ttl is not None else 0
+        found = {}
+        title_ids = list(title_ids)
+        # In batches, as SQLite limits the parameters of a statement
+        for i in range(0,len(title_ids),500):
+            batch = title_ids[i:i + 500]
+            rows = self.connection.execute('SELECT title_id, poster_url '
+                'FROM Posters WHERE fetched >= ? AND title_id IN ({})'.format(
+                ','.join('?'*len(batch))),[oldest] + batch)
+            found.update(rows)
+
+        return found
+
+    def put(self,title_id,poster_url):
+        """Cache the poster url of title_id."""
+
+        with self.connection:
+            self.connection.execute('REPLACE INTO Posters VALUES (?,?,?)',
+                (title_id,poster_url,time.time()))
+
+    def close(self):
+        self.connection.close()
+
+
+class PosterFetcher:
+    """Fetch the IMDb webpages of titles in threads (workers at once), each
+    thread keeping its connections open for the pages it fetches next. No more
+    than rate requests a second are made to a host, and a request which fails
+    (or gets a response in RETRY_STATUS) is retried up to retries times, after
+    backoff, 2*backoff, ... seconds. base_url is the site fetched from, e.g. a
+    local server for testing."""
+
+    def __init__(self,workers=8,rate=4,retries=3,backoff=1,timeout=30,
+        base_url=IMDB_URL):
+
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        self.rate_limit = RateLimit(rate)
+
+        # Connections of each thread, by scheme and host
+        self._local = threading.local()
+
+    def _connection(self,scheme,host):
+        connections = self._local.__dict__.setdefault('connections',{})
+        if (scheme,host) not in connections:
+            if scheme == 'https':
+                connection = http.client.HTTPSConnection(host,
+                    timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(host,
+                    timeout=self.timeout)
+            connections[(scheme,host)] = connection
+        return connections[(scheme,host)]
+
+    def _close(self,scheme,host):
+        connections = self._local.__dict__.get('connections',{})
+        if (scheme,host) in connections:
+            connections.pop((scheme,host)).close()
+
+    def get(self,url):
+        """The status and body (a string) of the response to a GET of url,
+        following redirects. A relative url is on base_url."""
+
+        url = urllib.parse.urljoin(self.base_url + '/',url)
+
+        for _ in range(5):
+            parts = urllib.parse.urlsplit(url)
+            path = parts.path + ('?' + parts.query if parts.query else '')
+
+            self.rate_limit.wait(parts.netloc)
+            connection = self._connection(parts.scheme,parts.netloc)
+            try:
+                connection.request('GET',path or '/',headers={
+                    'User-Agent': 'Mozilla/5.0 (imdb_scraper.py)',
+                    'Accept-Language': 'en'})
+                response = connection.getresponse()
+                # Read to the end, so the connection can be used again
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                # Dropped or timed out, the next request reconnects
+                self._close(parts.scheme,parts.netloc)
+                raise
+
+            if response.getheader('Connection','').lower() == 'close':
+                self._close(parts.scheme,parts.netloc)
+
+            if response.status in [301, 302, 303, 307, 308] and \
+                response.getheader('Location'):
+                # Relative to the url just fetched
+                url = urllib.parse.urljoin(url,response.getheader('Location'))
+                continue
+
+            charset = response.headers.get_content_charset() or 'utf-8'
+            return response.status, body.decode(charset,errors='replace')
+
+        raise http.client.HTTPException('Too many redirects: ' + url)
+
+    def get_poster_url(self,title_id):
+        """The poster url of title title_id, or None if its page has no poster.
+        Raises TitleNotFound if there is no page for the title, or another
+        error if its page could not be fetched."""
+
+        for attempt in range(self.retries + 1):
+            try:
+                status, html = self.get('/title/' + title_id + '/')
+            except (OSError, http.client.HTTPException):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff*2**attempt)
+                continue
+
+            if status == 200:
+                return get_poster_url_from_html(html)
+            if status == 404:
+                raise TitleNotFound('HTTP 404 for ' + title_id)
+            if status not in RETRY_STATUS or attempt == self.retries:
+                raise http.client.HTTPException('HTTP {} for {}'.format(
+                    status,title_id))
+            time.sleep(self.backoff*2**attempt)
+
+    def get_poster_urls(self,title_ids,cache=None,ttl=None):
+        """Dict of the poster urls (or None) of title_ids, fetched at once.
+        Given a PosterCache cache, the titles cached less than ttl seconds ago
+        are not fetched, and those fetched are added to it. Titles not found
+        are left out and printed, and are not cached, so they are fetched again
+        next time. The titles which could not be fetched are left out and
+        printed too."""
+
+        title_ids = list(dict.fromkeys(title_ids))
+        poster_links = cache.get(title_ids,ttl) if cache is not None else {}
+        fetch = [title_id for title_id in title_ids
+            if title_id not in poster_links]
+        print(len(poster_links),'cached,',len(fetch),'to fetch')
+
+        failed = not_found = 0
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            futures = {pool.submit(self.get_poster_url,title_id): title_id
+                for title_id in fetch}
+            for i, future in enumerate(
+                concurrent.futures.as_completed(futures)):
+                title_id = futures[future]
+                try:
+                    poster_links[title_id] = future.result()
+                except TitleNotFound:
+                    not_found += 1
+                    print('Not found:',title_id)
+                    continue
+                except (OSError, http.client.HTTPException) as e:
+                    failed += 1
+                    print('Could not fetch',title_id + ':',e)
+                    continue
+                # Cached from this thread only, as SQLite connections are not
+                # shared between threads
+                if cache is not None:
+                    cache.put(title_id,poster_links[title_id])
+                if (i + 1) % 1000 == 0:
+                    print('Fetched',i + 1,'of',len(fetch))
+
+        if not_found:
+            print(not_found,'titles not found')
+        if failed:
+            print(failed,'titles could not be fetched')
+
+        return {title_id: poster_links[title_id] for title_id in title_ids
+            if title_id in poster_links}
+
+
+def get_poster_urls(title_ids,cache_path='./poster_cache.sqlite',
+    ttl=30*24*3600,**options):
+    """Given a list of IMDb title_ids this function will return a dict of the
+    urls for their posters (None for those without, titles not found are left
+    out), see PosterFetcher for the options. The urls are cached in
+    cache_path (None for no cache) for ttl seconds."""
+
+    cache = PosterCache(cache_path) if cache_path is not None else None
+    try:
+        return PosterFetcher(**options).get_poster_urls(title_ids,cache,ttl)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Get the poster urls of IMDb titles.')
+    parser.add_argument('title_ids',nargs='*',help='e.g. tt0165362')
+    parser.add_argument('--file',default=None,
+        help='file of title_ids, one a line')
+    parser.add_argument('--cache-path',default='./poster_cache.sqlite')
+    parser.add_argument('--ttl-days',type=float,default=30,
+        help='fetch the titles cached more than this many days ago again '
+        '(default: 30)')
+    parser.add_argument('--workers',type=int,default=8)
+    parser.add_argument('--rate',type=float,default=4,
+        help='requests a second to a host (default: 4)')
+    parser.add_argument('--retries',type=int,default=3)
+    parser.add_argument('--base-url',default=IMDB_URL)
+    args = parser.parse_args()
+
+    title_ids = args.title_ids
+    if args.file is not None:
+        with open(args.file) as f:
+            title_ids += [line.strip() for line in f if line.strip()]
+    if not title_ids:
+        parser.error('no title_ids given')
+
+    poster_links = get_poster_urls(title_ids,cache_path=args.cache_path,
+        ttl=args.ttl_days*24*3600,workers=args.workers,rate=args.rate,
+        retries=args.retries,base_url=args.base_url)
+
+    for title_id, poster_link in poster_links.items():
+        print(title_id,poster_link)
+
+    sys.exit(0 if len(poster_links) == len(set(title_ids)) else 1)
@@ -0,0 +1,263 @@
+#===============================================================================
+# imdb_search.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to search the text columns
+# Had_role.role_, Titles.primary_title and Names_.name_ by substring, e.g. for
+# the roles of Query 9 (James Bond), without scanning the whole table as
+# LIKE '%...%' does in MySQL.
+#
+# This script does the following:
+# - Builds a trigram index of each of these columns: every 3 byte sequence of
+#   the lower cased (UTF-8) text is mapped to the sorted list of the rows
+#   containing it
+# - Searches a column for a substring, ignoring case, by intersecting the rows
+#   of the trigrams of the substring and then checking only those rows
+#
+# The index is written to a folder (./search_index) with a file per segment
+# of up to SEGMENT_ROWS rows of each table, so it can be built a chunk at a
+# time. It is built by the converter:
+# $ python imdb_converter.py --search-index
+# or from the TSV files it output:
+# $ python imdb_search.py build --tsv-path .
+# Then search it in terminal:
+# $ python imdb_search.py query Had_role "james bond"
+# or from python:
+# >>> import imdb_search
+# >>> imdb_search.search('Had_role','james bond')
+#
+# The benchmark benchmarks/bench_search.py compares searching the index with
+# scanning the tables (and with LIKE queries in MySQL).
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import glob
+import time
+import shutil
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+
+# Columns indexed in each table, with the columns kept with them to identify
+# the rows found
+SEARCH_COLUMNS = {
+    'Had_role': (['title_id','name_id'], 'role_'),
+    'Titles': (['title_id'], 'primary_title'),
+    'Names_': (['name_id'], 'name_'),
+}
+
+# Rows per segment of the index, which bounds the memory used to build it
+SEGMENT_ROWS = 2000000
+
+#-------------------------------------------------------------------------------
+
+# Used to find the trigrams of text
+def trigrams(values):
+    """
+    Trigrams of each of values (a Series of lower cased strings, without
+    newlines). Returns the arrays (codes, rows): the 3 bytes of each trigram as
+    an integer, and the position in values of the value containing it, sorted
+    by code then row, without repeats.
+    """
+
+    # The UTF-8 bytes of the values, one per line
+    data = np.frombuffer(('\n'.join(values.fillna('').tolist()) + '\n').encode(),
+        dtype=np.uint8)
+
+    newline = data == ord('\n')
+    rows = np.cumsum(newline) - newline
+
+    # A trigram starts at each byte which is followed by 2 more in its value
+    start = ~(newline[:-2] | newline[1:-1] | newline[2:])
+    positions = np.flatnonzero(start)
+    codes = ((data[positions].astype(np.uint64) << 16) |
+        (data[positions + 1].astype(np.uint64) << 8) |
+        data[positions + 2].astype(np.uint64))
+
+    keys = np.unique((codes << 32) | rows[positions].astype(np.uint64))
+
+    return (keys >> 32).astype(np.uint32), (keys & 0xffffffff).astype(np.int32)
+
+def pattern_trigrams(pattern):
+    """
+    Codes of the trigrams of pattern (a lower cased string), without repeats.
+    """
+
+    codes, rows = trigrams(pd.Series([pattern]))
+
+    return codes
+
+#-------------------------------------------------------------------------------
+
+# Used to build a segment of the index
+def build_segment(df,column):
+    """
+    Build the index of the text column of DataFrame df. Returns a dict with
+    the rows of df ('rows') and their trigrams: the codes of the trigrams in
+    order ('codes') and the rows of each, postings[offsets[i]:offsets[i+1]]
+    for the i-th code.
+    """
+
+    codes, rows = trigrams(df[column].str.lower())
+    codes, counts = np.unique(codes,return_counts=True)
+
+    return {'rows': df.reset_index(drop=True), 'codes': codes,
+        'offsets': np.concatenate([[0],np.cumsum(counts)]), 'postings': rows}
+
+def write_segments(df,table,search_path='./search_index',append=False):
+    """
+    Add the rows of DataFrame df, rows (or a chunk) of table, to the index of
+    table in folder search_path, in segments of up to SEGMENT_ROWS rows. If
+    append is False the index of table is first removed.
+    """
+
+    keys, column = SEARCH_COLUMNS[table]
+    folder = os.path.join(search_path,table)
+
+    if not append:
+        shutil.rmtree(folder,ignore_errors=True)
+    os.makedirs(folder,exist_ok=True)
+
+    number = len(glob.glob(os.path.join(folder,'*.segment')))
+
+    for start in range(0,len(df),SEGMENT_ROWS):
+        segment = build_segment(df[keys + [column]].iloc[start:start +
+            SEGMENT_ROWS],column)
+        with open(os.path.join(folder,'{:05d}.segment'.format(number)),
+            'wb') as f:
+            pickle.dump(segment,f,protocol=pickle.HIGHEST_PROTOCOL)
+        number += 1
+
+# Used to build the index from the TSV files output by imdb_converter.py
+def build(tsv_path='.',search_path='./search_index',chunk_size=SEGMENT_ROWS):
+    """
+    Build the index of each table in SEARCH_COLUMNS from <table>.tsv in folder
+    tsv_path, reading it in chunks of chunk_size rows.
+    """
+
+    for table, (keys, column) in SEARCH_COLUMNS.items():
+
+        print("\tIndexing '"+table+"."+column+"'")
+
+        chunks = pd.read_csv(os.path.join(tsv_path,table + '.tsv'),sep='\t',
+            usecols=keys + [column],dtype='str',na_values='\\N',
+            keep_default_na=False,chunksize=chunk_size)
+
+        for i, chunk in enumerate(chunks):
+            write_segments(chunk,table,search_path,append=i>0)
+
+#-------------------------------------------------------------------------------
+
+# Segments read so far, kept so later searches do not read them again
+segments = {}
+
+def read_segments(table,search_path='./search_index'):
+    """
+    The segments of the index of table in folder search_path.
+    """
+
+    folder = os.path.join(search_path,table)
+
+    if folder not in segments:
+        files = sorted(glob.glob(os.path.join(folder,'*.segment')))
+        if not files:
+            raise ValueError('No search index of ' + table + ' in ' +
+                search_path + ', see imdb_search.build')
+        segments[folder] = []
+        for file in files:
+            with open(file,'rb') as f:
+                segments[folder].append(pickle.load(f))
+
+    return segments[folder]
+
+# Used to search a column
+def search(table,pattern,whole=False,search_path='./search_index'):
+    """
+    Rows of table whose indexed column (see SEARCH_COLUMNS) contains pattern,
+    ignoring case, i.e. LIKE '%pattern%' with a case insensitive collation, or
+    if whole is True equals pattern ignoring case. Returns a DataFrame of the
+    rows found, with the columns of SEARCH_COLUMNS, in index order.
+    """
+
+    keys, column = SEARCH_COLUMNS[table]
+    pattern = pattern.lower()
+    codes = pattern_trigrams(pattern)
+    found = []
+
+    for segment in read_segments(table,search_path):
+
+        if len(codes) == 0:
+            # Shorter than a trigram, check every row
+            rows = segment['rows']
+        else:
+            # Rows holding every trigram of pattern, rarest first
+            i = np.searchsorted(segment['codes'],codes)
+            if (i >= len(segment['codes'])).any() or (segment['codes'][
+                np.minimum(i,len(segment['codes']) - 1)] != codes).any():
+                continue
+            lists = sorted((segment['postings'][segment['offsets'][j]:
+                segment['offsets'][j + 1]] for j in i),key=len)
+            candidates = lists[0]
+            for rows in lists[1:]:
+                candidates = np.intersect1d(candidates,rows,assume_unique=True)
+            rows = segment['rows'].iloc[candidates]
+
+        text = rows[column].str.lower()
+        if whole:
+            match = text == pattern
+        else:
+            match = text.str.contains(pattern,regex=False)
+        found.append(rows[match.fillna(False).to_numpy(dtype=bool)])
+
+    if not found:
+        return pd.DataFrame(columns=keys + [column])
+
+    return pd.concat(found,ignore_index=True)
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Search the text columns of the IMDb tables by substring.')
+    subparsers = parser.add_subparsers(dest='command',required=True)
+
+    build_parser = subparsers.add_parser('build',
+        help='build the index from the TSV files output by imdb_converter.py')
+    build_parser.add_argument('--tsv-path',default='.',
+        help='folder containing the TSV files (default: .)')
+    build_parser.add_argument('--search-path',default='./search_index',
+        help='folder to write the index to (default: ./search_index)')
+
+    query_parser = subparsers.add_parser('query',
+        help='search a table, e.g. query Had_role "james bond"')
+    query_parser.add_argument('table',choices=list(SEARCH_COLUMNS))
+    query_parser.add_argument('pattern')
+    query_parser.add_argument('--whole',action='store_true',
+        help='find values equal to pattern, rather than containing it')
+    query_parser.add_argument('--search-path',default='./search_index',
+        help='folder containing the index (default: ./search_index)')
+    query_parser.add_argument('--limit',type=int,default=20,
+        help='rows to print (default: 20)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build(args.tsv_path,args.search_path)
+    else:
+        read_segments(args.table,args.search_path)
+        start = time.perf_counter()
+        rows = search(args.table,args.pattern,args.whole,args.search_path)
+        seconds = time.perf_counter() - start
+        print(rows.head(args.limit).to_string(index=False))
+        print('\n{} rows found in {:.1f} ms'.format(len(rows),1000*seconds))
+
+
+if __name__ == '__main__':
+    main()
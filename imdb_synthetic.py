@@ -0,0 +1,511 @@
+#===============================================================================
+# imdb_synthetic.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to make synthetic IMDb
+# data files, so the converter can be tested and benchmarked (see
+# benchmarks/bench_builders.py) without downloading the IMDb dataset.
+#
+# This script does the following:
+# - Writes the seven IMDb data files (title.basics.tsv.gz, ...) in the format
+#   of the IMDb dataset, with about the given number of rows in total, from
+#   10 thousand to 100 million
+# - Makes the same files for the same rows and seed
+# - Gives each file about the rows per title of the IMDb dataset, and each
+#   column about its share of NULLs (\N), list lengths (e.g. directors,
+#   knownForTitles and characters) and share of orphans, IDs of titles or
+#   names which are not in title.basics.tsv or name.basics.tsv (see
+#   IMDb_data_issues.md). These are set in the tables below, from the 2019
+#   dataset rounded.
+#
+# The files are written a block of titles (or names) at a time, so the memory
+# needed does not grow with the number of rows.
+#
+# Run in terminal:
+# $ python imdb_synthetic.py --rows 1000000 --data-path ./imdb_data
+#
+# Use from python:
+# >>> import imdb_synthetic
+# >>> imdb_synthetic.generate('./imdb_data',rows=1000000)
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import numpy as np
+import pandas as pd
+import os
+import io
+import gzip
+import argparse
+
+# Rows of each file per title, about those of the IMDb dataset. The rows of
+# title.episode.tsv are the titles of type tvEpisode, those of title.akas.tsv
+# and title.principals.tsv follow from their LIST_LENGTHS.
+ROWS_PER_TITLE = {'title.basics.tsv': 1, 'title.akas.tsv': 0.59,
+    'title.crew.tsv': 1, 'title.episode.tsv': 0.68, 'name.basics.tsv': 1.55,
+    'title.principals.tsv': 5.25, 'title.ratings.tsv': 0.16}
+
+# Names per title
+NAMES_PER_TITLE = ROWS_PER_TITLE['name.basics.tsv']
+
+# Share of each title type
+TITLE_TYPES = {'tvEpisode': 0.68, 'short': 0.12, 'movie': 0.09, 'video': 0.04,
+    'tvSeries': 0.03, 'tvMovie': 0.02, 'tvSpecial': 0.005, 'tvMiniSeries':
+    0.005, 'videoGame': 0.005, 'tvShort': 0.005}
+
+GENRES = {'Drama': 0.18, 'Comedy': 0.15, 'Talk-Show': 0.07, 'Short': 0.07,
+    'Documentary': 0.07, 'Romance': 0.05, 'Family': 0.05, 'News': 0.04,
+    'Animation': 0.04, 'Reality-TV': 0.04, 'Action': 0.03, 'Crime': 0.03,
+    'Adventure': 0.03, 'Music': 0.02, 'Game-Show': 0.02, 'Adult': 0.02,
+    'Sport': 0.015, 'Fantasy': 0.015, 'Mystery': 0.015, 'Horror': 0.015,
+    'Thriller': 0.01, 'History': 0.01, 'Biography': 0.01, 'Sci-Fi': 0.01,
+    'Musical': 0.005, 'War': 0.003, 'Western': 0.002, 'Film-Noir': 0.005}
+
+CATEGORIES = {'actor': 0.27, 'actress': 0.17, 'self': 0.12, 'writer': 0.11,
+    'director': 0.09, 'producer': 0.08, 'composer': 0.05,
+    'cinematographer': 0.05, 'editor': 0.04, 'production_designer': 0.01,
+    'archive_footage': 0.01}
+
+PROFESSIONS = {'actor': 0.25, 'actress': 0.15, 'miscellaneous': 0.1,
+    'producer': 0.08, 'writer': 0.08, 'camera_department': 0.06,
+    'director': 0.06, 'editor': 0.04, 'composer': 0.04,
+    'sound_department': 0.04, 'art_department': 0.04, 'cinematographer': 0.03,
+    'soundtrack': 0.03}
+
+REGIONS = {'US': 0.2, 'GB': 0.1, 'FR': 0.08, 'DE': 0.08, 'IN': 0.07,
+    'ES': 0.07, 'IT': 0.07, 'JP': 0.07, 'CA': 0.06, 'BR': 0.06, 'XWW': 0.14}
+
+LANGUAGES = {'en': 0.4, 'ja': 0.15, 'fr': 0.12, 'es': 0.11, 'hi': 0.1,
+    'de': 0.12}
+
+ALIAS_TYPES = {'imdbDisplay': 0.6, 'original': 0.2, 'alternative': 0.1,
+    'working': 0.05, 'festival': 0.03, 'dvd': 0.02}
+
+ALIAS_ATTRIBUTES = {'literal English title': 0.4, 'alternative spelling':
+    0.3, 'short title': 0.2, 'complete title': 0.1}
+
+# Share of NULLs of each column
+NULLS = {'startYear': 0.11, 'endYear': 0.5, 'runtimeMinutes': 0.7,
+    'region': 0.1, 'language': 0.8, 'types': 0.9, 'attributes': 0.99,
+    'seasonNumber': 0.2, 'episodeNumber': 0.2, 'birthYear': 0.95,
+    'deathYear': 0.6, 'job': 0.82}
+
+# Share of rows with each list length (from 0, a NULL, up) of each list column
+LIST_LENGTHS = {'genres': [0.07, 0.55, 0.2, 0.18],
+    'directors': [0.43, 0.5, 0.05, 0.02],
+    'writers': [0.48, 0.35, 0.1, 0.07],
+    'primaryProfession': [0.2, 0.55, 0.17, 0.08],
+    'knownForTitles': [0.15, 0.45, 0.13, 0.09, 0.18],
+    'characters': [0.55, 0.42, 0.02, 0.01],
+    'akas': [0.75, 0.1, 0.05, 0.04, 0.03, 0.03],
+    'principals': [0, 0.2, 0.1, 0.05, 0.05, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1]}
+
+# Share of the IDs of each column which are orphans
+ORPHANS = {'titleId': 0.001, 'directors': 0.001, 'writers': 0.001,
+    'parentTconst': 0.0005, 'knownForTitles': 0.02, 'nconst': 0.0005}
+
+# Characters played, roles of self are Himself or Herself
+CHARACTERS = 100000
+
+# Titles (or names) in each block of rows written
+BLOCK_SIZE = 100000
+
+#-------------------------------------------------------------------------------
+
+# Used to make the columns of the files
+def choose(rng,values,n):
+    """
+    n values drawn from values, a dict mapping each value to its share, as an
+    object array.
+    """
+
+    shares = np.array(list(values.values()))
+
+    return np.array(list(values),dtype=object)[rng.choice(len(values),n,
+        p=shares/shares.sum())]
+
+def choose_lists(rng,values,counts):
+    """
+    Lists of distinct values drawn from values, a dict mapping each value to
+    its share, counts[i] of them for row i. Returns the values of all of the
+    lists in turn, as an object array.
+    """
+
+    shares = np.array(list(values.values()))
+
+    # Order the values of each row by a random key weighted by their shares,
+    # and take the first counts[i] of row i
+    keys = rng.random((len(counts),len(values)))**(1/shares)
+    order = np.argsort(-keys,axis=1)
+    taken = order[np.arange(len(values)) < counts[:,None]]
+
+    return np.array(list(values),dtype=object)[taken]
+
+def with_nulls(rng,values,share):
+    """
+    values (an array of strings) with a share of them replaced by NULL (\\N).
+    """
+
+    values = np.asarray(values,dtype=object)
+    values[rng.random(len(values)) < share] = '\\N'
+
+    return values
+
+def numbers(values):
+    """
+    The integers values as an object array of strings.
+    """
+
+    return np.asarray(values).astype(str).astype(object)
+
+def ids(prefix,values):
+    """
+    IMDb IDs of the integers values, e.g. tt0000001 for 1 with prefix tt.
+    """
+
+    return (prefix + pd.Series(values,dtype='int64').astype(str).str.zfill(7)
+        ).to_numpy(dtype=object)
+
+def referenced_ids(rng,prefix,n,count,orphans,counts=None):
+    """
+    n IDs of the count titles or names (1 to count), a share orphans of them
+    IDs of titles or names which do not exist, from count + 1 up. If counts
+    is given the IDs are lists, counts[i] of them for row i, and the IDs of
+    each list are made distinct, as each is a row of a table keyed on them
+    (e.g. Directors).
+    """
+
+    values = rng.integers(1,count + 1,n)
+    orphan = rng.random(n) < orphans
+    values[orphan] += count
+
+    if counts is not None:
+        lists = pd.DataFrame({'row': np.repeat(np.arange(len(counts)),counts),
+            'value': values})
+        # Draw the repeated IDs again, a few times as there may not be enough
+        # titles or names for every list when there are only a few
+        for attempt in range(10):
+            repeated = lists.duplicated().to_numpy()
+            if not repeated.any():
+                break
+            values[repeated] = rng.integers(1,count + 1,repeated.sum()) + \
+                count*orphan[repeated]
+            lists['value'] = values
+
+    return ids(prefix,values)
+
+def lengths(rng,column,n):
+    """
+    n list lengths drawn from the shares of LIST_LENGTHS[column].
+    """
+
+    shares = np.array(LIST_LENGTHS[column])
+
+    return rng.choice(len(shares),n,p=shares/shares.sum())
+
+def join_lists(items,counts,sep=',',left='',right=''):
+    """
+    Join items (an array of strings) into lists, the first counts[0] of them
+    the first list and so on, e.g. nm0000001,nm0000002. Rows with no items are
+    NULL (\\N). Each list is put between left and right.
+    """
+
+    lists = np.full(len(counts),'\\N',dtype=object)
+    rows = counts > 0
+    if not rows.any():
+        return lists
+
+    ends = np.cumsum(counts)
+    starts = (ends - counts)[rows]
+    items = np.asarray(items,dtype=object)
+    separated = items + sep
+    separated[ends[rows] - 1] = items[ends[rows] - 1]
+    lists[rows] = left + np.add.reduceat(separated,starts) + right
+
+    return lists
+
+def id_lists(rng,prefix,column,n,count):
+    """
+    The list column (e.g. directors) of n rows, lists of IDs of the count
+    titles or names with the lengths and orphans of column.
+    """
+
+    counts = lengths(rng,column,n)
+
+    return join_lists(referenced_ids(rng,prefix,counts.sum(),count,
+        ORPHANS.get(column,0),counts),counts)
+
+def write_rows(f,columns):
+    """
+    Write columns, a list of arrays of strings, to f as rows of tab separated
+    values.
+    """
+
+    if len(columns[0]) == 0:
+        return
+
+    lines = columns[0]
+    for column in columns[1:]:
+        lines = lines + '\t' + column
+
+    f.write('\n'.join(lines) + '\n')
+
+#-------------------------------------------------------------------------------
+
+# Used to make the rows of each file, for the block of titles (or names) first
+# to first + n - 1 of count
+def title_types(seed,block,n):
+    """
+    The title types of the n titles of block, as an object array, the same
+    for title.basics.tsv and title.episode.tsv.
+    """
+
+    return choose(np.random.default_rng([seed,0,block]),TITLE_TYPES,n)
+
+def title_basics(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of title.basics.tsv.
+    """
+
+    title_id = np.arange(first,first + n)
+    types = title_types(seed,block,n)
+
+    primary_title = 'Title ' + numbers(title_id)
+    # A few titles start with an unmatched quote, as in the IMDb dataset
+    quoted = rng.random(n) < 1e-5
+    primary_title[quoted] = '"' + primary_title[quoted]
+    original_title = primary_title.copy()
+    original = rng.random(n) < 0.05
+    original_title[original] = 'Original ' + original_title[original]
+
+    start_year = np.clip(2021 - rng.exponential(25,n).astype(int),1874,2025)
+    end_year = with_nulls(rng,numbers(start_year + rng.integers(0,20,n)),
+        NULLS['endYear'])
+    end_year[types != 'tvSeries'] = '\\N'
+
+    genre_counts = lengths(rng,'genres',n)
+
+    return [ids('tt',title_id),types,primary_title,original_title,
+        numbers((rng.random(n) < 0.02).astype(int)),
+        with_nulls(rng,numbers(start_year),NULLS['startYear']),end_year,
+        with_nulls(rng,numbers(np.maximum(1,rng.lognormal(3.8,0.6,n)
+        ).astype(int)),NULLS['runtimeMinutes']),
+        join_lists(choose_lists(rng,GENRES,genre_counts),genre_counts)]
+
+def title_akas(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of title.akas.tsv.
+    """
+
+    alias_counts = lengths(rng,'akas',n)
+    rows = alias_counts.sum()
+
+    title_id = np.repeat(np.arange(first,first + n),alias_counts)
+    orphan = rng.random(rows) < ORPHANS['titleId']
+    title_id[orphan] += counts['titles']
+    ordering = np.arange(rows) - np.repeat(np.cumsum(alias_counts) -
+        alias_counts,alias_counts) + 1
+
+    return [ids('tt',title_id),numbers(ordering),
+        'Alias ' + numbers(title_id) + ' ' + numbers(ordering),
+        with_nulls(rng,choose(rng,REGIONS,rows),NULLS['region']),
+        with_nulls(rng,choose(rng,LANGUAGES,rows),NULLS['language']),
+        with_nulls(rng,choose(rng,ALIAS_TYPES,rows),NULLS['types']),
+        with_nulls(rng,choose(rng,ALIAS_ATTRIBUTES,rows),
+        NULLS['attributes']),numbers((ordering == 1).astype(int))]
+
+def title_crew(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of title.crew.tsv.
+    """
+
+    return [ids('tt',np.arange(first,first + n)),
+        id_lists(rng,'nm','directors',n,counts['names']),
+        id_lists(rng,'nm','writers',n,counts['names'])]
+
+def title_episode(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of title.episode.tsv.
+    """
+
+    title_id = np.arange(first,first + n)[title_types(seed,block,n) ==
+        'tvEpisode']
+    rows = len(title_id)
+
+    return [ids('tt',title_id),referenced_ids(rng,'tt',rows,counts['titles'],
+        ORPHANS['parentTconst']),
+        with_nulls(rng,numbers(rng.integers(1,11,rows)),
+        NULLS['seasonNumber']),
+        with_nulls(rng,numbers(rng.integers(1,30,rows)),
+        NULLS['episodeNumber'])]
+
+def name_basics(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of name.basics.tsv.
+    """
+
+    birth_year = np.clip(1990 - rng.exponential(25,n).astype(int),1850,2020)
+    birth_year_strings = with_nulls(rng,numbers(birth_year),NULLS['birthYear'])
+    death_year = with_nulls(rng,numbers(np.minimum(birth_year +
+        rng.integers(20,100,n),2025)),NULLS['deathYear'])
+    death_year[(birth_year_strings == '\\N') | (birth_year > 1940)] = '\\N'
+
+    profession_counts = lengths(rng,'primaryProfession',n)
+
+    return [ids('nm',np.arange(first,first + n)),
+        'Name ' + numbers(np.arange(first,first + n)),birth_year_strings,
+        death_year,join_lists(choose_lists(rng,PROFESSIONS,
+        profession_counts),profession_counts),
+        id_lists(rng,'tt','knownForTitles',n,counts['titles'])]
+
+def title_principals(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of title.principals.tsv.
+    """
+
+    principal_counts = lengths(rng,'principals',n)
+    rows = principal_counts.sum()
+
+    ordering = np.arange(rows) - np.repeat(np.cumsum(principal_counts) -
+        principal_counts,principal_counts) + 1
+    category = choose(rng,CATEGORIES,rows)
+
+    job = with_nulls(rng,choose(rng,CATEGORIES,rows),NULLS['job'])
+    job[(category == 'actor') | (category == 'actress') |
+        (category == 'self')] = '\\N'
+
+    # Roles of actors, actresses and selves
+    character_counts = lengths(rng,'characters',rows)
+    character_counts[(category != 'actor') & (category != 'actress') &
+        (category != 'self')] = 0
+    characters = '"Character ' + numbers(np.minimum(rng.zipf(1.5,
+        character_counts.sum()),CHARACTERS)) + '"'
+    self_role = np.repeat(category == 'self',character_counts)
+    characters[self_role] = np.where(rng.random(self_role.sum()) < 0.7,
+        '"Himself"','"Herself"')
+
+    return [ids('tt',np.repeat(np.arange(first,first + n),principal_counts)),
+        numbers(ordering),referenced_ids(rng,'nm',rows,counts['names'],
+        ORPHANS['nconst']),category,job,
+        join_lists(characters,character_counts,left='[',right=']')]
+
+def title_ratings(rng,seed,block,first,n,counts):
+    """
+    Columns of the rows of title.ratings.tsv.
+    """
+
+    title_id = np.arange(first,first + n)[rng.random(n) <
+        ROWS_PER_TITLE['title.ratings.tsv']]
+    rows = len(title_id)
+
+    return [ids('tt',title_id),
+        np.char.mod('%.1f',np.clip(rng.normal(6.9,1.4,rows),1,10)).astype(
+        object),numbers(5 + rng.lognormal(3,1.8,rows).astype(int))]
+
+# Header and rows of each file, and whether its blocks are of names rather
+# than titles
+FILES = {
+    'title.basics.tsv': (['tconst', 'titleType', 'primaryTitle',
+        'originalTitle', 'isAdult', 'startYear', 'endYear', 'runtimeMinutes',
+        'genres'], title_basics, False),
+    'title.akas.tsv': (['titleId', 'ordering', 'title', 'region', 'language',
+        'types', 'attributes', 'isOriginalTitle'], title_akas, False),
+    'title.crew.tsv': (['tconst', 'directors', 'writers'], title_crew, False),
+    'title.episode.tsv': (['tconst', 'parentTconst', 'seasonNumber',
+        'episodeNumber'], title_episode, False),
+    'name.basics.tsv': (['nconst', 'primaryName', 'birthYear', 'deathYear',
+        'primaryProfession', 'knownForTitles'], name_basics, True),
+    'title.principals.tsv': (['tconst', 'ordering', 'nconst', 'category',
+        'job', 'characters'], title_principals, False),
+    'title.ratings.tsv': (['tconst', 'averageRating', 'numVotes'],
+        title_ratings, False),
+}
+
+#-------------------------------------------------------------------------------
+
+# Used to write the files
+def write_file(data_path,file,counts,seed=0,compress=True,
+    block_size=BLOCK_SIZE):
+    """
+    Write the synthetic IMDb data file file (e.g. 'title.basics.tsv'), gzipped
+    if compress is True, to folder data_path for counts titles and names (a
+    dict). Returns the number of rows written.
+    """
+
+    header, make_rows, of_names = FILES[file]
+    count = counts['names'] if of_names else counts['titles']
+
+    file_path = os.path.join(data_path,file)
+    if compress:
+        # With no time in its header, so the same rows give the same file
+        f = io.TextIOWrapper(gzip.GzipFile(file_path + '.gz','wb',
+            compresslevel=1,mtime=0),encoding='utf-8')
+    else:
+        f = open(file_path,'w',encoding='utf-8')
+
+    rows = 0
+    with f:
+        f.write('\t'.join(header) + '\n')
+        for block, first in enumerate(range(1,count + 1,block_size)):
+            rng = np.random.default_rng([seed,list(FILES).index(file) + 1,
+                block])
+            columns = make_rows(rng,seed,block,first,min(block_size,
+                count + 1 - first),counts)
+            write_rows(f,columns)
+            rows += len(columns[0])
+
+    return rows
+
+def generate(data_path='./imdb_data',rows=1000000,seed=0,compress=True,
+    files=None):
+    """
+    Write the synthetic IMDb data files (or only those in list files) to
+    folder data_path, with about rows rows in total. The same rows and seed
+    give the same files. Returns a dict mapping each file to its rows.
+    """
+
+    titles = max(1,round(rows/sum(ROWS_PER_TITLE.values())))
+    counts = {'titles': titles,
+        'names': max(1,round(titles*NAMES_PER_TITLE))}
+
+    os.makedirs(data_path,exist_ok=True)
+
+    written = {}
+    for file in files or FILES:
+        print('Writing',file)
+        written[file] = write_file(data_path,file,counts,seed,compress)
+
+    return written
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Write synthetic IMDb data files.')
+    parser.add_argument('--data-path',default='./imdb_data',
+        help='folder to write the IMDb data files to (default: ./imdb_data)')
+    parser.add_argument('--rows',type=int,default=1000000,
+        help='rows of all of the files together (default: 1000000)')
+    parser.add_argument('--seed',type=int,default=0,
+        help='seed of the random numbers (default: 0)')
+    parser.add_argument('--no-gzip',action='store_true',
+        help='write the files unzipped, as imdb_converter.py --unzip does')
+    parser.add_argument('--files',nargs='+',default=None,choices=list(FILES),
+        help='only write these files (default: all)')
+    args = parser.parse_args(argv)
+
+    written = generate(args.data_path,args.rows,args.seed,not args.no_gzip,
+        args.files)
+
+    print()
+    for file, rows in written.items():
+        print('{:<22} {:>12} rows'.format(file,rows))
+    print('{:<22} {:>12} rows'.format('Total',sum(written.values())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+#===============================================================================
+# imdb_telemetry.py
+# ------------------------------------------------------------------------------
+#
+# This script was written for the MySQL_IMDb_Project to record the stages of a
+# run of imdb_converter.py (imdb_converter.py --telemetry PATH):
+# - read   each chunk (or the whole) of an IMDb data file
+# - make   each call of a builder, e.g. make_Had_role, including its writes
+# - write  each table (or chunk of a table) written, see write_table
+#
+# Each stage is recorded as a line of JSON in the telemetry file, as it ends,
+# with its duration, rows in and out, bytes read and written by the process,
+# resident and peak memory of the process and the memory of its DataFrame
+# (memory_usage(deep=True)). A read also records the rows read so far and
+# roughly how far through the file it is. The worker processes of the
+# converter add their stages to the same file.
+#
+# With imdb_converter.py --profile-stage NAME, the stages named NAME (e.g.
+# make_Had_role, or write:Had_role for the writes only) are run under cProfile.
+# The profile of each process is saved to --profile-path and its slowest
+# functions printed.
+#
+# Run in terminal, for the summary table of a telemetry file:
+# $ python imdb_telemetry.py telemetry.jsonl
+#
+#===============================================================================
+
+
+# Imports
+# -------
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import contextlib
+
+#-------------------------------------------------------------------------------
+
+# Used to measure the process
+def io_counters():
+    """
+    Bytes read and written by this process so far (rchar and wchar of
+    /proc/self/io), or (None, None) where there is no /proc.
+    """
+
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def memory():
+    """
+    Resident and peak memory of this process in bytes (VmRSS and VmHWM of
+    /proc/self/status). Where there is no /proc the resident memory is None
+    and the peak is from getrusage.
+    """
+
+    try:
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':',1) for line in f.read().splitlines()
+                if ':' in line)
+        return (int(status['VmRSS'].split()[0])*1024,
+            int(status['VmHWM'].split()[0])*1024)
+    except (OSError, KeyError, ValueError):
+        import resource
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return None, peak*(1 if sys.platform == 'darwin' else 1024)
+
+def frame_memory(df):
+    """
+    Memory of DataFrame df in bytes, with that of its python objects, e.g.
+    strings.
+    """
+
+    return int(df.memory_usage(deep=True).sum())
+
+#-------------------------------------------------------------------------------
+
+class Telemetry:
+    """
+    Records the stages of a run to the JSON lines file path, see stage. The
+    stages named profile_stage are run under cProfile, and the profile saved
+    to folder profile_path by close.
+    """
+
+    def __init__(self,path,profile_stage=None,profile_path='./profiles'):
+        self.path = path
+        self.profile_stage = profile_stage
+        self.profile_path = profile_path
+        self.profiler = None
+        # Records of the stages running, innermost last
+        self.running = []
+
+    def emit(self,record):
+        """
+        Add record to the telemetry file, as one line (a single write, so the
+        lines of processes writing at the same time are not mixed).
+        """
+
+        with open(self.path,'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    @contextlib.contextmanager
+    def stage(self,kind,name,**fields):
+        """
+        Context manager recording stage name of kind ('read', 'make' or
+        'write'), with fields. Yields the stage's record, a dict: set
+        record['rows_out'], and record['frame'] to the stage's DataFrame to
+        record its memory (and rows out, if not set). If record['discard'] is
+        set the stage is not recorded.
+        """
+
+        record = dict({'kind': kind, 'name': name, 'pid': os.getpid(),
+            'time': time.time(), 'rows_in': None, 'rows_out': None},**fields)
+
+        read, written = io_counters()
+        profile = self.profile_stage in [name, kind + ':' + name]
+        if profile:
+            self.profiler = self.profiler or cProfile.Profile()
+            self.profiler.enable()
+
+        self.running.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            self.running.pop()
+            if profile:
+                self.profiler.disable()
+
+            frame = record.pop('frame',None)
+            if frame is not None:
+                record['frame_memory'] = frame_memory(frame)
+                if record['rows_out'] is None:
+                    record['rows_out'] = len(frame)
+
+            record['seconds'] = seconds
+            if read is not None:
+                now_read, now_written = io_counters()
+                record['bytes_read'] = now_read - read
+                record['bytes_written'] = now_written - written
+            record['memory'], record['peak_memory'] = memory()
+
+            # The rows written are the output of the stages writing them, e.g.
+            # of make_Directors_and_Writers
+            if kind == 'write' and record['rows_out'] is not None:
+                for parent in self.running:
+                    parent['rows_out'] = ((parent['rows_out'] or 0) +
+                        record['rows_out'])
+
+            if not record.pop('discard',False):
+                self.emit(record)
+
+    def read(self,chunks,name,file_size=None,start=None):
+        """
+        Yield the DataFrames of chunks (see imdb_converter.read_imdb_file),
+        recording the reading of each as a stage of kind 'read', with the rows
+        read so far and, given the file_size (bytes) of the file read, the
+        share of it read so far. start is the bytes read by the process (see
+        io_counters) when the file was opened, as it may be read ahead.
+        """
+
+        chunks = iter(chunks)
+        rows = 0
+        if start is None:
+            start, _ = io_counters()
+
+        while True:
+            with self.stage('read',name) as record:
+                df = next(chunks,None)
+                if df is None:
+                    record['discard'] = True
+                else:
+                    rows += len(df)
+                    record['frame'] = df
+                    record['rows_read'] = rows
+                    read, _ = io_counters()
+                    if file_size and read is not None:
+                        record['progress'] = min((read - start)/file_size,1)
+            if df is None:
+                return
+            yield df
+
+    def close(self):
+        """
+        Save the profile of the stages named profile_stage, if any ran, to
+        profile_path/<profile_stage>.<process id>.prof, and print its
+        slowest functions.
+        """
+
+        if self.profiler is None:
+            return
+
+        os.makedirs(self.profile_path,exist_ok=True)
+        file_path = os.path.join(self.profile_path,'{}.{}.prof'.format(
+            self.profile_stage.replace(':','_'),os.getpid()))
+        self.profiler.dump_stats(file_path)
+        print('\nProfile of',self.profile_stage,'saved to',file_path)
+        pstats.Stats(self.profiler).sort_stats('cumulative').print_stats(15)
+        self.profiler = None
+
+#-------------------------------------------------------------------------------
+
+# Used to summarise a run
+def read_records(path):
+    """
+    The records of the telemetry file path, a list of dicts.
+    """
+
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def summary(records):
+    """
+    The records of each stage (kind and name) added up: the number of times
+    it ran, its total seconds, rows in and out, bytes read and written, and
+    the largest peak memory and DataFrame memory. Returns a list of dicts,
+    slowest first.
+    """
+
+    stages = {}
+
+    for record in records:
+        total = stages.setdefault((record['kind'],record['name']),
+            {'kind': record['kind'], 'name': record['name'], 'count': 0,
+            'seconds': 0, 'rows_in': 0, 'rows_out': 0, 'bytes_read': 0,
+            'bytes_written': 0, 'peak_memory': 0, 'frame_memory': 0})
+        total['count'] += 1
+        for key in ['seconds', 'rows_in', 'rows_out', 'bytes_read',
+            'bytes_written']:
+            total[key] += record.get(key) or 0
+        for key in ['peak_memory', 'frame_memory']:
+            total[key] = max(total[key],record.get(key) or 0)
+
+    return sorted(stages.values(),key=lambda total: -total['seconds'])
+
+def print_summary(path):
+    """
+    Print the summary table of the telemetry file path, see summary. The time
+    of a make includes that of its writes.
+    """
+
+    print('\n{:<6} {:<24} {:>5} {:>9} {:>11} {:>11} {:>10} {:>10} {:>10} '
+        '{:>10}'.format('stage','name','count','time (s)','rows in',
+        'rows out','read (MB)','written','peak (MB)','frame (MB)'))
+    for total in summary(read_records(path)):
+        print('{:<6} {:<24} {:>5} {:>9.2f} {:>11} {:>11} {:>10.1f} {:>10.1f} '
+            '{:>10.1f} {:>10.1f}'.format(total['kind'],total['name'][:24],
+            total['count'],total['seconds'],total['rows_in'],total['rows_out'],
+            total['bytes_read']/2**20,total['bytes_written']/2**20,
+            total['peak_memory']/2**20,total['frame_memory']/2**20))
+
+#------------------------ END OF FUNCTION DEFINITIONS --------------------------
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        description='Summarise a telemetry file of imdb_converter.py.')
+    parser.add_argument('path',help='telemetry file, e.g. telemetry.jsonl')
+    args = parser.parse_args(argv)
+
+    print_summary(args.path)
+
+
+if __name__ == '__main__':
+    main()